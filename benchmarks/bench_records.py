@@ -0,0 +1,91 @@
+"""
+Память под ответы: словари из JSON против компактных ResponseRecord
+
+Синтетические данные (datagen.py) за 3 года загружаются из JSON так же, как
+ResponseStore читает файлы месяцев; память считается через tracemalloc.
+
+Запуск: python benchmarks/bench_records.py [--users 40] [--years 3]
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from datagen import generate  # noqa: E402
+from records import compact_days, plain_days  # noqa: E402
+
+
+def load_months(texts, compact):
+    months = {}
+    for month, text in texts.items():
+        days = json.loads(text)
+        months[month] = compact_days(days) if compact else days
+    return months
+
+
+def measure(texts, compact):
+    """(байт в памяти после загрузки, секунд на загрузку, данные)"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    months = load_months(texts, compact)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, elapsed, months
+
+
+def scan(months):
+    """Типичный проход отчета: настроение и проект каждого ответа"""
+    started = time.perf_counter()
+    counts = {}
+    for days in months.values():
+        for day_responses in days.values():
+            for response in day_responses.values():
+                key = (response['mood'], response.get('project'))
+                counts[key] = counts.get(key, 0) + 1
+    return time.perf_counter() - started, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=40)
+    parser.add_argument('--years', type=int, default=3)
+    args = parser.parse_args()
+
+    _, responses = generate(args.users, args.years)
+    by_month = {}
+    for date_str, day_responses in responses.items():
+        by_month.setdefault(date_str[:7], {})[date_str] = day_responses
+    texts = {month: json.dumps(days, ensure_ascii=False) for month, days in by_month.items()}
+    answers = sum(len(day) for day in responses.values())
+    del responses, by_month
+
+    dict_bytes, dict_load, dict_months = measure(texts, compact=False)
+    dict_scan, dict_counts = scan(dict_months)
+    record_bytes, record_load, record_months = measure(texts, compact=True)
+    record_scan, record_counts = scan(record_months)
+
+    mismatches = sum(
+        plain_days(record_months[month]) != dict_months[month] for month in texts
+    )
+
+    print(f"Ответов: {answers} ({args.users} чел., {args.years} г., месяцев: {len(texts)})")
+    print(f"словари:  {dict_bytes / 2**20:7.1f} МБ ({dict_bytes / answers:5.0f} Б/ответ), "
+          f"загрузка {dict_load * 1000:6.0f} мс, проход {dict_scan * 1000:5.0f} мс")
+    print(f"записи:   {record_bytes / 2**20:7.1f} МБ ({record_bytes / answers:5.0f} Б/ответ), "
+          f"загрузка {record_load * 1000:6.0f} мс, проход {record_scan * 1000:5.0f} мс")
+    print(f"экономия памяти: x{dict_bytes / record_bytes:.1f}; "
+          f"итоги прохода совпадают: {dict_counts == record_counts}; "
+          f"месяцев с расхождением при обратной записи в JSON: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
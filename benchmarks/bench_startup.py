@@ -0,0 +1,134 @@
+"""
+Время запуска: импорт модулей по данным python -X importtime и create_app()
+
+Каждый замер - отдельный процесс в пустом временном каталоге (data/ не создается
+заранее). С --compare РЕВИЗИЯ те же замеры делаются для src/ из указанного коммита.
+
+Запуск: python benchmarks/bench_startup.py [--rounds 5] [--compare HEAD~1]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ('config', 'database', 'commands', 'bot')
+ENV = {'BOT_TOKEN': 'benchmark', 'MANAGER_CHAT_ID': '1'}
+
+
+def import_time(src_dir, module):
+    """(суммарное время импорта модуля в мкс, {модуль: собственное время})"""
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=cwd, env={**os.environ, **ENV, 'PYTHONPATH': str(src_dir)},
+            capture_output=True, text=True, check=True
+        )
+    own = {}
+    total = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        own[name.strip()] = int(self_us)
+        if name.strip() == module:
+            total = int(cumulative_us)
+    return total, own
+
+
+def startup_time(src_dir):
+    """Время импорта bot и create_app() (или импорта database в старых версиях), мс"""
+    code = (
+        "import time\n"
+        "started = time.perf_counter()\n"
+        "import bot\n"
+        "imported = time.perf_counter()\n"
+        "try:\n"
+        "    from app import create_app\n"
+        "except ImportError:\n"
+        "    from database import feedback_bot\n"
+        "else:\n"
+        "    create_app()\n"
+        "print((imported - started) * 1000, (time.perf_counter() - imported) * 1000)\n"
+    )
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=cwd, env={**os.environ, **ENV, 'PYTHONPATH': str(src_dir)},
+            capture_output=True, text=True, check=True
+        )
+    imported, created = map(float, result.stdout.split())
+    return imported, created
+
+
+def measure(src_dir, rounds):
+    results = {}
+    slowest = {}
+    for module in MODULES:
+        totals = []
+        for _ in range(rounds):
+            total, own = import_time(src_dir, module)
+            totals.append(total)
+            if module == 'bot':
+                for name, self_us in own.items():
+                    slowest[name] = min(slowest.get(name, self_us), self_us)
+        results[module] = statistics.median(totals) / 1000
+
+    startups = [startup_time(src_dir) for _ in range(rounds)]
+    results['import bot'] = statistics.median(s[0] for s in startups)
+    results['create_app'] = statistics.median(s[1] for s in startups)
+
+    local = {path.stem for path in Path(src_dir).glob('*.py')}
+    top = sorted(
+        ((name, us) for name, us in slowest.items() if name.split('.')[0] in local | {'workalendar'}),
+        key=lambda item: -item[1]
+    )[:8]
+    return results, top
+
+
+def export_revision(revision, target):
+    """Распаковывает src/ из коммита во временный каталог"""
+    archive = subprocess.run(
+        ['git', 'archive', revision, 'src'], cwd=ROOT, capture_output=True, check=True
+    ).stdout
+    subprocess.run(['tar', '-x', '-C', str(target)], input=archive, check=True)
+    return Path(target) / 'src'
+
+
+def print_results(title, results, top):
+    print(title)
+    for name, ms in results.items():
+        print(f"  {name:<12} {ms:8.1f} мс")
+    print("  самые медленные модули проекта (собственное время):")
+    for name, us in top:
+        print(f"    {name:<24} {us / 1000:6.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--compare', metavar='REV', help="сравнить с src/ из указанной ревизии git")
+    args = parser.parse_args()
+
+    # Прогрев: компиляция .pyc, чтобы не учитывать ее в первом замере
+    import_time(ROOT / 'src', 'bot')
+    current, current_top = measure(ROOT / 'src', args.rounds)
+    print_results(f"Текущая версия (медиана из {args.rounds}):", current, current_top)
+
+    if args.compare:
+        with tempfile.TemporaryDirectory() as tmp:
+            src_dir = export_revision(args.compare, tmp)
+            import_time(src_dir, 'bot')
+            baseline, baseline_top = measure(src_dir, args.rounds)
+        print_results(f"\n{args.compare}:", baseline, baseline_top)
+        print("\nИзменение:")
+        for name, ms in current.items():
+            if name in baseline:
+                print(f"  {name:<12} {baseline[name]:8.1f} -> {ms:8.1f} мс")
+
+
+if __name__ == '__main__':
+    main()
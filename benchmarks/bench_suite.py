@@ -0,0 +1,238 @@
+"""
+Замеры горячих путей бота на синтетических данных
+
+Данные (datagen.py) пишутся во временный каталог, который становится рабочим
+каталогом бота (data/, reports/); бот поднимается через create_app().
+Telegram заменен FakeBot, который только считает вызовы. Каждая операция
+выполняется --rounds раз; в результат идут медиана и минимум в мс.
+Итоги печатаются и пишутся в JSON (--output), --compare ФАЙЛ.json
+показывает изменение относительно прошлого прогона.
+
+Запуск: python benchmarks/bench_suite.py [--users 500] [--years 3] [--rounds 5]
+                                         [--output results.json] [--compare old.json]
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from datagen import (  # noqa: E402
+    MSK_TZ, generate_day, generate_users, generate_vacations, iter_responses, period, user_projects, write_dataset
+)
+
+# Модули бота читают окружение и рабочий каталог при импорте, поэтому импортируются в run()
+ENV = {
+    'BOT_TOKEN': 'benchmark',
+    'MANAGER_CHAT_ID': '1',
+    # Лимит скорости рассылок не должен влиять на замер самой рассылки
+    'BROADCAST_RATE': '1000000',
+}
+
+
+class FakeBot:
+    """Вместо Telegram: принимает вызовы и считает их"""
+
+    def __init__(self):
+        self.calls = Counter()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls['send_message'] += 1
+
+    async def send_document(self, chat_id, document, **kwargs):
+        self.calls['send_document'] += 1
+
+
+class FakeMessage:
+    """Сообщение администратора для show_users_page (ответ только считается)"""
+
+    def __init__(self):
+        self.message = self
+        self.answers = 0
+
+    async def answer(self, text, **kwargs):
+        self.answers += 1
+
+
+async def measure(func, rounds, setup=None):
+    """{'median_ms', 'min_ms', 'rounds'} по rounds запускам func (синхронной или async)"""
+    times = []
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        result = func()
+        if inspect.isawaitable(result):
+            await result
+        times.append((time.perf_counter() - started) * 1000)
+    return {'median_ms': statistics.median(times), 'min_ms': min(times), 'rounds': rounds}
+
+
+def prepare_dataset(data_dir, users_count, years, seed):
+    """Пишет данные за years лет до сегодняшнего дня включительно (сегодня - с ответами)"""
+    today = datetime.now(MSK_TZ).date()
+    users = generate_users(users_count, seed)
+    start, end = period(years, today)
+    vacations = generate_vacations(users, start, end + timedelta(days=30), seed)
+
+    def days():
+        yield from iter_responses(users, start, end, seed)
+        # Сегодняшние ответы нужны ежедневному отчету, даже если сегодня выходной
+        rng = random.Random(seed)
+        yield today.isoformat(), generate_day(users, today, rng, user_projects(users, rng))
+
+    answers = write_dataset(data_dir, users, days(), vacations)
+    return {
+        'users': len(users),
+        'answers': answers,
+        'vacations': sum(len(items) for items in vacations.values()),
+        'start': start.isoformat(),
+        'end': today.isoformat(),
+    }
+
+
+async def run(rounds):
+    import logging
+
+    from app import close_app, create_app
+    from bot import generate_daily_report_async, send_monthly_reports
+    from commands import generate_user_monthly_report, save_report_to_csv, show_users_page
+    from config import logger
+    from outbox import outbox
+
+    logger.setLevel(logging.WARNING)
+    results = {}
+    started = time.perf_counter()
+    feedback_bot = create_app()
+    # Первый запуск без rollups.json: сводки строятся по всей истории
+    results['create_app'] = {'median_ms': (time.perf_counter() - started) * 1000, 'min_ms': None, 'rounds': 1}
+
+    today = datetime.now(MSK_TZ)
+    today_str = today.strftime('%Y-%m-%d')
+    previous = today.replace(day=1) - timedelta(days=1)
+    employee_id = next(iter(feedback_bot.responses[today_str]))
+    bot = FakeBot()
+    message = FakeMessage()
+
+    def touch_current_month():
+        # save_responses пишет только месяцы с изменениями
+        response = dict(feedback_bot.responses[today_str][employee_id])
+        feedback_bot.responses.set(today_str, employee_id, response)
+
+    def reset_outbox():
+        # Иначе повторная рассылка за тот же месяц пропускается как уже доставленная
+        outbox.pending.clear()
+        outbox.finished.clear()
+
+    def read_all_months():
+        store = feedback_bot.load_responses()
+        return sum(len(store[date_str]) for date_str in store)
+
+    cases = [
+        ('load_responses', feedback_bot.load_responses, None),
+        ('load_responses_all_months', read_all_months, None),
+        ('save_responses', feedback_bot.save_responses, touch_current_month),
+        ('generate_user_monthly_report',
+         lambda: generate_user_monthly_report(employee_id, previous.year, previous.month), None),
+        ('send_monthly_reports', lambda: send_monthly_reports(bot), reset_outbox),
+        ('show_users_page', lambda: show_users_page(message), None),
+        ('show_users_page_by_participation', lambda: show_users_page(message, sort_by_participation=True), None),
+        ('show_users_page_search', lambda: show_users_page(message, query='user00'), None),
+        ('generate_daily_report_async', lambda: generate_daily_report_async(bot), None),
+        ('save_report_to_csv',
+         lambda: save_report_to_csv(today_str, feedback_bot.responses[today_str]), None),
+    ]
+    try:
+        for name, func, setup in cases:
+            results[name] = await measure(func, rounds, setup)
+            print(f"  {name:<34} {results[name]['median_ms']:10.1f} мс")
+    finally:
+        await close_app()
+    return results, dict(bot.calls)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results, baseline_file):
+    baseline = json.loads(Path(baseline_file).read_text(encoding='utf-8'))['results']
+    print(f"\nИзменение относительно {baseline_file}:")
+    for name, current in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        ratio = current['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        print(f"  {name:<34} {old['median_ms']:10.1f} -> {current['median_ms']:10.1f} мс (x{ratio:.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--output', help="куда записать результаты в JSON")
+    parser.add_argument('--compare', metavar='FILE', help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    output = Path(args.output).resolve() if args.output else None
+    compare = Path(args.compare).resolve() if args.compare else None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        started = time.perf_counter()
+        dataset = prepare_dataset(Path(workdir) / 'data', args.users, args.years, args.seed)
+        print(f"Данные: {dataset['users']} чел., {dataset['answers']} ответов, "
+              f"{dataset['vacations']} отпусков ({time.perf_counter() - started:.1f} с)")
+
+        os.environ.update(ENV)
+        os.chdir(workdir)
+        try:
+            results, calls = asyncio.run(run(args.rounds))
+        finally:
+            os.chdir(ROOT)
+
+    report = {
+        'params': {'users': args.users, 'years': args.years, 'seed': args.seed, 'rounds': args.rounds},
+        'dataset': dataset,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'revision': git_revision(),
+            'timestamp': datetime.now(MSK_TZ).isoformat(timespec='seconds'),
+        },
+        'fake_bot_calls': calls,
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        output.write_text(text, encoding='utf-8')
+        print(f"Результаты записаны в {output}")
+    else:
+        print(text)
+
+    if compare:
+        print_comparison(results, compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Сравнение проверки рабочего дня и подсчета рабочих дней в месяце:
+workalendar на каждый вызов против битовой карты
+
+Запуск: python benchmarks/bench_working_days.py
+"""
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from workalendar.europe import Russia  # noqa: E402
+
+from working_days import WorkingDays  # noqa: E402
+
+YEARS = (2024, 2025, 2026)
+ROUNDS = 5
+
+
+def legacy_is_working_day(calendar, check_date, saturday_working=False, sunday_working=False):
+    """Прежняя реализация FeedbackBot.is_working_day"""
+    if not calendar.is_working_day(check_date):
+        return False
+    weekday = check_date.weekday()
+    if weekday == 5 and not saturday_working:
+        return False
+    if weekday == 6 and not sunday_working:
+        return False
+    return True
+
+
+def legacy_month_count(calendar, year, month):
+    """Рабочие дни месяца перебором дней"""
+    day = date(year, month, 1)
+    count = 0
+    while day.month == month:
+        count += legacy_is_working_day(calendar, day)
+        day += timedelta(days=1)
+    return count
+
+
+def all_days():
+    day = date(YEARS[0], 1, 1)
+    while day.year <= YEARS[-1]:
+        yield day
+        day += timedelta(days=1)
+
+
+def measure(check, days):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for day in days:
+            check(day)
+    return (time.perf_counter() - started) / (ROUNDS * len(days)) * 1e6
+
+
+def main():
+    calendar = Russia()
+    days = list(all_days())
+
+    legacy = measure(lambda day: legacy_is_working_day(calendar, day), days)
+
+    started = time.perf_counter()
+    working_days = WorkingDays(lambda: calendar)
+    for year in YEARS:
+        working_days.is_working_day(date(year, 1, 1), False, False)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    bitmap = measure(lambda day: working_days.is_working_day(day, False, False), days)
+
+    mismatches = sum(
+        legacy_is_working_day(calendar, day) != working_days.is_working_day(day, False, False) for day in days
+    )
+
+    months = [(year, month) for year in YEARS for month in range(1, 13)]
+    started = time.perf_counter()
+    legacy_counts = [legacy_month_count(calendar, year, month) for year, month in months]
+    legacy_month = (time.perf_counter() - started) / len(months) * 1e6
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        counts = [working_days.month_count(year, month, False, False) for year, month in months]
+    bitmap_month = (time.perf_counter() - started) / (ROUNDS * len(months)) * 1e6
+    month_mismatches = sum(a != b for a, b in zip(legacy_counts, counts))
+
+    print(f"Дней: {len(days)} ({YEARS[0]}-{YEARS[-1]}), повторов: {ROUNDS}")
+    print(f"workalendar на каждый вызов: {legacy:.2f} мкс/день")
+    print(f"битовая карта:               {bitmap:.2f} мкс/день (построение {build_ms:.0f} мс)")
+    print(f"ускорение: x{legacy / bitmap:.0f}, расхождений: {mismatches}")
+    print(f"Рабочих дней в месяце ({len(months)} месяцев):")
+    print(f"перебор дней:  {legacy_month:.1f} мкс/месяц")
+    print(f"маска месяца:  {bitmap_month:.2f} мкс/месяц")
+    print(f"ускорение: x{legacy_month / bitmap_month:.0f}, расхождений: {month_mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Детерминированный генератор данных для замеров
+
+Одинаковые параметры (включая seed) дают одинаковые данные: пользователи,
+ответы по рабочим дням в формате responses.json (с ISO-временем, как пишет
+бот), отпуска в формате holidays.json и файлы data/ в формате бота.
+
+Запуск: python benchmarks/datagen.py КАТАЛОГ [--users 40] [--years 3] [--seed 1] [--legacy]
+"""
+import argparse
+import json
+import random
+from itertools import groupby
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+
+MSK_TZ = timezone(timedelta(hours=3))
+
+MOODS = (
+    ('excellent', '👍', 'Отлично', 20),
+    ('good', '👌', 'Нормально', 45),
+    ('bad', '😔', 'Не очень', 20),
+    ('hard', '😓', 'Тяжело', 10),
+    ('critical', '😭', 'Критично', 5),
+)
+PROJECTS = [f"Объект {name}" for name in (
+    'Северный', 'Южный', 'Центр', 'Склад 1', 'Склад 2', 'Офис', 'Терминал', 'Парк',
+    'Мост', 'Школа', 'Больница', 'Вокзал', 'ЖК Заря', 'ЖК Восход', 'Ремонт', 'Проектирование',
+)]
+# Настроения с весами для rng.choice
+MOOD_WEIGHTS = [mood for mood in MOODS for _ in range(mood[3])]
+
+
+def generate_users(count, seed=1):
+    rng = random.Random(seed)
+    users = {}
+    for number in range(count):
+        user_id = str(100000000 + rng.randrange(900000000))
+        while user_id in users:
+            user_id = str(100000000 + rng.randrange(900000000))
+        users[user_id] = {
+            'username': f"user{number:04d}",
+            'first_name': f"Сотрудник {number}",
+            'registered_at': datetime(2020, 1, 1, tzinfo=MSK_TZ).isoformat()
+        }
+    return users
+
+
+def survey_days(start, end):
+    """Будние дни в [start, end)"""
+    day = start
+    while day < end:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def generate_day(users, day, rng, projects, response_rate=0.85):
+    """{user_id: ответ} за один день"""
+    day_responses = {}
+    for user_id, user in users.items():
+        if rng.random() > response_rate:
+            continue
+        mood, emoji, text, _ = rng.choice(MOOD_WEIGHTS)
+        answered = datetime.combine(day, time(17), MSK_TZ) + timedelta(
+            seconds=rng.randrange(3 * 3600), microseconds=rng.randrange(1000000)
+        )
+        response = {
+            'username': user['username'],
+            'mood': mood,
+            'mood_text': text,
+            'mood_emoji': emoji,
+            'timestamp': answered.isoformat()
+        }
+        if rng.random() < 0.95:
+            response['project'] = rng.choice(projects[user_id])
+            completed = answered + timedelta(seconds=rng.randrange(15, 1800), microseconds=rng.randrange(1000000))
+            response['completed_at'] = completed.isoformat()
+        day_responses[user_id] = response
+    return day_responses
+
+
+def user_projects(users, rng):
+    return {user_id: rng.sample(PROJECTS, 3) for user_id in users}
+
+
+def iter_responses(users, start, end, seed=1, response_rate=0.85):
+    """(дата, {user_id: ответ}) по будням периода, по порядку дат"""
+    rng = random.Random(seed)
+    projects = user_projects(users, rng)
+    for day in survey_days(start, end):
+        yield day.isoformat(), generate_day(users, day, rng, projects, response_rate)
+
+
+def generate_responses(users, start, end, seed=1, response_rate=0.85):
+    """{дата: {user_id: ответ}} за будни периода"""
+    return dict(iter_responses(users, start, end, seed, response_rate))
+
+
+def generate_vacations(users, start, end, seed=1, per_user=2):
+    """{user_id: [отпуск]} в формате holidays.json: до per_user отпусков на пользователя"""
+    rng = random.Random(seed + 1)
+    days = (end - start).days
+    vacations = {}
+    for user_id, user in users.items():
+        items = []
+        for _ in range(rng.randrange(per_user + 1)):
+            first = start + timedelta(days=rng.randrange(max(1, days)))
+            last = first + timedelta(days=rng.randrange(5, 21))
+            if any(v['start'] <= last.isoformat() and first.isoformat() <= v['end'] for v in items):
+                continue
+            items.append({
+                'username': user['username'],
+                'start': first.isoformat(),
+                'end': last.isoformat(),
+                'set_by_admin': '1',
+                'set_at': datetime.combine(first, time(9), MSK_TZ).isoformat()
+            })
+        if items:
+            vacations[user_id] = sorted(items, key=lambda v: v['start'])
+    return vacations
+
+
+def write_json(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+def write_dataset(data_dir, users, responses, vacations=None, legacy=False):
+    """
+    Пишет users.json, holidays.json и ответы: помесячные файлы
+    (data/responses/ГГГГ-ММ.json + index.json) или, при legacy=True, единый
+    responses.json, который бот сам разобьет по месяцам при первой загрузке.
+    responses - словарь или пары (дата, ответы дня) по порядку дат: месяцы
+    пишутся по мере готовности, весь период в памяти не держится.
+    Возвращает число ответов.
+    """
+    items = responses.items() if isinstance(responses, dict) else responses
+    data_dir = Path(data_dir)
+    shards_dir = data_dir / 'responses'
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    write_json(data_dir / 'users.json', users)
+    write_json(data_dir / 'holidays.json', {
+        'saturday_working': False,
+        'sunday_working': False,
+        'vacations': vacations or {}
+    })
+    if legacy:
+        days = dict(items)
+        write_json(data_dir / 'responses.json', days)
+        return sum(len(day) for day in days.values())
+
+    index = {}
+    answers = 0
+    for month, month_items in groupby(items, key=lambda item: item[0][:7]):
+        days = dict(month_items)
+        write_json(shards_dir / f"{month}.json", days)
+        index[month] = sorted(days)
+        answers += sum(len(day) for day in days.values())
+    write_json(shards_dir / 'index.json', index)
+    return answers
+
+
+def period(years, end):
+    return date(end.year - years, end.month, min(end.day, 28)), end
+
+
+def generate(users_count=40, years=3, seed=1, end=date(2026, 1, 1)):
+    """(пользователи, ответы) за years лет до end"""
+    users = generate_users(users_count, seed)
+    return users, generate_responses(users, *period(years, end), seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('data_dir')
+    parser.add_argument('--users', type=int, default=40)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--legacy', action='store_true', help="единый responses.json вместо помесячных файлов")
+    args = parser.parse_args()
+
+    users = generate_users(args.users, args.seed)
+    start, end = period(args.years, date(2026, 1, 1))
+    vacations = generate_vacations(users, start, end, args.seed)
+    answers = write_dataset(
+        args.data_dir, users, iter_responses(users, start, end, args.seed), vacations, args.legacy
+    )
+    print(f"Пользователей: {len(users)}, ответов: {answers}, отпусков: "
+          f"{sum(map(len, vacations.values()))} -> {args.data_dir}")
+
+
+if __name__ == '__main__':
+    main()
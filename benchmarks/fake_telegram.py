@@ -0,0 +1,364 @@
+"""
+Локальная заглушка Telegram Bot API для нагрузочных тестов
+
+Сервер на aiohttp отвечает на запросы /bot<токен>/<метод>: getUpdates
+(long polling), sendMessage, editMessageText, sendDocument и
+answerCallbackQuery, остальные методы просто подтверждаются. Можно добавить
+задержку ответа, ответы 429 (retry_after) при превышении лимита скорости
+или случайно, и 403 для пользователей, заблокировавших бота.
+
+Сценарий пользователей (Population): получив опрос с кнопками mood_*,
+сотрудник через случайное время нажимает кнопку, а на вопрос о проекте
+отвечает текстом. Каждый запрос и время доставки обновлений записываются;
+сводка доступна в FakeTelegram.stats() и по GET /stats.
+
+Отдельный запуск (бот запускается с TELEGRAM_API_URL=http://127.0.0.1:8081):
+python benchmarks/fake_telegram.py [--port 8081] [--latency-ms 50] [--flood-rate 0.01]
+                                   [--rate-limit 30] [--blocked-rate 0.02] [--answer-rate 0.9]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict, deque
+from pathlib import Path
+
+from aiohttp import web
+
+from datagen import MOOD_WEIGHTS, PROJECTS
+
+BOT_USER = {'id': 100000, 'is_bot': True, 'first_name': 'Feedback Bot', 'username': 'feedback_bot'}
+SEND_METHODS = {'sendMessage', 'editMessageText', 'sendDocument'}
+PROJECT_QUESTION = "Каким объектом/проектом"
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def latency_summary(values):
+    """Сводка задержек в мс"""
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 0.5) * 1000,
+        'p95_ms': percentile(values, 0.95) * 1000,
+        'p99_ms': percentile(values, 0.99) * 1000,
+        'max_ms': max(values, default=0.0) * 1000,
+    }
+
+
+def user_object(chat_id):
+    return {'id': int(chat_id), 'is_bot': False, 'first_name': f"Сотрудник {chat_id}", 'username': f"u{chat_id}"}
+
+
+class Population:
+    """Сотрудники, отвечающие на опрос: кнопка настроения, затем название проекта"""
+
+    def __init__(self, answer_rate=0.9, think_time=(1.0, 10.0), typing_time=(1.0, 5.0), seed=1):
+        self.answer_rate = answer_rate
+        self.think_time = think_time
+        self.typing_time = typing_time
+        self.rng = random.Random(seed)
+        self.answered = set()  # нажали кнопку настроения
+        self.asked = set()  # получили вопрос о проекте
+
+    def on_message(self, server, chat_id, message):
+        """Вызывается на каждое сообщение бота пользователю"""
+        buttons = [
+            button.get('callback_data', '')
+            for row in message.get('reply_markup', {}).get('inline_keyboard', [])
+            for button in row
+        ]
+        if any(data.startswith('mood_') for data in buttons):
+            if chat_id in self.answered or self.rng.random() > self.answer_rate:
+                return
+            self.answered.add(chat_id)
+            mood = self.rng.choice(MOOD_WEIGHTS)[0]
+            delay = self.rng.uniform(*self.think_time)
+            server.later(delay, server.push_callback_query, chat_id, message, f"mood_{mood}")
+        elif message.get('text', '').startswith(PROJECT_QUESTION):
+            self.asked.add(chat_id)
+            delay = self.rng.uniform(*self.typing_time)
+            server.later(delay, server.push_text, chat_id, self.rng.choice(PROJECTS))
+
+
+class FakeTelegram:
+    """Состояние заглушки: очередь обновлений, ошибки, журнал запросов"""
+
+    def __init__(self, population=None, latency_ms=0.0, jitter_ms=0.0, rate_limit=None,
+                 flood_rate=0.0, retry_after=1, blocked_rate=0.0, blocked=(), seed=1):
+        self.population = population
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_limit = rate_limit
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.blocked_rate = blocked_rate
+        self.blocked = {str(chat_id) for chat_id in blocked}
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        self.updates = []
+        self.next_update_id = 1
+        self.new_updates = asyncio.Event()
+        self.message_ids = Counter()
+        self.recent_sends = deque()
+
+        self.requests = Counter()  # (метод, код ответа) -> количество
+        self.request_times = defaultdict(list)  # метод -> длительность обработки, с
+        self.sent = []  # (время, метод, chat_id, текст) успешных отправок
+        self.pushed_at = {}  # update_id -> время появления обновления
+        self.delivered_at = {}  # update_id -> время выдачи боту в getUpdates
+        self.update_chat = {}  # update_id -> (chat_id, вид обновления)
+        self.get_updates_calls = 0
+        self._tasks = set()
+        self._runner = None
+        self.url = None
+
+    # --- Сценарий ---
+
+    def later(self, delay, func, *args):
+        async def run():
+            await asyncio.sleep(delay)
+            func(*args)
+        task = asyncio.ensure_future(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def idle(self):
+        """Все запланированные действия пользователей выполнены"""
+        return not self._tasks
+
+    def _push(self, chat_id, kind, update):
+        update_id = self.next_update_id
+        self.next_update_id += 1
+        update['update_id'] = update_id
+        self.updates.append(update)
+        self.pushed_at[update_id] = time.perf_counter()
+        self.update_chat[update_id] = (chat_id, kind)
+        self.new_updates.set()
+        return update_id
+
+    def push_callback_query(self, chat_id, message, data):
+        return self._push(chat_id, 'callback_query', {'callback_query': {
+            'id': f"cq{self.next_update_id}",
+            'from': user_object(chat_id),
+            'chat_instance': str(chat_id),
+            'message': message,
+            'data': data,
+        }})
+
+    def push_text(self, chat_id, text):
+        self.message_ids[chat_id] += 1
+        return self._push(chat_id, 'message', {'message': {
+            'message_id': self.message_ids[chat_id],
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'from': user_object(chat_id),
+            'text': text,
+        }})
+
+    # --- Bot API ---
+
+    def _is_blocked(self, chat_id):
+        if chat_id in self.blocked:
+            return True
+        if self.blocked_rate and random.Random(f"{self.seed}:{chat_id}").random() < self.blocked_rate:
+            self.blocked.add(chat_id)
+            return True
+        return False
+
+    def _flooded(self):
+        """429: случайный отказ или превышение лимита сообщений в секунду"""
+        if self.flood_rate and self.rng.random() < self.flood_rate:
+            return True
+        if not self.rate_limit:
+            return False
+        now = time.perf_counter()
+        while self.recent_sends and now - self.recent_sends[0] >= 1.0:
+            self.recent_sends.popleft()
+        if len(self.recent_sends) >= self.rate_limit:
+            return True
+        self.recent_sends.append(now)
+        return False
+
+    def _message(self, chat_id, params, message_id=None):
+        if message_id is None:
+            self.message_ids[chat_id] += 1
+            message_id = self.message_ids[chat_id]
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'from': BOT_USER,
+        }
+        if 'text' in params:
+            message['text'] = params['text']
+        if 'reply_markup' in params:
+            message['reply_markup'] = json.loads(params['reply_markup'])
+        return message
+
+    async def _get_updates(self, params):
+        self.get_updates_calls += 1
+        offset = int(params.get('offset', 0))
+        self.updates = [update for update in self.updates if update['update_id'] >= offset]
+        if not self.updates:
+            self.new_updates.clear()
+            try:
+                await asyncio.wait_for(self.new_updates.wait(), float(params.get('timeout', 0)))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get('limit', 100))
+        batch = self.updates[:limit]
+        now = time.perf_counter()
+        for update in batch:
+            self.delivered_at.setdefault(update['update_id'], now)
+        return batch
+
+    def _send(self, method, params):
+        chat_id = str(params.get('chat_id'))
+        if method == 'editMessageText':
+            message = self._message(chat_id, params, int(params['message_id']))
+        else:
+            message = self._message(chat_id, params)
+            if method == 'sendDocument':
+                message['document'] = {'file_id': f"doc{chat_id}_{message['message_id']}",
+                                       'file_unique_id': f"u{chat_id}_{message['message_id']}"}
+        self.sent.append((time.perf_counter(), method, chat_id, params.get('text', '')))
+        if self.population is not None and method == 'sendMessage':
+            self.population.on_message(self, chat_id, message)
+        return message
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        started = time.perf_counter()
+        params = dict(await request.post()) if request.can_read_body else {}
+        params.update(request.query)
+
+        if method == 'getUpdates':
+            result = await self._get_updates(params)
+        else:
+            delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+            if delay:
+                await asyncio.sleep(delay)
+            if method in SEND_METHODS:
+                chat_id = str(params.get('chat_id'))
+                if self._is_blocked(chat_id):
+                    return self._error(method, started, 403, "Forbidden: bot was blocked by the user")
+                if self._flooded():
+                    return self._error(
+                        method, started, 429, f"Too Many Requests: retry after {self.retry_after}",
+                        {'retry_after': self.retry_after}
+                    )
+                result = self._send(method, params)
+            elif method == 'getMe':
+                result = BOT_USER
+            else:
+                result = True
+
+        self.requests[(method, 200)] += 1
+        self.request_times[method].append(time.perf_counter() - started)
+        return web.json_response({'ok': True, 'result': result})
+
+    def _error(self, method, started, code, description, parameters=None):
+        self.requests[(method, code)] += 1
+        self.request_times[method].append(time.perf_counter() - started)
+        body = {'ok': False, 'error_code': code, 'description': description}
+        if parameters:
+            body['parameters'] = parameters
+        return web.json_response(body, status=code)
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats())
+
+    # --- Запуск ---
+
+    def app(self):
+        app = web.Application(client_max_size=50 * 2**20)
+        app.router.add_route('*', '/bot{token}/{method}', self.handle)
+        app.router.add_get('/stats', self.handle_stats)
+        return app
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Запускает сервер; port=0 - свободный порт. Возвращает адрес для TELEGRAM_API_URL"""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    # --- Итоги ---
+
+    def stats(self):
+        by_method = defaultdict(dict)
+        for (method, code), count in sorted(self.requests.items()):
+            by_method[method][str(code)] = count
+        return {
+            'requests': by_method,
+            'request_latency': {
+                method: latency_summary(times) for method, times in self.request_times.items()
+                if method != 'getUpdates'
+            },
+            'update_delivery': latency_summary([
+                self.delivered_at[update_id] - pushed for update_id, pushed in self.pushed_at.items()
+                if update_id in self.delivered_at
+            ]),
+            'blocked_users': len(self.blocked),
+        }
+
+
+async def serve(args):
+    population = Population(args.answer_rate, (args.think_min, args.think_max), seed=args.seed)
+    server = FakeTelegram(
+        population, args.latency_ms, args.jitter_ms, args.rate_limit,
+        args.flood_rate, args.retry_after, args.blocked_rate, seed=args.seed
+    )
+    url = await server.start(args.host, args.port)
+    print(f"Заглушка Bot API: {url} (статистика: {url}/stats). Ctrl+C - остановка")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        if args.output:
+            Path(args.output).write_text(json.dumps(server.stats(), ensure_ascii=False, indent=2), encoding='utf-8')
+        await server.stop()
+
+
+def add_server_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="задержка ответа на каждый запрос")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="случайная добавка к задержке")
+    parser.add_argument('--rate-limit', type=float, default=None, help="сообщений в секунду до ответа 429")
+    parser.add_argument('--flood-rate', type=float, default=0.0, help="доля случайных ответов 429")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--blocked-rate', type=float, default=0.0, help="доля пользователей, заблокировавших бота")
+    parser.add_argument('--answer-rate', type=float, default=0.9, help="доля сотрудников, отвечающих на опрос")
+    parser.add_argument('--think-min', type=float, default=1.0, help="мин. время до нажатия кнопки, с")
+    parser.add_argument('--think-max', type=float, default=10.0, help="макс. время до нажатия кнопки, с")
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--output', help="записать статистику в JSON при остановке")
+    add_server_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
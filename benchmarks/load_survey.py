@@ -0,0 +1,251 @@
+"""
+Нагрузочный тест ежедневного опроса: N сотрудников против заглушки Bot API
+
+Во временном рабочем каталоге создаются N сотрудников (datagen.py), бот
+запускается через main() с TELEGRAM_API_URL на fake_telegram.py, затем
+вызывается рассылка опроса 17:00. Сотрудники из Population отвечают
+кнопкой и проектом. Замеряются:
+- длительность рассылки опроса (по боту и по заглушке);
+- callback -> persist: от выдачи нажатия боту в getUpdates до появления
+  ответа в data/responses.journal (журнал опрашивается каждые 5 мс);
+- callback -> reply: до ответа бота этому пользователю;
+- ошибки 429/403 и задержки запросов на стороне заглушки.
+
+Запуск: python benchmarks/load_survey.py [--employees 200] [--latency-ms 30]
+        [--rate-limit 30] [--flood-rate 0.01] [--blocked-rate 0.02] [--output load.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from datagen import MSK_TZ, generate_users, write_dataset  # noqa: E402
+from fake_telegram import FakeTelegram, Population, add_server_arguments, latency_summary  # noqa: E402
+from working_days import workalendar_version  # noqa: E402
+
+ADMIN_ID = '1'
+POLL_INTERVAL = 0.005
+
+
+class JournalTail(threading.Thread):
+    """Следит за журналом ответов и запоминает, когда ответ каждого пользователя попал на диск"""
+
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.persisted = {}  # (op, user_id) -> время первой записи
+        self.stopped = threading.Event()
+
+    def _read(self, handle, tail):
+        tail += handle.read()
+        *lines, tail = tail.split('\n')
+        now = time.perf_counter()
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('user_id'):
+                self.persisted.setdefault((entry['op'], entry['user_id']), now)
+        return tail
+
+    def run(self):
+        handle, tail = None, ''
+        while not self.stopped.is_set():
+            if handle is None and self.path.exists():
+                handle = open(self.path, encoding='utf-8')
+            if handle is not None:
+                tail = self._read(handle, tail)
+                # Сжатие переименовывает журнал и начинает новый: дочитываем старый и переключаемся
+                try:
+                    rotated = os.stat(self.path).st_ino != os.fstat(handle.fileno()).st_ino
+                except FileNotFoundError:
+                    rotated = True
+                if rotated:
+                    tail = self._read(handle, tail)
+                    handle.close()
+                    handle, tail = None, ''
+            time.sleep(POLL_INTERVAL)
+        if handle is not None:
+            handle.close()
+
+
+def prepare_workdir(workdir, employees, seed):
+    users = generate_users(employees, seed)
+    users[ADMIN_ID] = {'username': 'admin', 'first_name': 'Администратор', 'registered_at': '2020-01-01T00:00:00+03:00'}
+    write_dataset(Path(workdir) / 'data', users, {})
+    # Опрос должен уйти в любой день, когда бы ни запускался тест: все дни года в кэше
+    # рабочих дней отмечены рабочими (для флагов суббот/воскресений из holidays.json)
+    data_dir = Path(workdir) / 'data'
+    (data_dir / 'holidays.json').write_text(
+        json.dumps({'saturday_working': True, 'sunday_working': True, 'vacations': {}}), encoding='utf-8'
+    )
+    (data_dir / 'working_days.json').write_text(json.dumps({
+        'version': workalendar_version(),
+        'flags': [True, True],
+        'years': {str(datetime.now(MSK_TZ).year): 'ff' * 46}
+    }), encoding='utf-8')
+    # Администратор не опрашивается, чтобы считать только сотрудников
+    (Path(workdir) / 'data' / 'schedule_settings.json').write_text(
+        json.dumps({'survey_time': '17:00', 'report_time': '21:00', 'admin_as_employee': False}), encoding='utf-8'
+    )
+    return [user_id for user_id in users if user_id != ADMIN_ID]
+
+
+async def wait_for(condition, timeout, interval=0.05):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
+
+
+async def run(args, employees):
+    population = Population(args.answer_rate, (args.think_min, args.think_max), seed=args.seed)
+    server = FakeTelegram(
+        population, args.latency_ms, args.jitter_ms, args.rate_limit,
+        args.flood_rate, args.retry_after, args.blocked_rate, seed=args.seed
+    )
+    url = await server.start()
+    os.environ.update({
+        'BOT_TOKEN': '123456:load-test-token',
+        'MANAGER_CHAT_ID': ADMIN_ID,
+        'TELEGRAM_API_URL': url,
+        'BROADCAST_RATE': str(args.broadcast_rate),
+    })
+
+    # Модули бота читают окружение и рабочий каталог при импорте
+    import bot as bot_module
+    from broadcast import broadcaster
+    from config import RESPONSES_JOURNAL_FILE
+
+    tail = JournalTail(RESPONSES_JOURNAL_FILE)
+    tail.start()
+    bot_task = asyncio.create_task(bot_module.main())
+    try:
+        if not await wait_for(lambda: server.get_updates_calls > 0, 30):
+            raise RuntimeError("бот не начал опрос getUpdates за 30 с")
+
+        started = time.perf_counter()
+        await bot_module.send_daily_survey_async(bot_module.bot)
+        broadcast_seconds = time.perf_counter() - started
+
+        # Ждем, пока все нажатия и названия проектов попадут в журнал
+        def done():
+            persisted = Counter(op for op, _ in tail.persisted)
+            return (
+                server.idle()
+                and persisted['set'] >= len(population.answered)
+                and persisted['update'] >= len(population.asked)
+            )
+        timeout = args.think_max + 30 + employees / max(args.broadcast_rate, 1)
+        finished = await wait_for(done, timeout)
+        await asyncio.sleep(0.5)
+    finally:
+        # Остановка как по Ctrl+C: aiogram завершает polling, main() сбрасывает данные на диск
+        if not bot_task.done():
+            os.kill(os.getpid(), signal.SIGTERM)
+        await bot_task
+        tail.stopped.set()
+        tail.join()
+        await server.stop()
+
+    return collect(server, tail, broadcaster.last_results.get('survey'), broadcast_seconds, finished, employees)
+
+
+def collect(server, tail, survey, broadcast_seconds, finished, employees):
+    """Итоги теста из журнала заглушки и журнала ответов"""
+    survey_sends = [at for at, method, _, text in server.sent if method == 'sendMessage' and text.startswith('Как прошел')]
+    persist, project_persist, reply = [], [], []
+    replies = {}
+    for at, _, chat_id, _ in server.sent:
+        replies.setdefault(chat_id, []).append(at)
+
+    for update_id, (chat_id, kind) in server.update_chat.items():
+        delivered = server.delivered_at.get(update_id)
+        if delivered is None:
+            continue
+        op = 'set' if kind == 'callback_query' else 'update'
+        persisted = tail.persisted.get((op, chat_id))
+        if persisted is not None:
+            (persist if op == 'set' else project_persist).append(max(0.0, persisted - delivered))
+        answered = [at for at in replies.get(chat_id, []) if at >= delivered]
+        if kind == 'callback_query' and answered:
+            reply.append(answered[0] - delivered)
+
+    return {
+        'employees': employees,
+        'completed': finished,
+        'survey': {
+            'recipients': survey.total if survey else None,
+            'sent': survey.sent if survey else None,
+            'failed': survey.failed if survey else None,
+            'retries': survey.retries if survey else None,
+            'bot_duration_s': broadcast_seconds,
+            'server_duration_s': survey_sends[-1] - survey_sends[0] if survey_sends else 0.0,
+            'throughput_per_s': len(survey_sends) / broadcast_seconds if broadcast_seconds else 0.0,
+        },
+        'answers': {
+            'moods_persisted': sum(1 for op, _ in tail.persisted if op == 'set'),
+            'projects_persisted': sum(1 for op, _ in tail.persisted if op == 'update'),
+        },
+        'callback_to_persist': latency_summary(persist),
+        'project_to_persist': latency_summary(project_persist),
+        'callback_to_reply': latency_summary(reply),
+        'server': server.stats(),
+    }
+
+
+def print_summary(result):
+    survey = result['survey']
+    print(f"Сотрудников: {result['employees']}, тест завершен полностью: {result['completed']}")
+    print(f"Опрос: отправлено {survey['sent']} из {survey['recipients']}, ошибок {survey['failed']}, "
+          f"повторов {survey['retries']}, {survey['bot_duration_s']:.1f} с ({survey['throughput_per_s']:.1f} сообщ/с)")
+    print(f"Ответов в журнале: настроение {result['answers']['moods_persisted']}, "
+          f"проект {result['answers']['projects_persisted']}")
+    for name in ('callback_to_persist', 'project_to_persist', 'callback_to_reply'):
+        item = result[name]
+        print(f"{name:<20} p50 {item['p50_ms']:7.1f} мс, p95 {item['p95_ms']:7.1f} мс, "
+              f"p99 {item['p99_ms']:7.1f} мс, max {item['max_ms']:7.1f} мс (n={item['count']})")
+    for method, codes in result['server']['requests'].items():
+        print(f"  {method:<20} {codes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--employees', type=int, default=200)
+    parser.add_argument('--broadcast-rate', type=float, default=30.0, help="BROADCAST_RATE бота")
+    parser.add_argument('--output', help="записать результаты в JSON")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    output = Path(args.output).resolve() if args.output else None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        employees = prepare_workdir(workdir, args.employees, args.seed)
+        os.chdir(workdir)
+        try:
+            result = asyncio.run(run(args, len(employees)))
+        finally:
+            os.chdir(ROOT)
+
+    print_summary(result)
+    if output:
+        output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"Результаты записаны в {output}")
+
+
+if __name__ == '__main__':
+    main()
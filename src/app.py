@@ -0,0 +1,30 @@
+"""
+Запуск приложения
+
+Импорт модулей бота не пишет на диск и не читает данные: логирование,
+каталоги data/ и reports/, загрузка FeedbackBot и очереди рассылок
+выполняются здесь, явно и один раз.
+"""
+from config import ensure_dirs, setup_logging
+
+
+def create_app():
+    """Подготавливает окружение и загружает состояние; возвращает FeedbackBot"""
+    setup_logging()
+    ensure_dirs()
+
+    from database import get_feedback_bot
+    from outbox import outbox
+
+    app = get_feedback_bot()
+    outbox.load()
+    return app
+
+
+async def close_app():
+    """Сбрасывает на диск отложенные изменения и останавливает пул ввода-вывода"""
+    from database import get_feedback_bot
+    from io_executor import io_executor
+
+    await get_feedback_bot().close()
+    io_executor.shutdown()
@@ -2,25 +2,32 @@
 Главный файл бота - запуск, планировщик, регистрация команд
 """
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
 
 from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
 from aiogram.filters import Command, CommandStart
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from config import (
-    BOT_TOKEN, MANAGER_CHAT_ID, MSK_TZ,
-    MOOD_OPTIONS, REPORTS_DIR, logger
+    BOT_TOKEN, MANAGER_CHAT_ID, MSK_TZ, TELEGRAM_API_URL,
+    MOOD_OPTIONS, REPORTS_DIR, REPORT_MAX_MESSAGES, SETTINGS_CHECK_INTERVAL, logger, setup_logging
 )
+from app import create_app, close_app
+from broadcast import broadcaster
+from daily_report import split_message
 from database import feedback_bot
+from outbox import outbox
+from scheduler import scheduler, ScheduledJob
 from commands import (
     # Базовые команды
     start_command, help_command, menu_button_handler, test_survey_command,
     mood_callback, project_message, FeedbackStates,
     # Команды админа - отчеты
-    report_command, force_report_command, download_command, reports_list_command,
-    stats_command, schedule_command, save_report_to_csv, send_csv_file,
+    report_command, force_report_command, download_command, reports_list_command, reports_page_callback,
+    stats_command, iostats_command, schedule_command, jobs_command, save_report_to_csv, send_csv_file,
     # Управление пользователями
     users_command, delete_user_callback, confirm_delete_callback,
     users_page_callback, show_users_page,
@@ -28,9 +35,9 @@ from commands import (
     reminders_command, reminders_set_command,
     # Выходные и отпуска
     weekends_command, saturday_command, sunday_command, holidays_command,
-    vacation_command, vacations_command, removevacation_command,
+    vacation_command, vacations_command, removevacation_command, importvacations_command,
     vacation_page_callback, vacation_select_callback, vacation_dates_handler, 
-    vacation_edit_callback, vacation_cancel_callback, vacation_edit_dates_handler,
+    vacation_add_callback, vacation_edit_callback, vacation_cancel_callback, vacation_edit_dates_handler,
     vacations_page_callback, vacations_delete_callback, confirm_vacations_delete_callback,
     VacationStates, show_vacation_page,
     # Месячные отчеты
@@ -47,12 +54,17 @@ bot = None
 # ПЛАНИРОВЩИК - ОПРОСЫ И ОТЧЕТЫ
 # ============================================================================
 
+def end_of_day(day):
+    """Полночь МСК после day - срок, после которого опрос и напоминания уже не досылаются"""
+    return datetime.combine(day + timedelta(days=1), time(0, 0), MSK_TZ)
+
+
 async def send_daily_survey_async(bot_instance):
-    """Отправляет ежедневный опрос всем пользователям"""
+    """Отправляет ежедневный опрос всем пользователям; False - опрос не разослан из-за ошибки"""
     
     if not bot_instance:
         logger.error("Бот не инициализирован")
-        return
+        return False
     
     try:
         # Автоматически удаляем завершенные отпуска
@@ -64,11 +76,10 @@ async def send_daily_survey_async(bot_instance):
         # Проверяем, рабочий ли день
         if not feedback_bot.is_working_day(today_date):
             logger.info(f"Сегодня выходной/праздник ({today}), опросы не отправляются")
-            return
+            return True
         
         # Инициализируем responses для сегодня если еще нет
-        if today not in feedback_bot.responses:
-            feedback_bot.responses[today] = {}
+        feedback_bot.ensure_day(today)
         
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [
@@ -84,19 +95,16 @@ async def send_daily_survey_async(bot_instance):
             ]
         ])
         
-        sent_count = 0
-        error_count = 0
         vacation_count = 0
         
-        # Перезагружаем настройки чтобы подхватить изменения
-        feedback_bot.schedule_settings = feedback_bot.load_schedule_settings()
+        # Подхватываем ручные правки файлов настроек (перечитываются только измененные)
+        await feedback_bot.refresh_settings()
         admin_as_employee = feedback_bot.schedule_settings.get("admin_as_employee", True)
         
         logger.info(f"Начало отправки опросов. Всего пользователей: {len(feedback_bot.users)}, admin_as_employee: {admin_as_employee}")
         
+        recipients = []
         for chat_id in feedback_bot.users:
-            logger.info(f"Обработка пользователя {chat_id}, MANAGER_CHAT_ID: {MANAGER_CHAT_ID}")
-            
             # Пропускаем админа если он не включен как сотрудник
             if chat_id == MANAGER_CHAT_ID and not admin_as_employee:
                 logger.info(f"Администратор исключен из опроса (admin_as_employee=False)")
@@ -105,76 +113,50 @@ async def send_daily_survey_async(bot_instance):
             # Проверяем отпуск
             if feedback_bot.is_user_on_vacation(chat_id, today_date):
                 vacation_count += 1
-                logger.info(f"Пользователь {chat_id} в отпуске, опрос не отправлен")
                 continue
             
-            try:
-                await bot_instance.send_message(
-                    chat_id=int(chat_id),
-                    text="Как прошел твой день? 🤔",
-                    reply_markup=keyboard
-                )
-                sent_count += 1
-                logger.info(f"Опрос отправлен пользователю {chat_id}")
-            except Exception as e:
-                error_count += 1
-                logger.error(f"Ошибка отправки опроса пользователю {chat_id}: {e}")
-        
-        logger.info(f"Опрос завершен. Отправлено: {sent_count}, в отпуске: {vacation_count}, ошибок: {error_count}")
-        feedback_bot.save_responses()
-        
-        # Перезагружаем настройки напоминаний
-        feedback_bot.reminder_settings = feedback_bot.load_reminder_settings()
-        
-        # Запускаем напоминания если они включены
-        if feedback_bot.reminder_settings.get("enabled", True):
-            await schedule_reminders(bot_instance, today)
+            recipients.append(chat_id)
+        
+        # Напоминания пойдут только тем, кто получил опрос и еще не ответил
+        feedback_bot.start_pending_responders(today, recipients)
+        
+        result = await outbox.broadcast(
+            bot_instance, 'survey', today,
+            [(chat_id, {'text': "Как прошел твой день? 🤔", 'reply_markup': keyboard}) for chat_id in recipients],
+            end_of_day(today_date)
+        )
+        
+        logger.info(f"Опрос завершен. Отправлено: {result.sent}, в отпуске: {vacation_count}, ошибок: {result.failed}")
+        return True
         
     except Exception as e:
         logger.error(f"Ошибка в отправке опроса: {e}")
+        return False
 
 
-async def schedule_reminders(bot_instance, today):
-    """Планирует напоминания для тех, кто не ответил"""
-    # Перезагружаем настройки напоминаний
-    feedback_bot.reminder_settings = feedback_bot.load_reminder_settings()
-    reminder_times = feedback_bot.reminder_settings.get("times", [])
+async def send_scheduled_reminder(bot_instance, reminder_time):
+    """Напоминание по расписанию: только в дни опроса и только после времени опроса"""
+    today = datetime.now(MSK_TZ).strftime('%Y-%m-%d')
+    survey_time = feedback_bot.schedule_settings.get("survey_time", "17:00")
     
-    for reminder_time in reminder_times:
-        # Создаем задачу для каждого времени напоминания
-        asyncio.create_task(send_reminder_at_time(bot_instance, today, reminder_time))
-
-
-async def send_reminder_at_time(bot_instance, today, reminder_time):
-    """Отправляет напоминание в указанное время"""
-    try:
-        # Парсим время напоминания
-        hour, minute = map(int, reminder_time.split(':'))
-        now = datetime.now(MSK_TZ)
-        reminder_datetime = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        
-        # Если время уже прошло, пропускаем
-        if reminder_datetime <= now:
-            logger.info(f"Время напоминания {reminder_time} уже прошло, пропускаем")
-            return
-        
-        # Ждем до времени напоминания
-        wait_seconds = (reminder_datetime - now).total_seconds()
-        logger.info(f"Напоминание запланировано на {reminder_time} (через {wait_seconds:.0f} сек)")
-        await asyncio.sleep(wait_seconds)
-        
-        # Отправляем напоминания тем, кто не ответил
-        await send_reminders(bot_instance, today)
-        
-    except Exception as e:
-        logger.error(f"Ошибка в планировании напоминания на {reminder_time}: {e}")
+    if feedback_bot.pending_responders["date"] != today:
+        logger.info(f"Сегодня опрос не проводился, напоминание {reminder_time} пропущено")
+        return True
+    
+    if not feedback_bot.pending_responders["users"]:
+        logger.info(f"Все получатели опроса ответили, напоминание {reminder_time} не нужно")
+        return True
+    
+    if reminder_time <= survey_time:
+        logger.info(f"Время напоминания {reminder_time} не позже опроса ({survey_time}), пропускаем")
+        return True
+    
+    return await send_reminders(bot_instance, today, reminder_time)
 
 
-async def send_reminders(bot_instance, today):
-    """Отправляет напоминания пользователям, которые не ответили"""
+async def send_reminders(bot_instance, today, reminder_time):
+    """Отправляет напоминания пользователям, которые не ответили; False - при ошибке"""
     try:
-        today_responses = feedback_bot.responses.get(today, {})
-        
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [
                 InlineKeyboardButton(text=f"{MOOD_OPTIONS['excellent']['emoji']} {MOOD_OPTIONS['excellent']['text']}", callback_data='mood_excellent'),
@@ -189,149 +171,102 @@ async def send_reminders(bot_instance, today):
             ]
         ])
         
-        sent_count = 0
-        
-        # Перезагружаем настройки чтобы подхватить изменения
-        feedback_bot.schedule_settings = feedback_bot.load_schedule_settings()
+        # Подхватываем ручные правки файлов настроек (перечитываются только измененные)
+        await feedback_bot.refresh_settings()
         admin_as_employee = feedback_bot.schedule_settings.get("admin_as_employee", True)
         
-        for chat_id in feedback_bot.users:
-            # Пропускаем админа если он не включен как сотрудник
-            if chat_id == MANAGER_CHAT_ID and not admin_as_employee:
+        today_date = datetime.now(MSK_TZ).date()
+        pending = feedback_bot.get_pending_responders(today)
+        recipients = []
+        for chat_id in pending:
+            # Пользователь мог быть удален после опроса
+            if chat_id not in feedback_bot.users:
                 continue
             
-            # Проверяем, ответил ли пользователь
-            if chat_id in today_responses:
+            # Пропускаем админа если он не включен как сотрудник
+            if chat_id == MANAGER_CHAT_ID and not admin_as_employee:
                 continue
             
             # Проверяем, не в отпуске ли
-            today_date = datetime.now(MSK_TZ).date()
             if feedback_bot.is_user_on_vacation(chat_id, today_date):
                 continue
             
-            try:
-                await bot_instance.send_message(
-                    chat_id=int(chat_id),
-                    text="⏰ Напоминание: не забудь ответить на опрос!",
-                    reply_markup=keyboard
-                )
-                sent_count += 1
-                logger.info(f"Напоминание отправлено пользователю {chat_id}")
-            except Exception as e:
-                logger.error(f"Ошибка отправки напоминания пользователю {chat_id}: {e}")
-        
-        logger.info(f"Напоминания отправлены: {sent_count}")
+            recipients.append(chat_id)
+        
+        logger.info(f"Ожидают ответа: {len(pending)}, напоминаний к отправке: {len(recipients)}")
+        
+        result = await outbox.broadcast(
+            bot_instance, 'reminder', f"{today}T{reminder_time}",
+            [
+                (chat_id, {'text': "⏰ Напоминание: не забудь ответить на опрос!", 'reply_markup': keyboard})
+                for chat_id in recipients
+            ],
+            end_of_day(today_date)
+        )
+        
+        logger.info(f"Напоминания отправлены: {result.sent}")
+        return True
         
     except Exception as e:
         logger.error(f"Ошибка в отправке напоминаний: {e}")
+        return False
 
 
 async def generate_daily_report_async(bot_instance):
-    """Генерирует и отправляет ежедневный отчет менеджеру"""
+    """
+    Генерирует и отправляет ежедневный отчет менеджеру.
+    False - текст отчета не отправлен ни одним сообщением или не удалось отправить CSV.
+    """
     
     if not MANAGER_CHAT_ID:
         logger.error("MANAGER_CHAT_ID не настроен")
-        return
+        return False
     
     if not bot_instance:
         logger.error("Бот не инициализирован")
-        return
+        return False
+    
+    today = datetime.now(MSK_TZ).strftime('%Y-%m-%d')
+    ok = True
     
     try:
-        today = datetime.now(MSK_TZ).strftime('%Y-%m-%d')
-        today_date = datetime.now(MSK_TZ).date()
-        today_formatted = datetime.now(MSK_TZ).strftime('%d.%m.%Y')
-        
-        responses = feedback_bot.responses.get(today, {})
-        
-        # Считаем пользователей в отпуске
-        vacation_users = []
-        for user_id in feedback_bot.users:
-            if feedback_bot.is_user_on_vacation(user_id, today_date):
-                user_data = feedback_bot.users[user_id]
-                vacation_users.append(f"@{user_data.get('username', 'Неизвестный')}")
-        
-        if not responses:
-            report = f"📊 Отчет за {today_formatted}\n\n"
-            if vacation_users:
-                report += f"❌ Не отправлено:\n• Отпуск: {', '.join(vacation_users)} ({len(vacation_users)} чел.)\n\n"
-            report += "❌ Сегодня никто не ответил на опрос."
-        else:
-            report = f"📊 Отчет за {today_formatted}\n\n"
-            
-            if vacation_users:
-                report += f"❌ Не отправлено:\n• Отпуск: {', '.join(vacation_users)} ({len(vacation_users)} чел.)\n\n"
-            
-            # Проверяем настройку admin_as_employee для подсчета
-            admin_as_employee = feedback_bot.schedule_settings.get("admin_as_employee", True)
-            admin_count = 1 if not admin_as_employee else 0
-            
-            total_users = len(feedback_bot.users) - len(vacation_users) - admin_count
-            responded_users = len(responses)
-            
-            report += f"👥 Ответили: {responded_users} из {total_users}"
-            if total_users > 0:
-                percentage = (responded_users / total_users) * 100
-                report += f" ({percentage:.0f}%)"
-            report += "\n\n"
-            
-            # Группируем по настроению
-            mood_groups = {}
-            for response in responses.values():
-                mood = response['mood']
-                if mood not in mood_groups:
-                    mood_groups[mood] = []
-                mood_groups[mood].append(response)
-            
-            # Сортируем по настроениям
-            mood_order = ['excellent', 'good', 'bad', 'hard', 'critical']
-            
-            for mood in mood_order:
-                if mood in mood_groups:
-                    mood_data = MOOD_OPTIONS[mood]
-                    count = len(mood_groups[mood])
-                    report += f"{mood_data['emoji']} {mood_data['text']} ({count}):\n"
-                    
-                    for response in mood_groups[mood]:
-                        project = response.get('project', 'Не указан')
-                        username = response['username']
-                        report += f"  • @{username}: {project}\n"
-                    report += "\n"
-            
-            # Кто не ответил (исключая тех кто в отпуске)
-            responded_user_ids = set(responses.keys())
-            admin_as_employee = feedback_bot.schedule_settings.get("admin_as_employee", True)
-            
-            not_responded = [user_id for user_id in feedback_bot.users 
-                           if user_id not in responded_user_ids 
-                           and not feedback_bot.is_user_on_vacation(user_id, today_date)
-                           and (admin_as_employee or user_id != MANAGER_CHAT_ID)]
-            
-            if not_responded:
-                report += f"❌ Не ответили ({len(not_responded)}):\n"
-                for user_id in not_responded:
-                    user = feedback_bot.users[user_id]
-                    username = user['username']
-                    report += f"  • @{username}\n"
-        
-        # Отправляем текстовый отчет
-        await bot_instance.send_message(chat_id=int(MANAGER_CHAT_ID), text=report)
-        logger.info("Отчет отправлен менеджеру")
-        
-        # Сохраняем в CSV и отправляем файл
+        # Модель отчета обновляется с каждым ответом, здесь - только отрисовка
+        report = feedback_bot.daily_report(today)
+        chunks = split_message(report.sections())
+        if len(chunks) > REPORT_MAX_MESSAGES:
+            logger.info(f"Отчет занимает {len(chunks)} сообщений, отправляю сводку и CSV")
+            chunks = split_message(report.summary_sections())
+        
+        # Части идут через общий лимит скорости; неудача одной не отменяет остальные
+        sent = 0
+        for chunk in chunks:
+            if await broadcaster.send(bot_instance, MANAGER_CHAT_ID, text=chunk):
+                sent += 1
+        logger.info(f"Отчет отправлен менеджеру: сообщений {sent} из {len(chunks)}")
+        ok = sent > 0
+    except Exception as e:
+        logger.error(f"Ошибка отправки отчета: {e}")
+        ok = False
+    
+    # CSV отправляется, даже если текст отчета отправить не удалось
+    try:
         if today in feedback_bot.responses:
             csv_path = await save_report_to_csv(today, feedback_bot.responses[today])
             if csv_path and csv_path.exists():
-                await send_csv_file(bot_instance, int(MANAGER_CHAT_ID), csv_path, today)
-            
+                if not await send_csv_file(bot_instance, int(MANAGER_CHAT_ID), csv_path, today):
+                    ok = False
+            else:
+                ok = False
     except Exception as e:
-        logger.error(f"Ошибка отправки отчета: {e}")
+        logger.error(f"Ошибка отправки CSV отчета: {e}")
+        ok = False
+    return ok
 
 
 async def send_monthly_reports(bot_instance):
-    """Отправляет месячные отчеты всем сотрудникам 1-го числа"""
+    """Отправляет месячные отчеты всем сотрудникам 1-го числа; False - при ошибке"""
     try:
-        from commands import generate_user_monthly_report
+        from commands import aggregate_monthly_stats, render_monthly_report
         
         # Получаем прошлый месяц
         today = datetime.now(MSK_TZ)
@@ -344,76 +279,86 @@ async def send_monthly_reports(bot_instance):
         
         logger.info(f"Отправка месячных отчетов за {month}/{year}")
         
-        sent_count = 0
-        for user_id in feedback_bot.users:
-            # Пропускаем админа (месячные отчеты всегда не отправляются админу)
-            if user_id == MANAGER_CHAT_ID:
-                continue
-            
-            try:
-                report = await generate_user_monthly_report(user_id, year, month)
-                await bot_instance.send_message(chat_id=int(user_id), text=report)
-                sent_count += 1
-                logger.info(f"Месячный отчет отправлен пользователю {user_id}")
-            except Exception as e:
-                logger.error(f"Ошибка отправки месячного отчета пользователю {user_id}: {e}")
+        # Пропускаем админа (месячные отчеты всегда не отправляются админу)
+        user_ids = [user_id for user_id in feedback_bot.users if user_id != MANAGER_CHAT_ID]
         
-        logger.info(f"Месячные отчеты отправлены: {sent_count}")
+        # Один проход по ответам месяца для всей команды, дальше только форматирование
+        stats = aggregate_monthly_stats(year, month, user_ids)
+        messages = [
+            (user_id, {'text': render_monthly_report(stats[user_id], year, month)})
+            for user_id in user_ids
+        ]
+        
+        result = await outbox.broadcast(
+            bot_instance, 'monthly', f"{year}-{month:02d}", messages, today + timedelta(days=3)
+        )
+        
+        logger.info(f"Месячные отчеты отправлены: {result.sent}")
+        return True
         
     except Exception as e:
         logger.error(f"Ошибка в отправке месячных отчетов: {e}")
+        return False
 
 
-async def scheduler_task(bot_instance):
-    """Планировщик задач"""
+async def cleanup_vacations_job(run_at):
+    """Ежедневная очистка завершенных отпусков"""
+    feedback_bot.cleanup_expired_vacations()
+
+
+def plan_jobs(bot_instance):
+    """Список задач по текущим настройкам расписания и напоминаний"""
     survey_time = feedback_bot.schedule_settings.get("survey_time", "17:00")
     report_time = feedback_bot.schedule_settings.get("report_time", "21:00")
     
-    logger.info(f"Планировщик запущен. Опрос: {survey_time} МСК, Отчет: {report_time} МСК")
+    # grace - насколько поздно задачу еще имеет смысл выполнить (после перезапуска или задержки)
+    jobs = [
+        ScheduledJob('survey', "Опрос сотрудников", survey_time,
+                     lambda run_at: send_daily_survey_async(bot_instance), grace=timedelta(hours=3)),
+        ScheduledJob('report', "Отчет менеджеру", report_time,
+                     lambda run_at: generate_daily_report_async(bot_instance), grace=timedelta(hours=3)),
+        ScheduledJob('monthly_reports', "Месячные отчеты", "09:00",
+                     lambda run_at: send_monthly_reports(bot_instance), days=lambda day: day.day == 1,
+                     grace=timedelta(days=3)),
+        ScheduledJob('vacation_cleanup', "Очистка завершенных отпусков", "00:05", cleanup_vacations_job,
+                     grace=timedelta(days=1)),
+    ]
+    
+    if feedback_bot.reminder_settings.get("enabled", True):
+        for reminder_time in feedback_bot.reminder_settings.get("times", []):
+            jobs.append(ScheduledJob(
+                f'reminder_{reminder_time}', "Напоминание", reminder_time,
+                lambda run_at, reminder_time=reminder_time: send_scheduled_reminder(bot_instance, reminder_time),
+                grace=timedelta(minutes=15)
+            ))
     
+    return jobs
+
+
+async def watch_settings():
+    """Сверяет файлы настроек с диском (только stat) и перестраивает план после ручной правки"""
     while True:
+        await asyncio.sleep(SETTINGS_CHECK_INTERVAL)
         try:
-            # Перезагружаем настройки на каждой итерации (чтобы подхватить изменения)
-            feedback_bot.schedule_settings = feedback_bot.load_schedule_settings()
-            survey_time = feedback_bot.schedule_settings.get("survey_time", "17:00")
-            report_time = feedback_bot.schedule_settings.get("report_time", "21:00")
-            
-            # Ждём до начала следующей минуты
-            now = datetime.now(MSK_TZ)
-            next_minute = (now + timedelta(minutes=1)).replace(second=0, microsecond=0)
-            sleep_seconds = (next_minute - now).total_seconds()
-            
-            if sleep_seconds > 0:
-                await asyncio.sleep(sleep_seconds)
-            
-            # Теперь мы точно в начале новой минуты
-            current_time = next_minute.strftime('%H:%M')
-            today_str = next_minute.strftime('%Y-%m-%d')
-            
-            logger.debug(f"Текущее время МСК: {current_time}")
-            
-            # Опрос
-            if current_time == survey_time:
-                logger.info("Запуск ежедневного опроса...")
-                await send_daily_survey_async(bot_instance)
-            
-            # Отчет
-            elif current_time == report_time:
-                logger.info("Запуск формирования отчета...")
-                await generate_daily_report_async(bot_instance)
-            
-            # Месячные отчеты (1-го числа в 09:00)
-            elif current_time == "09:00" and next_minute.day == 1:
-                logger.info("Запуск отправки месячных отчетов...")
-                await send_monthly_reports(bot_instance)
-            
-            # Логирование каждые 10 минут
-            if next_minute.minute % 10 == 0:
-                logger.info(f"Планировщик активен. Время МСК: {current_time}")
-                
+            if await feedback_bot.refresh_settings():
+                scheduler.replan()
         except Exception as e:
-            logger.error(f"Ошибка в планировщике: {e}")
-            await asyncio.sleep(60)
+            logger.error(f"Ошибка проверки файлов настроек: {e}")
+
+
+async def scheduler_task(bot_instance):
+    """Планировщик задач"""
+    survey_time = feedback_bot.schedule_settings.get("survey_time", "17:00")
+    report_time = feedback_bot.schedule_settings.get("report_time", "21:00")
+    
+    logger.info(f"Планировщик запущен. Опрос: {survey_time} МСК, Отчет: {report_time} МСК")
+    
+    watcher = asyncio.create_task(watch_settings())
+    try:
+        await scheduler.run(lambda: plan_jobs(bot_instance))
+    finally:
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
 
 
 # ============================================================================
@@ -424,12 +369,17 @@ async def main():
     """Основная функция запуска бота"""
     global bot
     
+    setup_logging()
+    
     if not BOT_TOKEN or not MANAGER_CHAT_ID:
         logger.error("Не указаны BOT_TOKEN или MANAGER_CHAT_ID в .env файле")
         return
     
     logger.info("Инициализация бота...")
     
+    # Каталоги, данные и очередь рассылок загружаются здесь, а не при импорте модулей
+    create_app()
+    
     # Отладочная информация (скрываем часть токена для безопасности)
     token_preview = BOT_TOKEN[:10] + "..." + BOT_TOKEN[-10:] if len(BOT_TOKEN) > 20 else "Токен слишком короткий"
     logger.info(f"Токен: {token_preview}")
@@ -437,7 +387,11 @@ async def main():
     
     try:
         # Создаем бота и диспетчер
-        bot = Bot(token=BOT_TOKEN)
+        session = None
+        if TELEGRAM_API_URL:
+            logger.info(f"Bot API: {TELEGRAM_API_URL}")
+            session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+        bot = Bot(token=BOT_TOKEN, session=session)
         dp = Dispatcher(storage=MemoryStorage())
         
         # Автоматически удаляем завершенные отпуска при запуске
@@ -464,8 +418,10 @@ async def main():
         dp.message.register(reports_list_command, Command('reports'))
         dp.message.register(users_command, Command('users'))
         dp.message.register(stats_command, Command('stats'))
+        dp.message.register(iostats_command, Command('iostats'))
         dp.message.register(help_command, Command('help'))
         dp.message.register(schedule_command, Command('schedule'))
+        dp.message.register(jobs_command, Command('jobs'))
         
         # Команды напоминаний
         dp.message.register(reminders_set_command, F.text.startswith('/reminders '))
@@ -484,6 +440,7 @@ async def main():
         dp.message.register(weekends_command, Command('weekends'))
         dp.message.register(holidays_command, Command('holidays'))
         dp.message.register(vacations_command, Command('vacations'))
+        dp.message.register(importvacations_command, Command('importvacations'))
         
         # Месячные отчеты
         dp.message.register(mymonth_command, Command('mymonth'))
@@ -494,10 +451,12 @@ async def main():
         dp.callback_query.register(confirm_delete_callback, F.data.startswith('confirm_delete_'))
         dp.callback_query.register(confirm_delete_callback, F.data == 'cancel_delete')
         dp.callback_query.register(users_page_callback, F.data.startswith('users_page_'))
+        dp.callback_query.register(reports_page_callback, F.data.startswith('reports_page_'))
         
         # Callback обработчики для отпусков
         dp.callback_query.register(vacation_page_callback, F.data.startswith('vacation_page_'))
         dp.callback_query.register(vacation_select_callback, F.data.startswith('vacation_select_'))
+        dp.callback_query.register(vacation_add_callback, F.data.startswith('vacation_add_'))
         dp.callback_query.register(vacation_edit_callback, F.data.startswith('vacation_edit_'))
         dp.callback_query.register(vacation_cancel_callback, F.data == 'vacation_cancel')
         dp.callback_query.register(vacations_page_callback, F.data.startswith('vacations_page_'))
@@ -512,6 +471,9 @@ async def main():
         dp.message.register(vacation_dates_handler, VacationStates.waiting_for_dates)
         dp.message.register(vacation_edit_dates_handler, VacationStates.waiting_for_edit_dates)
         
+        # Досылаем рассылки, прерванные прошлым перезапуском
+        outbox_task_handle = asyncio.create_task(outbox.drain(bot))
+        
         # Запускаем планировщик как фоновую задачу
         scheduler_task_handle = asyncio.create_task(scheduler_task(bot))
         
@@ -530,13 +492,19 @@ async def main():
         logger.error(f"Ошибка запуска бота: {e}")
         return
     finally:
-        # Отменяем фоновую задачу при завершении
+        # Сначала останавливаем фоновые задачи (планировщик дожидается своих задач),
+        # чтобы их изменения попали в финальный сброс на диск
+        background = []
+        if 'outbox_task_handle' in locals():
+            background.append(outbox_task_handle)
         if 'scheduler_task_handle' in locals():
-            scheduler_task_handle.cancel()
-            try:
-                await scheduler_task_handle
-            except asyncio.CancelledError:
-                pass
+            background.append(scheduler_task_handle)
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        
+        # Сбрасываем на диск все отложенные изменения и останавливаем пул ввода-вывода
+        await close_app()
 
 
 if __name__ == '__main__':
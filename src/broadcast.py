@@ -0,0 +1,166 @@
+"""
+Массовая рассылка сообщений: ограниченная параллельность и общий лимит скорости
+
+Telegram допускает около 30 сообщений в секунду на бота. Все рассылки
+(опросы, напоминания, месячные отчеты) проходят через один token bucket,
+при TelegramRetryAfter отправка приостанавливается целиком.
+"""
+import asyncio
+import random
+
+from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError, TelegramServerError
+
+from config import (
+    BROADCAST_RATE, BROADCAST_CONCURRENCY, BROADCAST_MAX_RETRIES, BROADCAST_MAX_FLOOD_WAITS, logger
+)
+from io_executor import percentile
+
+# Базовая задержка повтора при временных ошибках (удваивается с каждой попыткой)
+RETRY_BASE_DELAY = 1.0
+
+
+class TokenBucket:
+    """Глобальный лимит скорости отправки"""
+
+    def __init__(self, rate=BROADCAST_RATE, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = None
+        self.paused_until = 0.0
+        self._lock = None
+
+    async def acquire(self):
+        """Ждет, пока можно отправить следующее сообщение"""
+        loop = asyncio.get_running_loop()
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                if self.updated is not None:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Останавливает все отправки на seconds секунд (ответ 429 от Telegram)"""
+        now = asyncio.get_running_loop().time()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0
+
+
+class BroadcastResult:
+    """Итоги рассылки"""
+
+    def __init__(self, name, total):
+        self.name = name
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.duration = 0.0
+        self.lags = []  # секунды от начала рассылки до доставки каждого сообщения
+
+    @property
+    def throughput(self):
+        return self.sent / self.duration if self.duration > 0 else 0.0
+
+    def summary(self):
+        return (
+            f"Рассылка {self.name}: доставлено {self.sent} из {self.total}, ошибок {self.failed}, "
+            f"повторов {self.retries}, {self.duration:.1f} с ({self.throughput:.1f} сообщ/с), "
+            f"задержка доставки p50 {percentile(self.lags, 0.5):.1f} с, p99 {percentile(self.lags, 0.99):.1f} с"
+        )
+
+
+class Broadcaster:
+    """Отправка сообщений с ограниченной параллельностью, лимитом скорости и повторами"""
+
+    def __init__(self, bucket=None, concurrency=BROADCAST_CONCURRENCY, max_retries=BROADCAST_MAX_RETRIES,
+                 max_flood_waits=BROADCAST_MAX_FLOOD_WAITS):
+        self.bucket = bucket or TokenBucket()
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.max_flood_waits = max_flood_waits
+        self.last_results = {}
+
+    async def send(self, bot_instance, chat_id, result=None, **kwargs):
+        """Отправляет одно сообщение через общий лимит; возвращает True при успехе"""
+        attempt = 0
+        flood_waits = 0
+        while True:
+            await self.bucket.acquire()
+            try:
+                await bot_instance.send_message(chat_id=int(chat_id), **kwargs)
+                return True
+            except TelegramRetryAfter as e:
+                # Flood control: пауза для всех отправок; такие повторы считаются отдельно
+                self.bucket.pause(e.retry_after)
+                flood_waits += 1
+                if flood_waits > self.max_flood_waits:
+                    logger.error(f"Не удалось отправить сообщение {chat_id}: {flood_waits} ответов 429 подряд")
+                    return False
+                logger.warning(f"Telegram просит подождать {e.retry_after} с (chat {chat_id})")
+            except (TelegramNetworkError, TelegramServerError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    logger.error(f"Не удалось отправить сообщение {chat_id} после {self.max_retries} повторов: {e}")
+                    return False
+                delay = RETRY_BASE_DELAY * 2 ** (attempt - 1) * (1 + random.random() / 2)
+                logger.warning(f"Временная ошибка отправки {chat_id}, повтор через {delay:.1f} с: {e}")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                # Пользователь заблокировал бота, чат не найден и т.п. - повторять бессмысленно
+                logger.error(f"Ошибка отправки сообщения {chat_id}: {e}")
+                return False
+            if result is not None:
+                result.retries += 1
+
+    async def broadcast(self, bot_instance, messages, name, on_result=None):
+        """
+        Рассылает messages = [(chat_id, параметры send_message)], возвращает BroadcastResult.
+        on_result(index, ok) вызывается после окончательного результата по каждому сообщению.
+        """
+        messages = list(messages)
+        result = BroadcastResult(name, len(messages))
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        queue = iter(enumerate(messages))
+
+        async def worker():
+            for index, (chat_id, kwargs) in queue:
+                ok = await self.send(bot_instance, chat_id, result=result, **kwargs)
+                if ok:
+                    result.sent += 1
+                    result.lags.append(loop.time() - started)
+                else:
+                    result.failed += 1
+                if on_result is not None:
+                    # Ошибка учета одного сообщения не должна останавливать воркер и рассылку
+                    try:
+                        await on_result(index, ok)
+                    except Exception as e:
+                        logger.error(f"Ошибка обработки результата рассылки {name} ({chat_id}): {e}")
+
+        workers = min(self.concurrency, len(messages))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+        result.duration = loop.time() - started
+        self.last_results[name] = result
+        if messages:
+            logger.info(result.summary())
+        return result
+
+
+# Создаем глобальный экземпляр
+broadcaster = Broadcaster()
@@ -1,7 +1,6 @@
 """
 Обработчики команд бота
 """
-import csv
 from datetime import datetime
 from collections import Counter
 from pathlib import Path
@@ -16,7 +15,13 @@ from config import (
     MANAGER_CHAT_ID, MSK_TZ, MOOD_OPTIONS,
     REPORTS_DIR, logger
 )
-from database import feedback_bot, calendar
+from database import feedback_bot, get_calendar
+from rollups import add_response, day_bits, longest_streak
+from vacations import make_vacation, parse_date_range, parse_vacation, parse_vacation_lines
+from io_executor import io_executor
+from scheduler import scheduler
+from export import CSV_HEADER, export_csv_async, export_path, report_row
+from report_catalog import report_catalog
 
 
 # FSM состояния
@@ -59,6 +64,10 @@ async def start_command(message: Message):
     
     feedback_bot.save_users()
     
+    # Если сегодняшний опрос уже разослан, новый сотрудник попадает в напоминания
+    # (отпуск и admin_as_employee проверяются при отправке напоминания)
+    feedback_bot.add_pending_responder(datetime.now(MSK_TZ).strftime('%Y-%m-%d'), chat_id)
+    
     if chat_id == MANAGER_CHAT_ID:
         survey_time = feedback_bot.schedule_settings.get("survey_time", "17:00")
         report_time = feedback_bot.schedule_settings.get("report_time", "21:00")
@@ -71,6 +80,7 @@ async def start_command(message: Message):
             "• `/createreport` - создать отчет заново\n"
             "• `/download` - скачать CSV за сегодня\n"
             "• `/download ДД.ММ.ГГГГ` - CSV за дату\n"
+            "• `/download ДД.ММ.ГГГГ-ДД.ММ.ГГГГ [gz]` - CSV за период\n"
             "• `/reports` - список всех отчетов\n"
             "• `/stats` - статистика по боту\n\n"
             "👥 **УПРАВЛЕНИЕ СОТРУДНИКАМИ**\n"
@@ -129,11 +139,15 @@ async def help_command(message: Message):
             "• `/createreport` - создать отчет (перезапишет старый)\n"
             "• `/download` - скачать CSV за сегодня\n"
             "• `/download ДД.ММ.ГГГГ` - скачать за дату\n"
+            "• `/download ДД.ММ.ГГГГ-ДД.ММ.ГГГГ [gz]` - скачать за период\n"
             "• `/reports` - список всех отчетов\n"
             "• `/users` - управление пользователями\n"
+            "• `/users top` - по участию, `/users имя` - поиск\n"
             "• `/stats` - статистика по пользователям\n"
+            "• `/iostats` - статистика дисковых операций\n"
             "• `/test` - тестовый опрос\n"
             "• `/schedule` - посмотреть расписание\n"
+            "• `/jobs` - ближайшие запуски задач\n"
             "• `/help` - эта справка\n\n"
             "⏰ **Напоминания:**\n"
             "• `/reminders` - настройки напоминаний\n"
@@ -145,8 +159,9 @@ async def help_command(message: Message):
             "• `/sunday on/off` - воскресенье рабочий/выходной\n"
             "• `/holidays` - список праздников РФ\n"
             "• `/vacation @user ДД.ММ.ГГГГ-ДД.ММ.ГГГГ` - назначить отпуск\n"
+            "• `/importvacations` - назначить отпуска списком (по строке на отпуск)\n"
             "• `/vacations` - список отпусков\n"
-            "• `/removevacation @user` - отменить отпуск\n\n"
+            "• `/removevacation @user [ДД.ММ.ГГГГ]` - отменить отпуск\n\n"
             "⏰ **Расписание:**\n"
             "• `/setsurvey ЧЧ:ММ` - изменить время опроса\n"
             "• `/setreport ЧЧ:ММ` - изменить время отчета\n"
@@ -207,6 +222,7 @@ async def menu_button_handler(message: Message):
         "• `/createreport` - создать отчет заново\n"
         "• `/download` - скачать CSV за сегодня\n"
         "• `/download ДД.ММ.ГГГГ` - CSV за дату\n"
+        "• `/download ДД.ММ.ГГГГ-ДД.ММ.ГГГГ [gz]` - CSV за период\n"
         "• `/reports` - список всех отчетов\n"
         "• `/stats` - статистика по боту\n\n"
         "👥 **УПРАВЛЕНИЕ СОТРУДНИКАМИ**\n"
@@ -267,20 +283,19 @@ async def mood_callback(callback: CallbackQuery, state: FSMContext):
     
     today = datetime.now(MSK_TZ).strftime('%Y-%m-%d')
     
-    if today not in feedback_bot.responses:
-        feedback_bot.responses[today] = {}
-    
     # Получаем данные пользователя безопасно
     user_data = feedback_bot.users.get(user_id, {})
     username = user_data.get('username', 'Неизвестный')
     
-    feedback_bot.responses[today][user_id] = {
+    # Ответ сразу дописывается в журнал, сводки обновляются тут же
+    feedback_bot.record_response(today, user_id, {
         'username': username,
         'mood': mood,
         'mood_text': MOOD_OPTIONS[mood]['text'],
         'mood_emoji': MOOD_OPTIONS[mood]['emoji'],
         'timestamp': datetime.now(MSK_TZ).isoformat()
-    }
+    })
+    feedback_bot.mark_responded(today, user_id)
     
     try:
         await callback.message.edit_text(f"Ты выбрал: {MOOD_OPTIONS[mood]['emoji']} {MOOD_OPTIONS[mood]['text']}")
@@ -288,7 +303,6 @@ async def mood_callback(callback: CallbackQuery, state: FSMContext):
         
         # Устанавливаем состояние ожидания проекта
         await state.set_state(FeedbackStates.waiting_for_project)
-        feedback_bot.save_responses()
         
     except Exception as e:
         logger.error(f"Ошибка обработки выбора настроения: {e}")
@@ -316,12 +330,12 @@ async def project_message(message: Message, state: FSMContext):
         await message.answer("❌ Недопустимый текст. Пожалуйста, опишите проект корректно.")
         return
     
-    if (today in feedback_bot.responses and user_id in feedback_bot.responses[today]):
-        feedback_bot.responses[today][user_id]['project'] = project_text
-        feedback_bot.responses[today][user_id]['completed_at'] = datetime.now(MSK_TZ).isoformat()
+    feedback_bot.update_response(today, user_id, {
+        'project': project_text,
+        'completed_at': datetime.now(MSK_TZ).isoformat()
+    })
     
     await state.clear()
-    feedback_bot.save_responses()
     
     survey_time = feedback_bot.schedule_settings.get("survey_time", "17:00")
     await message.answer(f"Спасибо за обратную связь! 👍\nУвидимся завтра в {survey_time}.")
@@ -331,23 +345,26 @@ async def project_message(message: Message, state: FSMContext):
 # КОМАНДЫ АДМИНИСТРАТОРА - ОТЧЕТЫ
 # ============================================================================
 
+def responses_version(date_str):
+    """Версия ответов дня; id хранилища - на случай, если ответы загружены заново"""
+    return (id(feedback_bot.responses), feedback_bot.responses.day_version(date_str))
+
+
 async def save_report_to_csv(date_str, responses):
-    """Сохраняет отчет в CSV формате для Excel"""
+    """Сохраняет отчет в CSV формате для Excel (если ответы дня не менялись - оставляет прежний файл)"""
     try:
-        csv_file = REPORTS_DIR / f"report_{date_str}.csv"
+        csv_file = report_catalog.path(date_str)
+        version = responses_version(date_str)
         
-        with open(csv_file, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Дата', 'Пользователь', 'Настроение', 'Проект', 'Время ответа'])
-            
-            for response in responses.values():
-                writer.writerow([
-                    date_str,
-                    response['username'],
-                    f"{response['mood_emoji']} {MOOD_OPTIONS[response['mood']]['text']}",
-                    response.get('project', 'Не указан'),
-                    response.get('completed_at', response['timestamp'])
-                ])
+        # Файл мог быть удален или изменен вручную - это проверяется по каталогу
+        if await report_catalog.is_fresh(date_str, version):
+            logger.info(f"Ответы за {date_str} не менялись, CSV не пересоздается: {csv_file}")
+            return csv_file
+        
+        # Строки собираем в event loop, пока ответы не изменились, пишем - в пуле
+        # (файл с тем же содержимым не перезаписывается и сохраняет file_id)
+        rows = [report_row(date_str, response) for response in responses.values()]
+        await report_catalog.write(date_str, rows, CSV_HEADER, version)
         
         logger.info(f"Отчет сохранен в CSV: {csv_file}")
         return csv_file
@@ -358,7 +375,7 @@ async def save_report_to_csv(date_str, responses):
 
 
 async def send_csv_file(bot_instance, chat_id, csv_path, date_str):
-    """Отправляет CSV файл в Telegram"""
+    """Отправляет CSV файл в Telegram; False - если отправить не удалось"""
     try:
         # Конвертируем дату в русский формат для отображения
         try:
@@ -367,15 +384,26 @@ async def send_csv_file(bot_instance, chat_id, csv_path, date_str):
         except:
             formatted_date = date_str
         
-        file = FSInputFile(csv_path)
-        await bot_instance.send_document(
-            chat_id=chat_id,
-            document=file,
-            caption=f"📎 Отчет за {formatted_date} в формате CSV\n\nОткройте в Excel для удобного просмотра."
-        )
+        caption = f"📎 Отчет за {formatted_date} в формате CSV\n\nОткройте в Excel для удобного просмотра."
+        
+        # Тот же файл, что уже загружался, отправляется по file_id без повторной загрузки
+        entry = await report_catalog.current(date_str)
+        if entry and entry['file_id']:
+            try:
+                await bot_instance.send_document(chat_id=chat_id, document=entry['file_id'], caption=caption)
+                logger.info(f"CSV файл отправлен повторно по file_id: {csv_path}")
+                return True
+            except Exception as e:
+                logger.warning(f"Не удалось отправить CSV по file_id, загружаю заново: {e}")
+        
+        sent = await bot_instance.send_document(chat_id=chat_id, document=FSInputFile(csv_path), caption=caption)
+        if entry and sent and sent.document:
+            await report_catalog.set_file_id(date_str, entry, sent.document.file_id)
         logger.info(f"CSV файл отправлен: {csv_path}")
+        return True
     except Exception as e:
         logger.error(f"Ошибка отправки CSV файла: {e}")
+        return False
 
 
 async def report_command(message: Message, bot_instance):
@@ -405,10 +433,10 @@ async def force_report_command(message: Message, bot_instance):
     csv_file = REPORTS_DIR / f"report_{today}.csv"
     
     # Проверяем существует ли отчет
-    file_exists = csv_file.exists()
+    file_exists = await io_executor.run('report_exists', csv_file.exists)
     
     if file_exists:
-        await message.answer("⚠️ Отчет за сегодня уже существует. Создаю новый (старый будет заменен)...")
+        await message.answer("⚠️ Отчет за сегодня уже существует. Обновляю (CSV пересоздается, только если ответы изменились)...")
     else:
         await message.answer("📊 Создаю отчет за сегодня...")
     
@@ -431,7 +459,17 @@ async def download_command(message: Message, bot_instance):
         return
     
     # Парсим аргументы команды
-    args = message.text.split(maxsplit=1)
+    args = message.text.split()
+    
+    if len(args) > 1:
+        # Период ДД.ММ.ГГГГ-ДД.ММ.ГГГГ - одна выгрузка из хранилища ответов
+        try:
+            start_date, end_date = parse_date_range(args[1])
+        except ValueError:
+            pass
+        else:
+            await download_period(message, bot_instance, start_date, end_date, compress='gz' in args[2:])
+            return
     
     if len(args) == 1:
         # Без аргументов - отчет за сегодня
@@ -453,13 +491,14 @@ async def download_command(message: Message, bot_instance):
                 await message.answer(
                     "❌ Неверный формат даты. Используйте:\n"
                     "• `/download` - отчет за сегодня\n"
-                    "• `/download ДД.ММ.ГГГГ` - отчет за конкретную дату"
+                    "• `/download ДД.ММ.ГГГГ` - отчет за конкретную дату\n"
+                    "• `/download ДД.ММ.ГГГГ-ДД.ММ.ГГГГ [gz]` - все ответы за период"
                 )
                 return
     
     csv_file = REPORTS_DIR / f"report_{date_str}.csv"
     
-    if not csv_file.exists():
+    if not await io_executor.run('report_exists', csv_file.exists):
         await message.answer(
             f"❌ Отчет за {date_str} не найден.\n\n"
             "Возможные причины:\n"
@@ -473,6 +512,42 @@ async def download_command(message: Message, bot_instance):
     await send_csv_file(bot_instance, message.chat.id, csv_file, date_str)
 
 
+async def download_period(message: Message, bot_instance, start_date, end_date, compress=False):
+    """Выгрузка ответов за период в один CSV (при compress - .csv.gz)"""
+    if end_date < start_date:
+        await message.answer("❌ Дата окончания раньше даты начала.")
+        return
+    
+    period = f"{start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}"
+    await message.answer(f"⏳ Собираю ответы за {period}...")
+    
+    csv_path = export_path(start_date, end_date, compress)
+    try:
+        rows_count = await export_csv_async(feedback_bot.responses, start_date, end_date, csv_path, compress)
+    except Exception as e:
+        logger.error(f"Ошибка выгрузки за {period}: {e}")
+        await message.answer("❌ Не удалось собрать выгрузку. Подробности в логах.")
+        return
+    
+    if not rows_count:
+        await io_executor.run('export_remove', csv_path.unlink)
+        await message.answer(f"❌ За {period} нет ни одного ответа.")
+        return
+    
+    try:
+        await bot_instance.send_document(
+            chat_id=message.chat.id,
+            document=FSInputFile(csv_path),
+            caption=f"📎 Ответы за {period}: {rows_count} строк\n\nОткройте в Excel для удобного просмотра."
+        )
+        logger.info(f"Выгрузка отправлена: {csv_path} ({rows_count} строк)")
+    except Exception as e:
+        logger.error(f"Ошибка отправки выгрузки: {e}")
+
+
+REPORTS_PER_PAGE = 10
+
+
 async def reports_list_command(message: Message):
     """Команда для просмотра списка всех отчетов (только для админа)"""
     user_id = str(message.from_user.id)
@@ -481,42 +556,71 @@ async def reports_list_command(message: Message):
         await message.answer("❌ Эта команда доступна только администратору.")
         return
     
-    # Получаем все CSV файлы
-    csv_files = sorted(REPORTS_DIR.glob("report_*.csv"), reverse=True)
+    await show_reports_page(message)
+
+
+async def show_reports_page(message_or_callback, page=0, edit=False):
+    """Страница списка отчетов из каталога (папка сверяется с каталогом, только если менялась)"""
+    try:
+        await report_catalog.refresh()
+    except Exception as e:
+        logger.error(f"Ошибка сверки каталога отчетов: {e}")
+    reports = report_catalog.reports()
     
-    if not csv_files:
-        await message.answer("📁 Отчеты пока не созданы.\n\nОтчеты создаются автоматически после опроса.")
-        return
+    total_reports = len(reports)
+    total_pages = (total_reports + REPORTS_PER_PAGE - 1) // REPORTS_PER_PAGE
     
-    # Формируем список
-    report_list = "📁 **Доступные отчеты:**\n\n"
+    if total_pages == 0:
+        text = "📁 Отчеты пока не созданы.\n\nОтчеты создаются автоматически после опроса."
+        keyboard = None
+    else:
+        page = max(0, min(page, total_pages - 1))
+        start_idx = page * REPORTS_PER_PAGE
+        
+        text = f"📁 **Доступные отчеты** ({total_reports})\n"
+        text += f"Страница {page + 1} из {total_pages}\n\n"
+        
+        for idx, (date_str, entry) in enumerate(reports[start_idx:start_idx + REPORTS_PER_PAGE], start=start_idx + 1):
+            formatted_date = datetime.strptime(date_str, '%Y-%m-%d').strftime('%d.%m.%Y')
+            text += f"{idx}. {formatted_date} - {entry['size'] / 1024:.1f} KB, ответов: {entry['rows']}\n"
+        
+        text += (
+            "\n**Как скачать:**\n"
+            "• `/download` - отчет за сегодня\n"
+            "• `/download ДД.ММ.ГГГГ` - отчет за конкретную дату\n"
+            "• `/download ДД.ММ.ГГГГ-ДД.ММ.ГГГГ` - все ответы за период одним файлом"
+        )
+        
+        keyboard = None
+        if total_pages > 1:
+            nav_buttons = []
+            if page > 0:
+                nav_buttons.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"reports_page_{page - 1}"))
+            nav_buttons.append(InlineKeyboardButton(text=f"{page+1}/{total_pages}", callback_data="reports_page_current"))
+            if page < total_pages - 1:
+                nav_buttons.append(InlineKeyboardButton(text="Вперед ▶️", callback_data=f"reports_page_{page + 1}"))
+            keyboard = InlineKeyboardMarkup(inline_keyboard=[nav_buttons])
     
-    for i, csv_file in enumerate(csv_files[:10], 1):
-        # Извлекаем дату из имени файла
-        date_str = csv_file.stem.replace('report_', '')
-        try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            formatted_date = date_obj.strftime('%d.%m.%Y')
-            
-            # Получаем размер файла
-            file_size = csv_file.stat().st_size
-            size_kb = file_size / 1024
-            
-            report_list += f"{i}. {formatted_date} - {size_kb:.1f} KB\n"
-        except:
-            continue
+    # Отправляем или редактируем сообщение
+    if edit and isinstance(message_or_callback, CallbackQuery):
+        await message_or_callback.message.edit_text(text, reply_markup=keyboard, parse_mode='Markdown')
+    else:
+        msg = message_or_callback if isinstance(message_or_callback, Message) else message_or_callback.message
+        await msg.answer(text, reply_markup=keyboard, parse_mode='Markdown')
+
+
+async def reports_page_callback(callback: CallbackQuery):
+    """Обработчик переключения страниц списка отчетов"""
+    await callback.answer()
     
-    if len(csv_files) > 10:
-        report_list += f"\n... и еще {len(csv_files) - 10} отчетов\n"
+    if str(callback.from_user.id) != MANAGER_CHAT_ID:
+        return
     
-    report_list += (
-        f"\n📊 Всего отчетов: {len(csv_files)}\n\n"
-        "**Как скачать:**\n"
-        "• `/download` - отчет за сегодня\n"
-        "• `/download ДД.ММ.ГГГГ` - отчет за конкретную дату"
-    )
+    if callback.data == "reports_page_current":
+        return
     
-    await message.answer(report_list, parse_mode='Markdown')
+    page = int(callback.data.replace('reports_page_', ''))
+    await show_reports_page(callback, page=page, edit=True)
 
 
 async def stats_command(message: Message):
@@ -528,7 +632,7 @@ async def stats_command(message: Message):
         return
     
     total_users = len(feedback_bot.users)
-    total_days = len(feedback_bot.responses)
+    total_days = feedback_bot.rollups.total_days()
     
     # Считаем админов и обычных пользователей
     admin_count = sum(1 for user in feedback_bot.users.values() if user.get('is_admin', False))
@@ -540,11 +644,11 @@ async def stats_command(message: Message):
     stats += f"👤 Сотрудников: {employee_count}\n"
     stats += f"📅 Дней с ответами: {total_days}\n"
     
-    if feedback_bot.responses:
+    if total_days:
         # Статистика по последним 7 дням
-        recent_days = sorted(feedback_bot.responses.keys())[-7:]
+        recent_days = feedback_bot.rollups.recent_day_counts(7)
         avg_response_rate = sum(
-            len(feedback_bot.responses[day]) for day in recent_days
+            count for _, count in recent_days
         ) / len(recent_days) if recent_days else 0
         
         stats += f"📊 Средняя активность (7 дней): {avg_response_rate:.1f} ответов/день\n"
@@ -557,6 +661,36 @@ async def stats_command(message: Message):
     await message.answer(stats, parse_mode='Markdown')
 
 
+async def iostats_command(message: Message):
+    """Команда статистики дисковых операций (только для админа)"""
+    user_id = str(message.from_user.id)
+    
+    if user_id != MANAGER_CHAT_ID:
+        await message.answer("❌ Эта команда доступна только администратору.")
+        return
+    
+    metrics = io_executor.snapshot()
+    
+    text = "💾 Дисковые операции\n\n"
+    text += f"Очередь: {metrics['queued']}, в работе: {metrics['running']}\n"
+    text += f"Максимум одновременно: {metrics['max_depth']} "
+    text += f"(потоков {metrics['max_workers']}, очередь до {metrics['max_queue']})\n\n"
+    
+    if not metrics['operations']:
+        text += "Операций пока не было."
+    
+    for op, stats in metrics['operations'].items():
+        text += f"• {op}: {stats['count']} шт."
+        if stats['errors']:
+            text += f", ошибок {stats['errors']}"
+        text += (
+            f"\n   ⏱ ср. {stats['run_avg_ms']:.1f} мс, p95 {stats['run_p95_ms']:.1f} мс, "
+            f"макс {stats['run_max_ms']:.1f} мс, ожидание {stats['wait_avg_ms']:.1f} мс\n"
+        )
+    
+    await message.answer(text)
+
+
 async def schedule_command(message: Message):
     """Команда для просмотра текущего расписания (только для админа)"""
     user_id = str(message.from_user.id)
@@ -595,6 +729,10 @@ async def schedule_command(message: Message):
     if reminders_enabled and reminder_times:
         schedule_message += f"• Время: {', '.join(reminder_times)}\n"
     
+    today = datetime.now(MSK_TZ).strftime('%Y-%m-%d')
+    if feedback_bot.pending_responders["date"] == today:
+        schedule_message += f"• Ожидают ответа на сегодняшний опрос: {len(feedback_bot.get_pending_responders(today))}\n"
+    
     schedule_message += (
         f"\n👤 **Администратор как сотрудник:** {admin_status}\n"
         f"\n⚙️ **Изменение расписания:**\n"
@@ -607,6 +745,35 @@ async def schedule_command(message: Message):
     await message.answer(schedule_message, parse_mode='Markdown')
 
 
+async def jobs_command(message: Message):
+    """Команда для просмотра ближайших запусков задач планировщика (только для админа)"""
+    user_id = str(message.from_user.id)
+    
+    if user_id != MANAGER_CHAT_ID:
+        await message.answer("❌ Эта команда доступна только администратору.")
+        return
+    
+    upcoming = scheduler.upcoming()
+    if not upcoming:
+        await message.answer("📋 Планировщик еще не запущен или задач нет.")
+        return
+    
+    now = datetime.now(MSK_TZ)
+    text = "📋 Ближайшие задачи\n\n"
+    for run_at, job in upcoming:
+        minutes = int((run_at - now).total_seconds() // 60)
+        text += f"• {run_at.strftime('%d.%m %H:%M')} - {job.title}"
+        text += f" (через {minutes // 60} ч {minutes % 60} мин)"
+        last_run = scheduler.last_run(job.name)
+        if last_run:
+            text += f", прошлый запуск {last_run.strftime('%d.%m %H:%M')}"
+        if job.name in scheduler.running:
+            text += ", выполняется"
+        text += "\n"
+    
+    await message.answer(text)
+
+
 # ============================================================================
 # УПРАВЛЕНИЕ ПОЛЬЗОВАТЕЛЯМИ
 # ============================================================================
@@ -623,21 +790,62 @@ async def users_command(message: Message):
         await message.answer("👥 Пользователей пока нет.")
         return
 
+    # /users top - по участию, /users текст - поиск по имени, можно вместе: /users top текст
+    args = message.text.split(maxsplit=1)[1:] if message.text else []
+    query = args[0].strip() if args else ''
+    sort_by_participation = False
+    if query.split(maxsplit=1)[:1] == ['top']:
+        sort_by_participation = True
+        query = query[3:].strip()
+    
+    # Запрос передается в кнопках листания целиком: обрезанный дал бы на других страницах другой список
+    if len(query.encode('utf-8')) > USERS_QUERY_MAX_BYTES:
+        await message.answer(
+            f"❌ Слишком длинный запрос для поиска: не больше {USERS_QUERY_MAX_BYTES} байт "
+            f"(около {USERS_QUERY_MAX_BYTES // 2} русских букв). Сократите запрос."
+        )
+        return
+
     # Показываем первую страницу
-    await show_users_page(message, page=0)
+    await show_users_page(message, page=0, sort_by_participation=sort_by_participation, query=query)
+
 
+# callback_data кнопок листания: users_page_<страница>_<p|n>_<поиск>, Telegram ограничивает ее 64 байтами
+USERS_PAGE_DATA_LIMIT = 64
+USERS_QUERY_MAX_BYTES = USERS_PAGE_DATA_LIMIT - len('users_page_9999_p_')
 
-async def show_users_page(message_or_callback, page=0, edit=False):
+
+def users_page_data(page, sort_by_participation, query):
+    """callback_data страницы списка пользователей (запрос не обрезается - см. users_command)"""
+    data = f"users_page_{page}_{'p' if sort_by_participation else 'n'}_{query}"
+    if len(data.encode('utf-8')) > USERS_PAGE_DATA_LIMIT:
+        raise ValueError(f"Запрос «{query}» не помещается в callback_data")
+    return data
+
+
+async def show_users_page(message_or_callback, page=0, edit=False, sort_by_participation=False, query=''):
     """Показывает страницу со списком пользователей"""
     USERS_PER_PAGE = 10
     
     # Получаем список пользователей (исключая админа)
     users_list = [(uid, data) for uid, data in feedback_bot.users.items() if uid != MANAGER_CHAT_ID]
+    
+    if query:
+        needle = query.lower().lstrip('@')
+        users_list = [
+            (uid, data) for uid, data in users_list
+            if needle in data.get('first_name', '').lower() or needle in data.get('username', '').lower()
+        ]
+    
+    if sort_by_participation:
+        totals = feedback_bot.rollups.user_totals([uid for uid, _ in users_list])
+        users_list.sort(key=lambda item: totals[item[0]], reverse=True)
+    
     total_users = len(users_list)
     total_pages = (total_users + USERS_PER_PAGE - 1) // USERS_PER_PAGE
     
     if total_pages == 0:
-        text = "👥 Нет сотрудников для управления"
+        text = f"👥 Никого не найдено по запросу «{query}»" if query else "👥 Нет сотрудников для управления"
         keyboard = None
     else:
         # Ограничиваем страницу
@@ -649,8 +857,13 @@ async def show_users_page(message_or_callback, page=0, edit=False):
         page_users = users_list[start_idx:end_idx]
         
         # Формируем текст
-        total_days = len(feedback_bot.responses)
+        total_days = feedback_bot.rollups.total_days()
+        response_counts = feedback_bot.rollups.user_totals([chat_id for chat_id, _ in page_users])
         text = f"👥 Пользователи ({total_users})\n"
+        if query:
+            text += f"🔍 Поиск: {query}\n"
+        if sort_by_participation:
+            text += "📈 По участию\n"
         text += f"Страница {page + 1} из {total_pages}\n\n"
         
         keyboard_buttons = []
@@ -660,7 +873,7 @@ async def show_users_page(message_or_callback, page=0, edit=False):
             first_name = user_data.get('first_name', 'Неизвестный')
             
             # Считаем ответы
-            user_responses = sum(1 for day_resp in feedback_bot.responses.values() if chat_id in day_resp)
+            user_responses = response_counts[chat_id]
             participation = (user_responses / total_days * 100) if total_days > 0 else 0
             
             text += f"{idx}. {first_name} (@{username})\n"
@@ -677,10 +890,14 @@ async def show_users_page(message_or_callback, page=0, edit=False):
         # Кнопки навигации
         nav_buttons = []
         if page > 0:
-            nav_buttons.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"users_page_{page-1}"))
+            nav_buttons.append(InlineKeyboardButton(
+                text="◀️ Назад", callback_data=users_page_data(page - 1, sort_by_participation, query)
+            ))
         nav_buttons.append(InlineKeyboardButton(text=f"{page+1}/{total_pages}", callback_data="users_page_current"))
         if page < total_pages - 1:
-            nav_buttons.append(InlineKeyboardButton(text="Вперед ▶️", callback_data=f"users_page_{page+1}"))
+            nav_buttons.append(InlineKeyboardButton(
+                text="Вперед ▶️", callback_data=users_page_data(page + 1, sort_by_participation, query)
+            ))
         
         keyboard_buttons.append(nav_buttons)
         keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
@@ -704,8 +921,12 @@ async def users_page_callback(callback: CallbackQuery):
     if callback.data == "users_page_current":
         return
     
-    page = int(callback.data.split('_')[-1])
-    await show_users_page(callback, page=page, edit=True)
+    # users_page_<страница>_<p|n>_<поиск> (старые кнопки: users_page_<страница>)
+    parts = callback.data.split('_', 4)
+    page = int(parts[2])
+    sort_by_participation = len(parts) > 3 and parts[3] == 'p'
+    query = parts[4] if len(parts) > 4 else ''
+    await show_users_page(callback, page=page, edit=True, sort_by_participation=sort_by_participation, query=query)
 
 
 async def delete_user_callback(callback: CallbackQuery):
@@ -768,12 +989,8 @@ async def confirm_delete_callback(callback: CallbackQuery):
         username = user_data.get('first_name', 'Неизвестный')
         user_username = user_data.get('username', 'Неизвестный')
         
-        # Удаляем отпуск если есть
-        vacations = feedback_bot.holidays_settings.get("vacations", {})
-        had_vacation = user_to_delete in vacations
-        if had_vacation:
-            del feedback_bot.holidays_settings["vacations"][user_to_delete]
-            feedback_bot.save_holidays_settings(feedback_bot.holidays_settings)
+        # Удаляем отпуска если есть
+        had_vacation = bool(feedback_bot.remove_vacations(user_to_delete))
         
         # Удаляем пользователя
         del feedback_bot.users[user_to_delete]
@@ -782,7 +999,7 @@ async def confirm_delete_callback(callback: CallbackQuery):
         # Логируем удаление
         logger.info(f"Администратор удалил пользователя: {username} (@{user_username}, ID: {user_to_delete})")
         
-        vacation_note = "\n\n📅 Отпуск пользователя также удален" if had_vacation else ""
+        vacation_note = "\n\n📅 Отпуска пользователя также удалены" if had_vacation else ""
         
         await callback.message.edit_text(
             f"✅ Пользователь удален\n\n"
@@ -859,17 +1076,20 @@ async def reminders_set_command(message: Message):
         
         feedback_bot.reminder_settings["times"] = valid_times
         feedback_bot.save_reminder_settings(feedback_bot.reminder_settings)
+        scheduler.replan()
         
         await message.answer(f"✅ Время напоминаний обновлено:\n{', '.join(valid_times)}")
         
     elif action == "on":
         feedback_bot.reminder_settings["enabled"] = True
         feedback_bot.save_reminder_settings(feedback_bot.reminder_settings)
+        scheduler.replan()
         await message.answer("✅ Напоминания включены")
         
     elif action == "off":
         feedback_bot.reminder_settings["enabled"] = False
         feedback_bot.save_reminder_settings(feedback_bot.reminder_settings)
+        scheduler.replan()
         await message.answer("❌ Напоминания отключены")
     else:
         await message.answer("❌ Неизвестная команда. Используйте: set, on, off")
@@ -924,10 +1144,12 @@ async def saturday_command(message: Message):
     if action == "on":
         feedback_bot.holidays_settings["saturday_working"] = True
         feedback_bot.save_holidays_settings(feedback_bot.holidays_settings)
+        feedback_bot.working_days.invalidate()
         await message.answer("✅ Суббота теперь рабочий день. Опросы будут отправляться.")
     elif action == "off":
         feedback_bot.holidays_settings["saturday_working"] = False
         feedback_bot.save_holidays_settings(feedback_bot.holidays_settings)
+        feedback_bot.working_days.invalidate()
         await message.answer("❌ Суббота теперь выходной. Опросы не будут отправляться.")
     else:
         await message.answer("❌ Используйте: `/saturday on` или `/saturday off`", parse_mode='Markdown')
@@ -950,10 +1172,12 @@ async def sunday_command(message: Message):
     if action == "on":
         feedback_bot.holidays_settings["sunday_working"] = True
         feedback_bot.save_holidays_settings(feedback_bot.holidays_settings)
+        feedback_bot.working_days.invalidate()
         await message.answer("✅ Воскресенье теперь рабочий день. Опросы будут отправляться.")
     elif action == "off":
         feedback_bot.holidays_settings["sunday_working"] = False
         feedback_bot.save_holidays_settings(feedback_bot.holidays_settings)
+        feedback_bot.working_days.invalidate()
         await message.answer("❌ Воскресенье теперь выходной. Опросы не будут отправляться.")
     else:
         await message.answer("❌ Используйте: `/sunday on` или `/sunday off`", parse_mode='Markdown')
@@ -968,7 +1192,7 @@ async def holidays_command(message: Message):
         return
     
     year = datetime.now(MSK_TZ).year
-    holidays = calendar.holidays(year)
+    holidays = get_calendar().holidays(year)
     
     holidays_text = f"📅 **Праздничные дни {year}:**\n\n"
     
@@ -998,6 +1222,27 @@ async def holidays_command(message: Message):
     await message.answer(holidays_text, parse_mode='Markdown')
 
 
+def find_user_by_username(username):
+    """user_id по @username (без учета регистра)"""
+    for uid, user_data in feedback_bot.users.items():
+        if user_data.get('username', '').lower() == username.lower():
+            return uid
+    return None
+
+
+def vacation_status(start, end, today):
+    if start <= today <= end:
+        return "🏖️ Отпуск"
+    if start > today:
+        return "📅 Запланирован"
+    return "⏹️ Завершен"
+
+
+def format_vacation_period(vacation):
+    start, end = parse_vacation(vacation)
+    return f"{start.strftime('%d.%m.%Y')}-{end.strftime('%d.%m.%Y')}"
+
+
 async def vacation_command(message: Message, state: FSMContext):
     """Команда для назначения отпуска с выбором пользователя или через аргументы"""
     user_id = str(message.from_user.id)
@@ -1012,55 +1257,16 @@ async def vacation_command(message: Message, state: FSMContext):
     if len(args) >= 3:
         # Старый формат с аргументами
         username = args[1].replace('@', '')
-        dates_str = args[2]
         
         # Находим пользователя
-        target_user_id = None
-        for uid, user_data in feedback_bot.users.items():
-            if user_data.get('username', '').lower() == username.lower():
-                target_user_id = uid
-                break
-        
+        target_user_id = find_user_by_username(username)
         if not target_user_id:
             await message.answer(f"❌ Пользователь @{username} не найден")
             return
         
         # Парсим даты
         try:
-            start_str, end_str = dates_str.split('-')
-            start_date = datetime.strptime(start_str.strip(), '%d.%m.%Y').date()
-            end_date = datetime.strptime(end_str.strip(), '%d.%m.%Y').date()
-            
-            if end_date < start_date:
-                await message.answer("❌ Дата окончания не может быть раньше даты начала")
-                return
-            
-            # Сохраняем отпуск
-            if "vacations" not in feedback_bot.holidays_settings:
-                feedback_bot.holidays_settings["vacations"] = {}
-            
-            feedback_bot.holidays_settings["vacations"][target_user_id] = {
-                "username": username,
-                "start": start_date.strftime('%Y-%m-%d'),
-                "end": end_date.strftime('%Y-%m-%d'),
-                "set_by_admin": user_id,
-                "set_at": datetime.now(MSK_TZ).isoformat()
-            }
-            
-            feedback_bot.save_holidays_settings(feedback_bot.holidays_settings)
-            
-            days_count = (end_date - start_date).days + 1
-            user_data = feedback_bot.users[target_user_id]
-            first_name = user_data.get('first_name', 'Неизвестный')
-            
-            await message.answer(
-                f"✅ Отпуск установлен:\n"
-                f"👤 {first_name} (@{username})\n"
-                f"📅 С {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}\n"
-                f"📊 Продолжительность: {days_count} дней"
-            )
-            return
-            
+            start_date, end_date = parse_date_range(args[2])
         except ValueError:
             await message.answer(
                 "❌ Неверный формат даты.\n\n"
@@ -1068,6 +1274,30 @@ async def vacation_command(message: Message, state: FSMContext):
                 "Например: 10.03.2026-20.03.2026"
             )
             return
+        
+        if end_date < start_date:
+            await message.answer("❌ Дата окончания не может быть раньше даты начала")
+            return
+        
+        overlap = feedback_bot.find_vacation_overlap(target_user_id, start_date, end_date)
+        if overlap:
+            await message.answer(f"❌ Пересекается с отпуском {format_vacation_period(overlap)}")
+            return
+        
+        # Сохраняем отпуск (к уже назначенным)
+        feedback_bot.add_vacations([(target_user_id, make_vacation(username, start_date, end_date, user_id))])
+        
+        days_count = (end_date - start_date).days + 1
+        user_data = feedback_bot.users[target_user_id]
+        first_name = user_data.get('first_name', 'Неизвестный')
+        
+        await message.answer(
+            f"✅ Отпуск установлен:\n"
+            f"👤 {first_name} (@{username})\n"
+            f"📅 С {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}\n"
+            f"📊 Продолжительность: {days_count} дней"
+        )
+        return
     
     # Новый формат - интерактивный выбор
     if not feedback_bot.users or len(feedback_bot.users) <= 1:
@@ -1077,6 +1307,37 @@ async def vacation_command(message: Message, state: FSMContext):
     await show_vacation_page(message, page=0)
 
 
+async def importvacations_command(message: Message):
+    """Массовое назначение отпусков: по строке "@username ДД.ММ.ГГГГ-ДД.ММ.ГГГГ" (только для админа)"""
+    user_id = str(message.from_user.id)
+    
+    if user_id != MANAGER_CHAT_ID:
+        await message.answer("❌ Эта команда доступна только администратору.")
+        return
+    
+    lines = message.text.split('\n')[1:]
+    if not any(line.strip() for line in lines):
+        await message.answer(
+            "❌ Используйте:\n"
+            "/importvacations\n"
+            "@ivan 10.03.2026-20.03.2026\n"
+            "@petr 01.07.2026-14.07.2026"
+        )
+        return
+    
+    items, errors = parse_vacation_lines(
+        lines, feedback_bot.users, feedback_bot.holidays_settings.get("vacations", {}), user_id
+    )
+    if items:
+        feedback_bot.add_vacations(items)
+        logger.info(f"Администратор импортировал отпусков: {len(items)}")
+    
+    text = f"✅ Импортировано отпусков: {len(items)}"
+    if errors:
+        text += f"\n\n⚠️ Пропущено строк: {len(errors)}\n" + "\n".join(f"• {error}" for error in errors[:20])
+    await message.answer(text)
+
+
 async def show_vacation_page(message_or_callback, page=0, edit=False):
     """Показывает страницу со списком пользователей для назначения отпуска"""
     USERS_PER_PAGE = 10
@@ -1085,16 +1346,9 @@ async def show_vacation_page(message_or_callback, page=0, edit=False):
     users_list = [(uid, data) for uid, data in feedback_bot.users.items() if uid != MANAGER_CHAT_ID]
     total_users = len(users_list)
     
-    # Проверяем есть ли сотрудники без отпусков
-    vacations = feedback_bot.holidays_settings.get("vacations", {})
-    users_without_vacation = [uid for uid, _ in users_list if uid not in vacations]
-    
     if total_users == 0:
         text = "👥 Нет сотрудников"
         keyboard = None
-    elif len(users_without_vacation) == 0:
-        text = "📅 Назначение отпуска\n\n✅ Все сотрудники уже имеют назначенные отпуска\n\nИспользуйте /vacations для управления отпусками"
-        keyboard = None
     else:
         total_pages = (total_users + USERS_PER_PAGE - 1) // USERS_PER_PAGE
         
@@ -1117,26 +1371,17 @@ async def show_vacation_page(message_or_callback, page=0, edit=False):
             first_name = user_data.get('first_name', 'Неизвестный')
             username = user_data.get('username', 'Неизвестный')
             
-            # Проверяем есть ли отпуск
+            # Назначенные отпуска сотрудника
             vacation_info = ""
-            if chat_id in vacations:
+            for vacation in feedback_bot.get_user_vacations(chat_id):
                 try:
-                    vacation = vacations[chat_id]
-                    start = datetime.strptime(vacation["start"], '%Y-%m-%d').date()
-                    end = datetime.strptime(vacation["end"], '%Y-%m-%d').date()
+                    start, end = parse_vacation(vacation)
                     days_count = (end - start).days + 1
-                    
-                    if start <= today <= end:
-                        status = "🏖️ Отпуск"
-                    elif start > today:
-                        status = "📅 Запланирован"
-                    else:
-                        status = "⏹️ Завершен"
-                    
-                    vacation_info = f"\n   {status}: {start.strftime('%d.%m.%Y')}-{end.strftime('%d.%m.%Y')} ({days_count} дн.)"
+                    status = vacation_status(start, end, today)
+                    vacation_info += f"\n   {status}: {start.strftime('%d.%m.%Y')}-{end.strftime('%d.%m.%Y')} ({days_count} дн.)"
                 except (ValueError, KeyError) as e:
                     logger.error(f"Ошибка парсинга дат отпуска для пользователя {chat_id}: {e}")
-                    vacation_info = "\n   ⚠️ Ошибка данных отпуска"
+                    vacation_info += "\n   ⚠️ Ошибка данных отпуска"
             
             text += f"{idx}. {first_name} (@{username}){vacation_info}\n"
             
@@ -1201,49 +1446,36 @@ async def vacation_select_callback(callback: CallbackQuery, state: FSMContext):
     first_name = user_data.get('first_name', 'Неизвестный')
     username = user_data.get('username', 'Неизвестный')
     
-    # Проверяем есть ли уже отпуск
-    if user_id in feedback_bot.holidays_settings.get("vacations", {}):
-        vacation = feedback_bot.holidays_settings["vacations"][user_id]
-        start = datetime.strptime(vacation["start"], '%Y-%m-%d').date()
-        end = datetime.strptime(vacation["end"], '%Y-%m-%d').date()
-        days_count = (end - start).days + 1
+    await state.update_data(vacation_user_id=user_id, vacation_username=username, vacation_first_name=first_name)
+    
+    # Если отпуска уже есть - предлагаем добавить еще один или изменить существующий
+    user_vacations = feedback_bot.get_user_vacations(user_id)
+    if user_vacations:
         today = datetime.now(MSK_TZ).date()
-        
-        # Определяем статус
-        if start <= today <= end:
-            status = "🏖️ Сейчас в отпуске"
-        elif start > today:
-            status = "📅 Запланирован"
-        else:
-            status = "⏹️ Завершен"
-        
-        # Сохраняем данные для редактирования
-        await state.update_data(
-            vacation_user_id=user_id, 
-            vacation_username=username, 
-            vacation_first_name=first_name
-        )
-        
-        # Показываем предупреждение с кнопками
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [
-                InlineKeyboardButton(text="✏️ Изменить даты", callback_data=f"vacation_edit_{user_id}"),
-                InlineKeyboardButton(text="❌ Отмена", callback_data="vacation_cancel")
-            ]
+        text = f"📅 Отпуска сотрудника {first_name} (@{username}):\n\n"
+        keyboard_buttons = []
+        for vacation in user_vacations:
+            start, end = parse_vacation(vacation)
+            days_count = (end - start).days + 1
+            text += f"{vacation_status(start, end, today)}: {format_vacation_period(vacation)} ({days_count} дн.)\n"
+            keyboard_buttons.append([
+                InlineKeyboardButton(
+                    text=f"✏️ {format_vacation_period(vacation)}",
+                    callback_data=f"vacation_edit_{user_id}_{vacation['start']}"
+                )
+            ])
+        keyboard_buttons.append([
+            InlineKeyboardButton(text="➕ Добавить отпуск", callback_data=f"vacation_add_{user_id}"),
+            InlineKeyboardButton(text="❌ Отмена", callback_data="vacation_cancel")
         ])
         
         await callback.message.answer(
-            f"⚠️ У сотрудника {first_name} (@{username}) уже есть отпуск:\n\n"
-            f"📅 С {start.strftime('%d.%m.%Y')} по {end.strftime('%d.%m.%Y')}\n"
-            f"📊 Продолжительность: {days_count} дней\n"
-            f"📌 Статус: {status}\n\n"
-            f"Хотите изменить даты отпуска?",
-            reply_markup=keyboard
+            text + "\nДобавить новый отпуск или изменить существующий?",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
         )
         return
     
     # Если отпуска нет - просим ввести даты
-    await state.update_data(vacation_user_id=user_id, vacation_username=username, vacation_first_name=first_name)
     await state.set_state(VacationStates.waiting_for_dates)
     
     await callback.message.answer(
@@ -1254,19 +1486,44 @@ async def vacation_select_callback(callback: CallbackQuery, state: FSMContext):
     )
 
 
+async def vacation_add_callback(callback: CallbackQuery, state: FSMContext):
+    """Обработчик кнопки 'Добавить отпуск'"""
+    await callback.answer()
+    
+    if str(callback.from_user.id) != MANAGER_CHAT_ID:
+        return
+    
+    user_data = await state.get_data()
+    first_name = user_data.get('vacation_first_name', 'Неизвестный')
+    username = user_data.get('vacation_username', 'Неизвестный')
+    
+    await state.set_state(VacationStates.waiting_for_dates)
+    
+    await callback.message.answer(
+        f"➕ Новый отпуск для {first_name} (@{username})\n\n"
+        f"Введите даты отпуска в формате:\n"
+        f"ДД.ММ.ГГГГ-ДД.ММ.ГГГГ\n\n"
+        f"Например: 10.03.2026-20.03.2026"
+    )
+
+
 async def vacation_edit_callback(callback: CallbackQuery, state: FSMContext):
-    """Обработчик кнопки 'Изменить даты'"""
+    """Обработчик кнопки изменения дат отпуска"""
     await callback.answer()
     
     if str(callback.from_user.id) != MANAGER_CHAT_ID:
         return
     
+    # vacation_edit_{user_id}_{ГГГГ-ММ-ДД}
+    user_id, start = callback.data.replace('vacation_edit_', '').rsplit('_', 1)
+    
     # Получаем данные из state
     user_data = await state.get_data()
     first_name = user_data.get('vacation_first_name', 'Неизвестный')
     username = user_data.get('vacation_username', 'Неизвестный')
     
     # Переводим в состояние редактирования
+    await state.update_data(vacation_user_id=user_id, vacation_edit_start=start)
     await state.set_state(VacationStates.waiting_for_edit_dates)
     
     await callback.message.answer(
@@ -1302,40 +1559,7 @@ async def vacation_dates_handler(message: Message, state: FSMContext):
     
     # Парсим даты
     try:
-        dates_str = message.text.strip()
-        start_str, end_str = dates_str.split('-')
-        start_date = datetime.strptime(start_str.strip(), '%d.%m.%Y').date()
-        end_date = datetime.strptime(end_str.strip(), '%d.%m.%Y').date()
-        
-        if end_date < start_date:
-            await message.answer("❌ Дата окончания не может быть раньше даты начала\n\nПопробуйте еще раз:")
-            return
-        
-        # Сохраняем отпуск
-        if "vacations" not in feedback_bot.holidays_settings:
-            feedback_bot.holidays_settings["vacations"] = {}
-        
-        feedback_bot.holidays_settings["vacations"][target_user_id] = {
-            "username": username,
-            "start": start_date.strftime('%Y-%m-%d'),
-            "end": end_date.strftime('%Y-%m-%d'),
-            "set_by_admin": str(message.from_user.id),
-            "set_at": datetime.now(MSK_TZ).isoformat()
-        }
-        
-        feedback_bot.save_holidays_settings(feedback_bot.holidays_settings)
-        
-        days_count = (end_date - start_date).days + 1
-        
-        await message.answer(
-            f"✅ Отпуск установлен:\n"
-            f"👤 {first_name} (@{username})\n"
-            f"📅 С {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}\n"
-            f"📊 Продолжительность: {days_count} дней"
-        )
-        
-        await state.clear()
-        
+        start_date, end_date = parse_date_range(message.text)
     except ValueError:
         await message.answer(
             "❌ Неверный формат даты.\n\n"
@@ -1343,12 +1567,39 @@ async def vacation_dates_handler(message: Message, state: FSMContext):
             "Например: 10.03.2026-20.03.2026\n\n"
             "Попробуйте еще раз:"
         )
+        return
+    
+    if end_date < start_date:
+        await message.answer("❌ Дата окончания не может быть раньше даты начала\n\nПопробуйте еще раз:")
+        return
+    
+    overlap = feedback_bot.find_vacation_overlap(target_user_id, start_date, end_date)
+    if overlap:
+        await message.answer(f"❌ Пересекается с отпуском {format_vacation_period(overlap)}\n\nПопробуйте еще раз:")
+        return
+    
+    # Сохраняем отпуск
+    feedback_bot.add_vacations([
+        (target_user_id, make_vacation(username, start_date, end_date, str(message.from_user.id)))
+    ])
+    
+    days_count = (end_date - start_date).days + 1
+    
+    await message.answer(
+        f"✅ Отпуск установлен:\n"
+        f"👤 {first_name} (@{username})\n"
+        f"📅 С {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}\n"
+        f"📊 Продолжительность: {days_count} дней"
+    )
+    
+    await state.clear()
 
 
 async def vacation_edit_dates_handler(message: Message, state: FSMContext):
     """Обработчик ввода дат отпуска (изменение существующего)"""
     user_data = await state.get_data()
     target_user_id = user_data.get('vacation_user_id')
+    old_start = user_data.get('vacation_edit_start')
     username = user_data.get('vacation_username')
     first_name = user_data.get('vacation_first_name')
     
@@ -1359,40 +1610,7 @@ async def vacation_edit_dates_handler(message: Message, state: FSMContext):
     
     # Парсим даты
     try:
-        dates_str = message.text.strip()
-        start_str, end_str = dates_str.split('-')
-        start_date = datetime.strptime(start_str.strip(), '%d.%m.%Y').date()
-        end_date = datetime.strptime(end_str.strip(), '%d.%m.%Y').date()
-        
-        if end_date < start_date:
-            await message.answer("❌ Дата окончания не может быть раньше даты начала\n\nПопробуйте еще раз:")
-            return
-        
-        # Обновляем отпуск
-        if "vacations" not in feedback_bot.holidays_settings:
-            feedback_bot.holidays_settings["vacations"] = {}
-        
-        feedback_bot.holidays_settings["vacations"][target_user_id] = {
-            "username": username,
-            "start": start_date.strftime('%Y-%m-%d'),
-            "end": end_date.strftime('%Y-%m-%d'),
-            "set_by_admin": str(message.from_user.id),
-            "set_at": datetime.now(MSK_TZ).isoformat()
-        }
-        
-        feedback_bot.save_holidays_settings(feedback_bot.holidays_settings)
-        
-        days_count = (end_date - start_date).days + 1
-        
-        await message.answer(
-            f"✅ Отпуск изменен:\n"
-            f"👤 {first_name} (@{username})\n"
-            f"📅 С {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}\n"
-            f"📊 Продолжительность: {days_count} дней"
-        )
-        
-        await state.clear()
-        
+        start_date, end_date = parse_date_range(message.text)
     except ValueError:
         await message.answer(
             "❌ Неверный формат даты.\n\n"
@@ -1400,6 +1618,34 @@ async def vacation_edit_dates_handler(message: Message, state: FSMContext):
             "Например: 10.03.2026-20.03.2026\n\n"
             "Попробуйте еще раз:"
         )
+        return
+    
+    if end_date < start_date:
+        await message.answer("❌ Дата окончания не может быть раньше даты начала\n\nПопробуйте еще раз:")
+        return
+    
+    overlap = feedback_bot.find_vacation_overlap(target_user_id, start_date, end_date, ignore_start=old_start)
+    if overlap:
+        await message.answer(f"❌ Пересекается с отпуском {format_vacation_period(overlap)}\n\nПопробуйте еще раз:")
+        return
+    
+    # Обновляем отпуск: старый заменяется новым
+    if old_start:
+        feedback_bot.remove_vacations(target_user_id, old_start)
+    feedback_bot.add_vacations([
+        (target_user_id, make_vacation(username, start_date, end_date, str(message.from_user.id)))
+    ])
+    
+    days_count = (end_date - start_date).days + 1
+    
+    await message.answer(
+        f"✅ Отпуск изменен:\n"
+        f"👤 {first_name} (@{username})\n"
+        f"📅 С {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}\n"
+        f"📊 Продолжительность: {days_count} дней"
+    )
+    
+    await state.clear()
 
 
 async def vacations_command(message: Message):
@@ -1421,96 +1667,75 @@ async def show_vacations_page(message_or_callback, page=0, edit=False):
     """Показывает страницу со списком отпусков"""
     VACATIONS_PER_PAGE = 10
     
-    vacations = feedback_bot.holidays_settings.get("vacations", {})
+    # Индекс уже отсортирован по дате окончания (ближайшие к завершению первыми)
+    today = datetime.now(MSK_TZ).date()
+    vacations_list = []
     
-    if not vacations:
+    for start_date, end_date, user_id, vacation in feedback_bot.vacation_index.by_end:
+        if user_id not in feedback_bot.users:
+            continue  # Пропускаем удаленных пользователей
+        
+        user_data = feedback_bot.users[user_id]
+        
+        vacations_list.append({
+            'user_id': user_id,
+            'start': vacation["start"],
+            'first_name': user_data.get('first_name', 'Неизвестный'),
+            'username': user_data.get('username', 'Неизвестный'),
+            'start_date': start_date,
+            'end_date': end_date,
+            'days_count': (end_date - start_date).days + 1
+        })
+    
+    total_vacations = len(vacations_list)
+    total_pages = (total_vacations + VACATIONS_PER_PAGE - 1) // VACATIONS_PER_PAGE
+    
+    if total_pages == 0:
         text = "📅 Список отпусков\n\n❌ Отпусков пока не назначено"
         keyboard = None
     else:
-        # Подготавливаем список отпусков с сортировкой по дате окончания
-        today = datetime.now(MSK_TZ).date()
-        vacations_list = []
+        # Ограничиваем страницу
+        page = max(0, min(page, total_pages - 1))
         
-        for user_id, vacation in vacations.items():
-            if user_id not in feedback_bot.users:
-                continue  # Пропускаем удаленных пользователей
-            
-            try:
-                start_date = datetime.strptime(vacation["start"], '%Y-%m-%d').date()
-                end_date = datetime.strptime(vacation["end"], '%Y-%m-%d').date()
-            except (ValueError, KeyError) as e:
-                logger.error(f"Ошибка парсинга дат отпуска для пользователя {user_id}: {e}")
-                continue  # Пропускаем поврежденные данные
-            
-            user_data = feedback_bot.users[user_id]
-            
-            vacations_list.append({
-                'user_id': user_id,
-                'first_name': user_data.get('first_name', 'Неизвестный'),
-                'username': user_data.get('username', 'Неизвестный'),
-                'start_date': start_date,
-                'end_date': end_date,
-                'days_count': (end_date - start_date).days + 1
-            })
-        
-        # Сортируем по дате окончания (ближайшие к завершению первыми)
-        vacations_list.sort(key=lambda x: x['end_date'])
-        
-        total_vacations = len(vacations_list)
-        total_pages = (total_vacations + VACATIONS_PER_PAGE - 1) // VACATIONS_PER_PAGE
-        
-        if total_pages == 0:
-            text = "📅 Список отпусков\n\n❌ Отпусков пока не назначено"
-            keyboard = None
-        else:
-            # Ограничиваем страницу
-            page = max(0, min(page, total_pages - 1))
-            
-            # Получаем отпуска для текущей страницы
-            start_idx = page * VACATIONS_PER_PAGE
-            end_idx = start_idx + VACATIONS_PER_PAGE
-            page_vacations = vacations_list[start_idx:end_idx]
-            
-            # Формируем текст
-            text = f"📅 Список отпусков ({total_vacations})\n"
-            text += f"Страница {page + 1} из {total_pages}\n\n"
-            
-            keyboard_buttons = []
-            
-            for idx, vac in enumerate(page_vacations, start=start_idx + 1):
-                # Определяем статус
-                if vac['start_date'] <= today <= vac['end_date']:
-                    status = "🏖️ Отпуск"
-                elif vac['start_date'] > today:
-                    status = "📅 Запланирован"
-                else:
-                    status = "⏹️ Завершен"
-                
-                text += f"{idx}. {vac['first_name']} (@{vac['username']})\n"
-                text += f"   {status}\n"
-                text += f"   📅 {vac['start_date'].strftime('%d.%m.%Y')} - {vac['end_date'].strftime('%d.%m.%Y')}\n"
-                text += f"   📊 {vac['days_count']} дней\n\n"
-                
-                # Кнопка удаления
-                keyboard_buttons.append([
-                    InlineKeyboardButton(
-                        text=f"❌ {idx}. {vac['first_name']}",
-                        callback_data=f"vacations_delete_{vac['user_id']}"
-                    )
-                ])
-            
-            # Кнопки навигации
-            nav_buttons = []
-            if page > 0:
-                nav_buttons.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"vacations_page_{page-1}"))
-            nav_buttons.append(InlineKeyboardButton(text=f"{page+1}/{total_pages}", callback_data="vacations_page_current"))
-            if page < total_pages - 1:
-                nav_buttons.append(InlineKeyboardButton(text="Вперед ▶️", callback_data=f"vacations_page_{page+1}"))
+        # Получаем отпуска для текущей страницы
+        start_idx = page * VACATIONS_PER_PAGE
+        end_idx = start_idx + VACATIONS_PER_PAGE
+        page_vacations = vacations_list[start_idx:end_idx]
+        
+        # Формируем текст
+        text = f"📅 Список отпусков ({total_vacations})\n"
+        text += f"Страница {page + 1} из {total_pages}\n\n"
+        
+        keyboard_buttons = []
+        
+        for idx, vac in enumerate(page_vacations, start=start_idx + 1):
+            status = vacation_status(vac['start_date'], vac['end_date'], today)
             
-            if nav_buttons:
-                keyboard_buttons.append(nav_buttons)
+            text += f"{idx}. {vac['first_name']} (@{vac['username']})\n"
+            text += f"   {status}\n"
+            text += f"   📅 {vac['start_date'].strftime('%d.%m.%Y')} - {vac['end_date'].strftime('%d.%m.%Y')}\n"
+            text += f"   📊 {vac['days_count']} дней\n\n"
             
-            keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
+            # Кнопка удаления (отпуск определяется пользователем и датой начала)
+            keyboard_buttons.append([
+                InlineKeyboardButton(
+                    text=f"❌ {idx}. {vac['first_name']}",
+                    callback_data=f"vacations_delete_{vac['user_id']}_{vac['start']}"
+                )
+            ])
+        
+        # Кнопки навигации
+        nav_buttons = []
+        if page > 0:
+            nav_buttons.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"vacations_page_{page-1}"))
+        nav_buttons.append(InlineKeyboardButton(text=f"{page+1}/{total_pages}", callback_data="vacations_page_current"))
+        if page < total_pages - 1:
+            nav_buttons.append(InlineKeyboardButton(text="Вперед ▶️", callback_data=f"vacations_page_{page+1}"))
+        
+        if nav_buttons:
+            keyboard_buttons.append(nav_buttons)
+        
+        keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
     
     # Отправляем или редактируем сообщение
     if edit and isinstance(message_or_callback, CallbackQuery):
@@ -1534,6 +1759,14 @@ async def vacations_page_callback(callback: CallbackQuery):
     await show_vacations_page(callback, page=page, edit=True)
 
 
+def find_user_vacation(user_id, start):
+    """Отпуск пользователя с датой начала start (None, если не найден)"""
+    for vacation in feedback_bot.get_user_vacations(user_id):
+        if vacation["start"] == start:
+            return vacation
+    return None
+
+
 async def vacations_delete_callback(callback: CallbackQuery):
     """Обработчик кнопки удаления отпуска"""
     await callback.answer()
@@ -1542,19 +1775,17 @@ async def vacations_delete_callback(callback: CallbackQuery):
         await callback.message.answer("❌ Только администратор может удалять отпуска.")
         return
     
-    # Извлекаем ID пользователя
-    user_id = callback.data.replace('vacations_delete_', '')
+    # vacations_delete_{user_id}_{ГГГГ-ММ-ДД}
+    user_id, start = callback.data.replace('vacations_delete_', '').rsplit('_', 1)
     
     # Проверяем что отпуск существует
-    vacations = feedback_bot.holidays_settings.get("vacations", {})
-    if user_id not in vacations:
+    vacation = find_user_vacation(user_id, start)
+    if not vacation:
         await callback.message.answer("❌ Отпуск не найден")
         return
     
     # Получаем данные отпуска
-    vacation = vacations[user_id]
-    start_date = datetime.strptime(vacation["start"], '%Y-%m-%d').date()
-    end_date = datetime.strptime(vacation["end"], '%Y-%m-%d').date()
+    start_date, end_date = parse_vacation(vacation)
     days_count = (end_date - start_date).days + 1
     
     # Получаем данные пользователя
@@ -1565,7 +1796,7 @@ async def vacations_delete_callback(callback: CallbackQuery):
     # Создаем кнопки подтверждения
     confirm_keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="✅ Да, удалить", callback_data=f"confirm_vacations_delete_{user_id}"),
+            InlineKeyboardButton(text="✅ Да, удалить", callback_data=f"confirm_vacations_delete_{user_id}_{start}"),
             InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_vacations_delete")
         ]
     ])
@@ -1588,28 +1819,21 @@ async def confirm_vacations_delete_callback(callback: CallbackQuery):
         return
     
     if callback.data.startswith('confirm_vacations_delete_'):
-        # Извлекаем ID пользователя
-        user_id = callback.data.replace('confirm_vacations_delete_', '')
+        # confirm_vacations_delete_{user_id}_{ГГГГ-ММ-ДД}
+        user_id, start = callback.data.replace('confirm_vacations_delete_', '').rsplit('_', 1)
         
-        # Проверяем что отпуск существует
-        vacations = feedback_bot.holidays_settings.get("vacations", {})
-        if user_id not in vacations:
+        # Удаляем отпуск
+        removed = feedback_bot.remove_vacations(user_id, start)
+        if not removed:
             await callback.message.edit_text("❌ Отпуск не найден")
             return
         
-        # Получаем данные для логирования
-        vacation = vacations[user_id]
-        start_date = datetime.strptime(vacation["start"], '%Y-%m-%d').date()
-        end_date = datetime.strptime(vacation["end"], '%Y-%m-%d').date()
+        start_date, end_date = parse_vacation(removed[0])
         
         user_data = feedback_bot.users.get(user_id, {})
         first_name = user_data.get('first_name', 'Неизвестный')
         username = user_data.get('username', 'Неизвестный')
         
-        # Удаляем отпуск
-        del feedback_bot.holidays_settings["vacations"][user_id]
-        feedback_bot.save_holidays_settings(feedback_bot.holidays_settings)
-        
         logger.info(f"Администратор удалил отпуск: {first_name} (@{username}, {start_date} - {end_date})")
         
         await callback.message.edit_text(
@@ -1637,34 +1861,47 @@ async def removevacation_command(message: Message):
     
     args = message.text.split()
     if len(args) < 2:
-        await message.answer("❌ Используйте: `/removevacation @username`", parse_mode='Markdown')
+        await message.answer("❌ Используйте: `/removevacation @username [ДД.ММ.ГГГГ]`", parse_mode='Markdown')
         return
     
     username = args[1].replace('@', '')
     
     # Находим пользователя
-    target_user_id = None
-    for uid, user_data in feedback_bot.users.items():
-        if user_data.get('username', '').lower() == username.lower():
-            target_user_id = uid
-            break
-    
+    target_user_id = find_user_by_username(username)
     if not target_user_id:
         await message.answer(f"❌ Пользователь @{username} не найден")
         return
     
-    vacations = feedback_bot.holidays_settings.get("vacations", {})
+    user_vacations = feedback_bot.get_user_vacations(target_user_id)
     
-    if target_user_id not in vacations:
+    if not user_vacations:
         await message.answer(f"❌ У пользователя @{username} нет назначенного отпуска")
         return
     
-    vacation = vacations[target_user_id]
-    start_date = datetime.strptime(vacation["start"], '%Y-%m-%d').date()
-    end_date = datetime.strptime(vacation["end"], '%Y-%m-%d').date()
+    # Несколько отпусков: нужен день, попадающий в отменяемый отпуск
+    if len(args) >= 3:
+        try:
+            day = datetime.strptime(args[2], '%d.%m.%Y').date().isoformat()
+        except ValueError:
+            await message.answer("❌ Неверный формат даты. Используйте: ДД.ММ.ГГГГ")
+            return
+        matching = [v for v in user_vacations if v["start"] <= day <= v["end"]]
+        if not matching:
+            await message.answer(f"❌ У пользователя @{username} нет отпуска, включающего {args[2]}")
+            return
+        vacation = matching[0]
+    elif len(user_vacations) == 1:
+        vacation = user_vacations[0]
+    else:
+        periods = "\n".join(f"• {format_vacation_period(v)}" for v in user_vacations)
+        await message.answer(
+            f"У пользователя @{username} несколько отпусков:\n{periods}\n\n"
+            f"Укажите день отпуска: /removevacation @{username} ДД.ММ.ГГГГ"
+        )
+        return
     
-    del feedback_bot.holidays_settings["vacations"][target_user_id]
-    feedback_bot.save_holidays_settings(feedback_bot.holidays_settings)
+    start_date, end_date = parse_vacation(vacation)
+    feedback_bot.remove_vacations(target_user_id, vacation["start"])
     
     user_data = feedback_bot.users[target_user_id]
     first_name = user_data.get('first_name', 'Неизвестный')
@@ -1703,135 +1940,145 @@ async def mymonth_command(message: Message):
     await message.answer(report)
 
 
+MONTH_NAMES = {
+    1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель',
+    5: 'Май', 6: 'Июнь', 7: 'Июль', 8: 'Август',
+    9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
+}
+
+def aggregate_monthly_stats(year, month, user_ids):
+    """
+    Статистика за месяц сразу для всех user_ids по сводкам (feedback_bot.rollups).
+    Учитываются ответы в рабочие дни вне отпуска; серия - по всем дням с ответом.
+    Ответы в выходные и в отпуске (обычно их нет) вычитаются по исходным данным.
+    """
+    dates = {}
+    survey_mask = 0
+    for date_str in feedback_bot.rollups.month_days(year, month):
+        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+        dates[date_obj.day] = (date_str, date_obj)
+        survey_mask |= 1 << (date_obj.day - 1)
+    # Рабочие дни с опросом - пересечение с готовой маской месяца из карты рабочих дней
+    working_mask = survey_mask & feedback_bot.working_days_mask(year, month)
+    
+    # Кто в отпуске - один запрос к индексу отпусков на каждый день опроса,
+    # затем маска отпускных дней каждого пользователя
+    on_vacation = {date_obj: feedback_bot.vacations_on(date_obj) for _, date_obj in dates.values()}
+    vacation_masks = {}
+    for date_obj, users_on_vacation in on_vacation.items():
+        for vacation_user in users_on_vacation:
+            vacation_masks[vacation_user] = vacation_masks.get(vacation_user, 0) | 1 << (date_obj.day - 1)
+    
+    stats = {}
+    for user_id in user_ids:
+        entry = feedback_bot.rollups.user_month(user_id, year, month) or {}
+        counted_mask = working_mask & ~vacation_masks.get(user_id, 0)
+        user_stats = {
+            'count': entry.get('count', 0),
+            'moods': Counter(entry.get('moods', {})),
+            'score_sum': entry.get('score_sum', 0),
+            'projects': Counter(entry.get('projects', {})),
+            'latency_sum': entry.get('latency_sum', 0.0),
+            'latency_count': entry.get('latency_count', 0),
+            'max_streak': max(1, longest_streak(entry.get('days', 0))),
+            'working_days': counted_mask.bit_count()
+        }
+        
+        # Дни с ответом вне рабочих дней или в отпуске: ответы пользователя за месяц
+        # одним запросом (в SQLite - по индексу (user_id, date))
+        extra_days = entry.get('days', 0) & ~counted_mask
+        if extra_days:
+            user_responses = feedback_bot.responses.user_month_responses(user_id, year, month)
+            for day in day_bits(extra_days):
+                response = user_responses.get(dates[day][0])
+                if response:
+                    add_response(user_stats, response, -1)
+        
+        stats[user_id] = user_stats
+    
+    return stats
+
+
+def render_monthly_report(user_stats, year, month):
+    """Форматирует месячный отчет сотрудника из aggregate_monthly_stats"""
+    month_name = MONTH_NAMES[month]
+    total_responses = user_stats['count']
+    working_days = user_stats['working_days']
+    
+    if not total_responses:
+        return f"📊 Твой отчет: {month_name} {year}\n\n❌ За этот месяц нет данных"
+    
+    mood_counts = user_stats['moods']
+    avg_score = user_stats['score_sum'] / total_responses
+    # При равенстве - по алфавиту, чтобы порядок не зависел от истории изменений
+    top_projects = sorted(user_stats['projects'].items(), key=lambda item: (-item[1], item[0]))[:5]
+    avg_response_time = (
+        user_stats['latency_sum'] / user_stats['latency_count'] if user_stats['latency_count'] else 0
+    )
+    max_streak = user_stats['max_streak']
+    
+    # Формируем отчет
+    report = f"📊 Твой отчет: {month_name} {year}\n\n"
+    report += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+    report += "😊 НАСТРОЕНИЕ\n\n"
+    
+    for mood_key in ['excellent', 'good', 'bad', 'hard', 'critical']:
+        count = mood_counts.get(mood_key, 0)
+        percentage = (count / total_responses * 100) if total_responses > 0 else 0
+        emoji = MOOD_OPTIONS[mood_key]['emoji']
+        text = MOOD_OPTIONS[mood_key]['text']
+        bar_length = int(percentage / 10)
+        bar = '█' * bar_length + '░' * (10 - bar_length)
+        # Разделяем на две строки для правильного выравнивания
+        report += f"{emoji} {text}\n"
+        report += f"{bar} {count} дней ({percentage:.0f}%)\n\n"
+    
+    report += f"\n📈 Средняя оценка: {avg_score:.1f}/5\n\n"
+    report += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+    report += "📋 АКТИВНОСТЬ\n\n"
+    report += f"✅ Ответил:     {total_responses} из {working_days} дней"
+    
+    if working_days > 0:
+        participation = (total_responses / working_days * 100)
+        report += f" ({participation:.0f}%)\n"
+    else:
+        report += "\n"
+    
+    if max_streak > 1:
+        report += f"🏆 Серия:       {max_streak} дней подряд!\n"
+    
+    if avg_response_time > 0:
+        report += f"⏱ Среднее время ответа: {avg_response_time:.0f} минут\n"
+    
+    report += "\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+    report += "🎯 ПРОЕКТЫ\n\n"
+    report += "Над чем работал чаще всего:\n\n"
+    
+    for i, (project, count) in enumerate(top_projects, 1):
+        percentage = (count / total_responses * 100)
+        medal = {1: '🥇', 2: '🥈', 3: '🥉'}.get(i, '')
+        report += f"{i}. {medal} {project:30} {count} дней ({percentage:.0f}%)\n"
+    
+    report += "\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+    
+    # Определяем следующий месяц
+    if month == 12:
+        next_month = 1
+        next_year = year + 1
+    else:
+        next_month = month + 1
+        next_year = year
+    
+    report += f"📅 Следующий отчет: 01 {MONTH_NAMES[next_month]} {next_year}"
+    
+    return report
+
+
 async def generate_user_monthly_report(user_id, year, month):
     """Генерирует месячный отчет для сотрудника"""
     try:
-        month_name = {
-            1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель',
-            5: 'Май', 6: 'Июнь', 7: 'Июль', 8: 'Август',
-            9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
-        }[month]
-        
-        # Собираем ответы пользователя за месяц
-        user_responses = []
-        working_days = 0
-        
-        for date_str, day_responses in feedback_bot.responses.items():
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-            
-            if date_obj.year == year and date_obj.month == month:
-                # Считаем рабочие дни
-                if feedback_bot.is_working_day(date_obj) and not feedback_bot.is_user_on_vacation(user_id, date_obj):
-                    working_days += 1
-                    
-                    if user_id in day_responses:
-                        user_responses.append(day_responses[user_id])
-        
-        if not user_responses:
-            return f"📊 Твой отчет: {month_name} {year}\n\n❌ За этот месяц нет данных"
-        
-        # Статистика по настроению
-        mood_counts = Counter([r['mood'] for r in user_responses])
-        total_responses = len(user_responses)
-        
-        # Средняя оценка
-        mood_scores = {'excellent': 5, 'good': 4, 'bad': 3, 'hard': 2, 'critical': 1}
-        avg_score = sum(mood_scores[r['mood']] for r in user_responses) / total_responses
-        
-        # Статистика по проектам
-        projects = [r.get('project', 'Не указан') for r in user_responses if r.get('project')]
-        project_counts = Counter(projects)
-        top_projects = project_counts.most_common(5)
-        
-        # Среднее время ответа
-        response_times = []
-        for response in user_responses:
-            if 'timestamp' in response and 'completed_at' in response:
-                try:
-                    start = datetime.fromisoformat(response['timestamp'].replace('Z', '+00:00'))
-                    end = datetime.fromisoformat(response['completed_at'].replace('Z', '+00:00'))
-                    delta = (end - start).total_seconds() / 60
-                    response_times.append(delta)
-                except:
-                    pass
-        
-        avg_response_time = sum(response_times) / len(response_times) if response_times else 0
-        
-        # Серия дней подряд
-        max_streak = 1
-        current_streak = 1
-        sorted_dates = sorted([datetime.strptime(date_str, '%Y-%m-%d').date() 
-                              for date_str, day_resp in feedback_bot.responses.items() 
-                              if date_str.startswith(f"{year}-{month:02d}") and user_id in day_resp])
-        
-        for i in range(1, len(sorted_dates)):
-            if (sorted_dates[i] - sorted_dates[i-1]).days == 1:
-                current_streak += 1
-                max_streak = max(max_streak, current_streak)
-            else:
-                current_streak = 1
-        
-        # Формируем отчет
-        report = f"📊 Твой отчет: {month_name} {year}\n\n"
-        report += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-        report += "😊 НАСТРОЕНИЕ\n\n"
-        
-        for mood_key in ['excellent', 'good', 'bad', 'hard', 'critical']:
-            count = mood_counts.get(mood_key, 0)
-            percentage = (count / total_responses * 100) if total_responses > 0 else 0
-            emoji = MOOD_OPTIONS[mood_key]['emoji']
-            text = MOOD_OPTIONS[mood_key]['text']
-            bar_length = int(percentage / 10)
-            bar = '█' * bar_length + '░' * (10 - bar_length)
-            # Разделяем на две строки для правильного выравнивания
-            report += f"{emoji} {text}\n"
-            report += f"{bar} {count} дней ({percentage:.0f}%)\n\n"
-        
-        report += f"\n📈 Средняя оценка: {avg_score:.1f}/5\n\n"
-        report += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-        report += "📋 АКТИВНОСТЬ\n\n"
-        report += f"✅ Ответил:     {total_responses} из {working_days} дней"
-        
-        if working_days > 0:
-            participation = (total_responses / working_days * 100)
-            report += f" ({participation:.0f}%)\n"
-        else:
-            report += "\n"
-        
-        if max_streak > 1:
-            report += f"🏆 Серия:       {max_streak} дней подряд!\n"
-        
-        if avg_response_time > 0:
-            report += f"⏱ Среднее время ответа: {avg_response_time:.0f} минут\n"
-        
-        report += "\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-        report += "🎯 ПРОЕКТЫ\n\n"
-        report += "Над чем работал чаще всего:\n\n"
-        
-        for i, (project, count) in enumerate(top_projects, 1):
-            percentage = (count / total_responses * 100)
-            medal = {1: '🥇', 2: '🥈', 3: '🥉'}.get(i, '')
-            report += f"{i}. {medal} {project:30} {count} дней ({percentage:.0f}%)\n"
-        
-        report += "\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-        
-        # Определяем следующий месяц
-        if month == 12:
-            next_month = 1
-            next_year = year + 1
-        else:
-            next_month = month + 1
-            next_year = year
-        
-        next_month_name = {
-            1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель',
-            5: 'Май', 6: 'Июнь', 7: 'Июль', 8: 'Август',
-            9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
-        }[next_month]
-        
-        report += f"📅 Следующий отчет: 01 {next_month_name} {next_year}"
-        
-        return report
+        stats = aggregate_monthly_stats(year, month, [user_id])
+        return render_monthly_report(stats[user_id], year, month)
         
     except Exception as e:
         logger.error(f"Ошибка генерации месячного отчета: {e}")
@@ -1867,6 +2114,7 @@ async def setsurvey_command(message: Message):
     # Сохраняем новое время
     feedback_bot.schedule_settings["survey_time"] = new_time
     feedback_bot.save_schedule_settings(feedback_bot.schedule_settings)
+    scheduler.replan()
     
     await message.answer(
         f"✅ Время опроса изменено на {new_time} МСК\n\n"
@@ -1901,6 +2149,7 @@ async def setreport_command(message: Message):
     # Сохраняем новое время
     feedback_bot.schedule_settings["report_time"] = new_time
     feedback_bot.save_schedule_settings(feedback_bot.schedule_settings)
+    scheduler.replan()
     
     await message.answer(
         f"✅ Время отчета изменено на {new_time} МСК\n\n"
@@ -4,22 +4,34 @@
 import os
 from datetime import timezone, timedelta
 from pathlib import Path
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 import logging
 
-# Загружаем переменные окружения
-load_dotenv()
+# Переменные окружения (.env читается без изменения os.environ; окружение важнее .env)
+_env = {**dotenv_values(), **os.environ}
+
+
+def env(key, default=None):
+    value = _env.get(key)
+    return default if value is None else value
+
 
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
+
+def setup_logging():
+    """Настройка логирования (вызывается из create_app и CLI-скриптов)"""
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
 # Конфигурация из .env
-BOT_TOKEN = os.getenv('BOT_TOKEN')
-MANAGER_CHAT_ID = os.getenv('MANAGER_CHAT_ID')
+BOT_TOKEN = env('BOT_TOKEN')
+MANAGER_CHAT_ID = env('MANAGER_CHAT_ID')
+
+# Адрес Bot API вместо api.telegram.org (локальный сервер Bot API или заглушка для нагрузочных тестов)
+TELEGRAM_API_URL = env('TELEGRAM_API_URL')
 
 # Московский часовой пояс
 MSK_TZ = timezone(timedelta(hours=3))
@@ -28,14 +40,56 @@ MSK_TZ = timezone(timedelta(hours=3))
 DATA_DIR = Path.cwd() / 'data'
 REPORTS_DIR = Path.cwd() / 'reports'
 USER_DATA_FILE = DATA_DIR / 'users.json'
-RESPONSES_FILE = DATA_DIR / 'responses.json'
+RESPONSES_FILE = DATA_DIR / 'responses.json'  # устаревший единый файл, переносится в RESPONSES_DIR
+RESPONSES_DIR = DATA_DIR / 'responses'
 REMINDER_SETTINGS_FILE = DATA_DIR / 'reminder_settings.json'
 HOLIDAYS_FILE = DATA_DIR / 'holidays.json'
 SCHEDULE_SETTINGS_FILE = DATA_DIR / 'schedule_settings.json'
+RESPONSES_JOURNAL_FILE = DATA_DIR / 'responses.journal'
+SQLITE_DB_FILE = DATA_DIR / 'feedback.db'
+OUTBOX_FILE = DATA_DIR / 'outbox.journal'
+SCHEDULER_STATE_FILE = DATA_DIR / 'scheduler_state.json'
+PENDING_RESPONDERS_FILE = DATA_DIR / 'pending_responders.json'
+ROLLUPS_FILE = DATA_DIR / 'rollups.json'
+WORKING_DAYS_FILE = DATA_DIR / 'working_days.json'
+REPORTS_CATALOG_FILE = DATA_DIR / 'reports_catalog.json'
+
+# Хранилище данных: json (файлы в data/) или sqlite (data/feedback.db)
+STORAGE_BACKEND = env('STORAGE_BACKEND', 'json').lower()
+
+# Сколько записей журнала копить до сжатия в снимок responses.json
+JOURNAL_COMPACT_THRESHOLD = int(env('JOURNAL_COMPACT_THRESHOLD', '500'))
+
+# Как часто (мс) write-behind сбрасывает накопленные изменения на диск
+WRITE_BEHIND_INTERVAL_MS = int(env('WRITE_BEHIND_INTERVAL_MS', '200'))
 
-# Создаем директории если не существуют
-DATA_DIR.mkdir(exist_ok=True)
-REPORTS_DIR.mkdir(exist_ok=True)
+# Пул потоков для дисковых операций: число потоков и размер очереди ожидания
+IO_WORKERS = int(env('IO_WORKERS', '4'))
+IO_QUEUE_SIZE = int(env('IO_QUEUE_SIZE', '64'))
+
+# Рассылки: лимит Telegram (сообщений/с), параллельных отправок и повторов при сбоях
+BROADCAST_RATE = float(env('BROADCAST_RATE', '30'))
+BROADCAST_CONCURRENCY = int(env('BROADCAST_CONCURRENCY', '16'))
+BROADCAST_MAX_RETRIES = int(env('BROADCAST_MAX_RETRIES', '3'))
+BROADCAST_MAX_FLOOD_WAITS = int(env('BROADCAST_MAX_FLOOD_WAITS', '5'))  # ответов 429 на одно сообщение
+
+# Сколько дней помнить ключи доставленных сообщений (защита от повторной отправки)
+OUTBOX_RETENTION_DAYS = int(env('OUTBOX_RETENTION_DAYS', '7'))
+
+# Отчет длиннее стольких сообщений заменяется сводкой (подробности - в CSV)
+REPORT_MAX_MESSAGES = int(env('REPORT_MAX_MESSAGES', '5'))
+
+# Как часто (сек) сверять файлы настроек с диском, чтобы подхватить ручные правки
+SETTINGS_CHECK_INTERVAL = int(env('SETTINGS_CHECK_INTERVAL', '60'))
+
+# Сколько прошлых месяцев ответов держать в памяти (текущий загружается всегда)
+RESPONSES_CACHE_MONTHS = int(env('RESPONSES_CACHE_MONTHS', '3'))
+
+
+def ensure_dirs():
+    """Создает директории данных и отчетов, если их нет"""
+    DATA_DIR.mkdir(exist_ok=True)
+    REPORTS_DIR.mkdir(exist_ok=True)
 
 # Смайлики для оценки дня
 MOOD_OPTIONS = {
@@ -45,3 +99,6 @@ MOOD_OPTIONS = {
     'hard': {'emoji': '😓', 'text': 'Тяжело'},
     'critical': {'emoji': '😭', 'text': 'Критично'}
 }
+
+# Оценка настроения для средней оценки в отчетах
+MOOD_SCORES = {'excellent': 5, 'good': 4, 'bad': 3, 'hard': 2, 'critical': 1}
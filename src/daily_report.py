@@ -0,0 +1,167 @@
+"""
+Живая модель ежедневного отчета
+
+Модель строится один раз за день (или после изменения пользователей, отпусков,
+admin_as_employee) и дальше обновляется каждым ответом: корзины по настроениям,
+ответившие, ожидающие ответа и ушедшие в отпуск. /report, /createreport и
+отчет по расписанию только отрисовывают ее; текст собирается через join.
+
+Telegram принимает до 4096 символов в сообщении: split_message делит отчет
+по границам блоков (настроений), а слишком длинный блок - по строкам.
+"""
+from datetime import datetime
+
+from config import MOOD_OPTIONS
+
+MOOD_ORDER = ['excellent', 'good', 'bad', 'hard', 'critical']
+
+# Лимит длины текста сообщения Telegram
+MESSAGE_LIMIT = 4096
+
+
+def message_length(text):
+    """Длина в единицах UTF-16 - так Telegram считает лимит (эмодзи занимают две)"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _pieces(section, limit):
+    """Блок целиком или, если не влезает, по строкам (строка длиннее лимита режется)"""
+    if message_length(section) <= limit:
+        return [section]
+    pieces = []
+    for line in section.splitlines(keepends=True):
+        while message_length(line) > limit:
+            # limit // 2 символов гарантированно влезают даже из одних эмодзи
+            pieces.append(line[:limit // 2])
+            line = line[limit // 2:]
+        pieces.append(line)
+    return pieces
+
+
+def split_message(sections, limit=MESSAGE_LIMIT):
+    """Склеивает блоки текста в сообщения не длиннее limit"""
+    chunks = []
+    current = []
+    size = 0
+    for section in sections:
+        for piece in _pieces(section, limit):
+            length = message_length(piece)
+            if current and size + length > limit:
+                chunks.append(''.join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += length
+    if current:
+        chunks.append(''.join(current))
+    return [chunk.rstrip('\n') for chunk in chunks if chunk.strip()]
+
+
+class DailyReport:
+    """Отчет за один день: date_str, пользователи по порядку users.json и ответы дня"""
+
+    def __init__(self, date_str, users, responses, on_vacation, admin_id, admin_as_employee):
+        self.date = date_str
+        self.admin_as_employee = admin_as_employee
+        self.users_count = len(users)
+        # Отпуск - в порядке users.json (администратор тоже, если в отпуске)
+        self.vacation = [
+            f"@{data.get('username', 'Неизвестный')}" for user_id, data in users.items() if user_id in on_vacation
+        ]
+        # Ожидающие ответа: упорядоченное множество (dict), ответившие удаляются
+        self.pending = {
+            user_id: data.get('username', 'Неизвестный') for user_id, data in users.items()
+            if user_id not in on_vacation and (admin_as_employee or user_id != admin_id)
+        }
+        self.responded = {}  # user_id -> (порядковый номер первого ответа, настроение, @username, проект)
+        self.buckets = {mood: {} for mood in MOOD_ORDER}  # настроение -> {user_id: None} по порядку ответов
+        for user_id, response in responses.items():
+            self.apply(user_id, response)
+
+    def apply(self, user_id, response):
+        """Новый или измененный ответ пользователя"""
+        previous = self.responded.get(user_id)
+        order = previous[0] if previous else len(self.responded)
+        mood = response['mood']
+        self.responded[user_id] = (order, mood, response['username'], response.get('project', 'Не указан'))
+        self.pending.pop(user_id, None)
+
+        if previous and previous[1] == mood:
+            return
+        if previous and previous[1] in self.buckets:
+            del self.buckets[previous[1]][user_id]
+        bucket = self.buckets.setdefault(mood, {})
+        bucket[user_id] = None
+        if previous:
+            # Сменивший настроение остается на месте своего первого ответа, как в ответах дня
+            items = sorted(bucket, key=lambda uid: self.responded[uid][0])
+            bucket.clear()
+            bucket.update(dict.fromkeys(items))
+
+    # --- Отрисовка ---
+
+    def header(self, compact=False):
+        formatted = datetime.strptime(self.date, '%Y-%m-%d').strftime('%d.%m.%Y')
+        parts = [f"📊 Отчет за {formatted}\n\n"]
+        if self.vacation and compact:
+            parts.append(f"❌ Не отправлено:\n• Отпуск: {len(self.vacation)} чел.\n\n")
+        elif self.vacation:
+            parts.append(f"❌ Не отправлено:\n• Отпуск: {', '.join(self.vacation)} ({len(self.vacation)} чел.)\n\n")
+        return ''.join(parts)
+
+    def summary(self):
+        """Строка "Ответили: X из Y (Z%)" """
+        admin_count = 0 if self.admin_as_employee else 1
+        total_users = self.users_count - len(self.vacation) - admin_count
+        text = f"👥 Ответили: {len(self.responded)} из {total_users}"
+        if total_users > 0:
+            text += f" ({len(self.responded) / total_users * 100:.0f}%)"
+        return text + "\n\n"
+
+    def mood_sections(self):
+        """Блок на каждое настроение: заголовок и строки ответивших"""
+        sections = []
+        for mood in MOOD_ORDER:
+            bucket = self.buckets.get(mood)
+            if not bucket:
+                continue
+            mood_data = MOOD_OPTIONS[mood]
+            lines = [f"{mood_data['emoji']} {mood_data['text']} ({len(bucket)}):\n"]
+            for user_id in bucket:
+                _, _, username, project = self.responded[user_id]
+                lines.append(f"  • @{username}: {project}\n")
+            lines.append("\n")
+            sections.append(''.join(lines))
+        return sections
+
+    def pending_section(self):
+        if not self.pending:
+            return ''
+        lines = [f"❌ Не ответили ({len(self.pending)}):\n"]
+        lines.extend(f"  • @{username}\n" for username in self.pending.values())
+        return ''.join(lines)
+
+    def sections(self):
+        """Текст отчета блоками (заголовок, итог, настроения, не ответившие)"""
+        if not self.responded:
+            return [self.header(), "❌ Сегодня никто не ответил на опрос."]
+        sections = [self.header(), self.summary(), *self.mood_sections()]
+        pending = self.pending_section()
+        if pending:
+            sections.append(pending)
+        return sections
+
+    def render(self):
+        return ''.join(self.sections())
+
+    def summary_sections(self):
+        """Короткий вариант для большой команды: только числа, списки - в CSV"""
+        if not self.responded:
+            return [self.header(compact=True), "❌ Сегодня никто не ответил на опрос."]
+        lines = [
+            f"{MOOD_OPTIONS[mood]['emoji']} {MOOD_OPTIONS[mood]['text']}: {len(self.buckets[mood])}\n"
+            for mood in MOOD_ORDER if self.buckets.get(mood)
+        ]
+        if self.pending:
+            lines.append(f"❌ Не ответили: {len(self.pending)}\n")
+        lines.append("\n📎 Ответы по сотрудникам - в CSV файле ниже.")
+        return [self.header(compact=True), self.summary(), ''.join(lines)]
@@ -1,29 +1,548 @@
 """
 Работа с JSON файлами (база данных)
 """
+import asyncio
 import json
-from datetime import datetime, date
-from workalendar.europe import Russia
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import datetime, date, timedelta
 from config import (
-    USER_DATA_FILE, RESPONSES_FILE, REMINDER_SETTINGS_FILE, HOLIDAYS_FILE,
-    SCHEDULE_SETTINGS_FILE, logger
+    USER_DATA_FILE, RESPONSES_FILE, RESPONSES_DIR, REMINDER_SETTINGS_FILE, HOLIDAYS_FILE,
+    SCHEDULE_SETTINGS_FILE, RESPONSES_JOURNAL_FILE, PENDING_RESPONDERS_FILE, ROLLUPS_FILE,
+    WORKING_DAYS_FILE, JOURNAL_COMPACT_THRESHOLD, RESPONSES_CACHE_MONTHS, STORAGE_BACKEND,
+    WRITE_BEHIND_INTERVAL_MS, MANAGER_CHAT_ID, MSK_TZ, logger
 )
+from daily_report import DailyReport
+from io_executor import io_executor
+from records import ResponseRecord, compact_days, plain_days
+from rollups import Rollups
+from vacations import VacationIndex, find_overlap, normalize_vacations
+from working_days import WorkingDays
 
-# Производственный календарь РФ
-calendar = Russia()
+_calendar = None
+
+
+def get_calendar():
+    """Производственный календарь РФ (workalendar импортируется при первом обращении)"""
+    global _calendar
+    if _calendar is None:
+        from workalendar.europe import Russia
+        _calendar = Russia()
+    return _calendar
+
+
+def apply_journal_entry(days, entry, make_record=None):
+    """Применяет одну запись журнала к словарю ответов {дата: {user_id: ответ}}"""
+    op = entry.get("op")
+    day = days.setdefault(entry["date"], {})
+    if op == "set":
+        day[entry["user_id"]] = make_record(entry["data"]) if make_record else entry["data"]
+    elif op == "update":
+        if entry["user_id"] in day:
+            day[entry["user_id"]].update(entry["data"])
+
+
+def read_journal(journal_path, required='date'):
+    """Читает записи журнала (оборванная последняя строка пропускается)"""
+    entries = []
+    if not journal_path.exists():
+        return entries
+    
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+                entry[required]
+                entries.append(entry)
+            except (ValueError, KeyError) as e:
+                # Оборванная последняя строка после аварийного завершения
+                logger.warning(f"Пропущена поврежденная запись журнала {journal_path.name}: {e}")
+    return entries
+
+
+def read_json(path, default):
+    """Читает JSON файл, если он существует"""
+    if not path.exists():
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def file_signature(path):
+    """(mtime_ns, размер) файла или None, если файла нет"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def read_settings_file(path):
+    """(подпись, текст) файла настроек или (None, None), если файла нет"""
+    signature = file_signature(path)
+    if signature is None:
+        return None, None
+    with open(path, 'r', encoding='utf-8') as f:
+        return signature, f.read()
+
+
+def write_text_atomic(path, text, newline=None):
+    """Пишет текст во временный файл, fsync и атомарно подменяет им исходный"""
+    tmp_file = path.with_name(path.name + '.tmp')
+    with open(tmp_file, 'w', encoding='utf-8', newline=newline) as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+def write_json_atomic(path, data):
+    """Атомарная запись JSON (см. write_text_atomic)"""
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+
+class WriteBehind:
+    """Отложенная запись: изменения помечают хранилище грязным, а на диск
+    все накопленное уходит одной пачкой не чаще раза в WRITE_BEHIND_INTERVAL_MS
+    
+    prepare() вызывается в event loop в момент записи и возвращает функцию,
+    которая выполняется в пуле io_executor (сама запись на диск).
+    Вне event loop (миграции, скрипты) запись выполняется сразу.
+    """
+    
+    def __init__(self, interval_ms=WRITE_BEHIND_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self._dirty = {}  # ключ -> prepare
+        self._task = None
+        self._sleeping = False
+        self._closing = False
+        self._write_lock = threading.Lock()
+    
+    def mark_dirty(self, key, prepare):
+        """Помечает хранилище key для записи"""
+        self._dirty[key] = prepare
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_now()
+            return
+        if not self._closing and (self._task is None or self._task.done()):
+            self._task = loop.create_task(self._flush_loop())
+    
+    async def _flush_loop(self):
+        while self._dirty and not self._closing:
+            self._sleeping = True
+            try:
+                await asyncio.sleep(self.interval)
+            finally:
+                self._sleeping = False
+            await io_executor.run('write_behind', self._write, self._take())
+    
+    def _take(self):
+        dirty, self._dirty = self._dirty, {}
+        jobs = []
+        for key, prepare in dirty.items():
+            try:
+                jobs.append((key, prepare()))
+            except Exception as e:
+                logger.error(f"Ошибка подготовки записи {key}: {e}")
+        return jobs
+    
+    def _write(self, jobs):
+        with self._write_lock:
+            for key, job in jobs:
+                try:
+                    job()
+                except Exception as e:
+                    logger.error(f"Ошибка записи {key}: {e}")
+    
+    def flush_now(self):
+        """Синхронно записывает все накопленные изменения"""
+        self._write(self._take())
+    
+    async def close(self):
+        """Финальная запись при остановке бота"""
+        self._closing = True
+        task = self._task
+        if task is not None and not task.done():
+            if self._sleeping:
+                task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await io_executor.run('write_behind', self._write, self._take())
+
+
+def current_month():
+    """Текущий месяц по МСК в формате ГГГГ-ММ"""
+    return datetime.now(MSK_TZ).strftime('%Y-%m')
+
+
+def previous_month():
+    """Прошлый месяц по МСК в формате ГГГГ-ММ"""
+    return (datetime.now(MSK_TZ).replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+
+
+class ResponseStore(Mapping):
+    """Ответы по месяцам (data/responses/ГГГГ-ММ.json) + append-only журнал изменений
+    
+    Текущий месяц загружается сразу, прошлые - по запросу и держатся в LRU кэше.
+    Каждое изменение получает порядковый номер; месяцы с изменениями новее
+    последнего сжатия (durable_seq) из кэша не вытесняются.
+    """
+    
+    def __init__(self, shards_dir, journal_file, legacy_file=None, writer=None,
+                 cache_months=RESPONSES_CACHE_MONTHS, compact_threshold=JOURNAL_COMPACT_THRESHOLD):
+        self.shards_dir = shards_dir
+        self.index_file = shards_dir / 'index.json'
+        self.journal_file = journal_file
+        # Журнал, который сейчас сжимается в фоне
+        self.compacting_file = journal_file.with_name(journal_file.name + '.compacting')
+        # Старый единый responses.json, переносится в помесячные файлы при загрузке
+        self.legacy_file = legacy_file
+        self.cache_months = max(1, cache_months)
+        self.compact_threshold = compact_threshold
+        self._months = OrderedDict()  # месяц -> {дата: {user_id: ответ}} в порядке LRU
+        self._index = {}  # месяц -> множество дат опросов (для всех месяцев, без загрузки)
+        self.writer = writer
+        self._seq = 0  # номер последнего изменения
+        self._month_seq = {}  # месяц -> номер последнего изменения месяца
+        self._day_seq = {}  # дата -> номер последнего изменения дня (версия ответов дня)
+        self._durable_seq = 0  # изменения до этого номера уже лежат в файлах месяцев
+        self._compacting_seq = 0
+        self._buffer = []  # строки журнала, еще не записанные на диск
+        self._journal = None
+        self._journal_entries = 0
+        self._compact_thread = None
+        self._lock = threading.Lock()
+    
+    # --- Mapping: дата -> {user_id: ответ} ---
+    
+    def __getitem__(self, date_str):
+        month = date_str[:7]
+        if date_str not in self._index.get(month, ()):
+            raise KeyError(date_str)
+        return self._month(month)[date_str]
+    
+    def __contains__(self, date_str):
+        return date_str in self._index.get(date_str[:7], ())
+    
+    def __iter__(self):
+        return iter(sorted(date_str for dates in self._index.values() for date_str in dates))
+    
+    def __len__(self):
+        return sum(len(dates) for dates in self._index.values())
+    
+    # --- Запросы для отчетов (те же, что у sqlite_storage.SqliteResponseStore) ---
+    
+    def month_days(self, year, month):
+        """Даты опросов за месяц (по возрастанию)"""
+        return sorted(self._index.get(f"{year}-{month:02d}", ()))
+    
+    def day_version(self, date_str):
+        """Версия ответов дня: растет при каждом изменении (в пределах запуска бота)"""
+        return self._day_seq.get(date_str, 0)
+    
+    def response(self, date_str, user_id):
+        """Ответ пользователя за день (None, если его нет)"""
+        if date_str not in self:
+            return None
+        return self[date_str].get(user_id)
+    
+    def user_month_responses(self, user_id, year, month):
+        """{дата: ответ} пользователя за месяц"""
+        result = {}
+        for date_str in self.month_days(year, month):
+            response = self[date_str].get(user_id)
+            if response is not None:
+                result[date_str] = response
+        return result
+    
+    def changed_months(self):
+        """Месяцы, измененные журналом (проигранным при загрузке или новыми записями)"""
+        return sorted(self._month_seq)
+    
+    # --- Помесячные файлы ---
+    
+    def _shard_file(self, month):
+        return self.shards_dir / f"{month}.json"
+    
+    def _month(self, month):
+        """Возвращает дни месяца, подгружая файл месяца при необходимости"""
+        days = self._months.get(month)
+        if days is not None:
+            self._months.move_to_end(month)
+            return days
+        
+        try:
+            # В памяти ответы хранятся компактными записями (records.ResponseRecord)
+            days = compact_days(read_json(self._shard_file(month), {}))
+        except Exception as e:
+            logger.error(f"Ошибка загрузки ответов за {month}: {e}")
+            days = {}
+        self._months[month] = days
+        self._evict()
+        return days
+    
+    def _evict(self):
+        """Вытесняет самые давно использованные месяцы сверх размера кэша"""
+        durable_seq = self._durable_seq
+        pinned = {month for month, seq in self._month_seq.items() if seq > durable_seq}
+        pinned.add(current_month())
+        
+        while len(self._months) > self.cache_months:
+            victim = next((month for month in self._months if month not in pinned), None)
+            if victim is None:
+                break
+            del self._months[victim]
+    
+    def _rebuild_index(self):
+        """Собирает индекс дат по всем файлам месяцев"""
+        index = {}
+        for shard in sorted(self.shards_dir.glob('????-??.json')):
+            index[shard.stem] = set(read_json(shard, {}))
+        write_json_atomic(self.index_file, {month: sorted(dates) for month, dates in index.items()})
+        return index
+    
+    def _split_legacy_snapshot(self):
+        """Разбивает старый единый responses.json на помесячные файлы (один раз)"""
+        days = read_json(self.legacy_file, {})
+        months = {}
+        for date_str, day_responses in days.items():
+            months.setdefault(date_str[:7], {})[date_str] = day_responses
+        
+        for month, month_days in months.items():
+            shard = self._shard_file(month)
+            existing = read_json(shard, {})
+            existing.update(month_days)
+            write_json_atomic(shard, existing)
+        
+        self._rebuild_index()
+        os.replace(self.legacy_file, self.legacy_file.with_name(self.legacy_file.name + '.bak'))
+        logger.info(f"responses.json разбит на помесячные файлы: {len(months)} мес.")
+    
+    # --- Загрузка ---
+    
+    def load(self):
+        """Загружает индекс и текущий месяц, проигрывает несжатые журналы"""
+        try:
+            self.shards_dir.mkdir(exist_ok=True)
+            if self.legacy_file is not None and self.legacy_file.exists():
+                self._split_legacy_snapshot()
+            if self.index_file.exists():
+                self._index = {month: set(dates) for month, dates in read_json(self.index_file, {}).items()}
+            else:
+                self._index = self._rebuild_index()
+        except Exception as e:
+            logger.error(f"Ошибка загрузки ответов: {e}")
+        
+        try:
+            # Незавершенное сжатие с прошлого запуска проигрываем первым
+            pending = read_journal(self.compacting_file)
+            journal = read_journal(self.journal_file)
+        except Exception as e:
+            logger.error(f"Ошибка чтения журнала ответов: {e}")
+            pending, journal = [], []
+        
+        self._month(current_month())
+        for entry in pending:
+            self._apply(entry)
+        self._compacting_seq = self._seq
+        for entry in journal:
+            self._apply(entry)
+        self._journal_entries = len(journal)
+        
+        if self.compacting_file.exists():
+            self._start_compaction()
+        return self
+    
+    # --- Изменения ---
+    
+    def ensure_day(self, date_str):
+        """Заводит пустой день (опрос отправлен, ответов пока нет)"""
+        if date_str not in self:
+            self._record({"op": "day", "date": date_str})
+    
+    def set(self, date_str, user_id, data):
+        """Записывает ответ пользователя за день"""
+        self._record({"op": "set", "date": date_str, "user_id": user_id, "data": data})
+    
+    def update(self, date_str, user_id, fields):
+        """Дополняет существующий ответ пользователя (проект, время завершения)"""
+        if user_id not in self.get(date_str, {}):
+            return False
+        self._record({"op": "update", "date": date_str, "user_id": user_id, "data": fields})
+        return True
+    
+    def _apply(self, entry):
+        month = entry["date"][:7]
+        self._seq += 1
+        self._month_seq[month] = self._seq
+        self._day_seq[entry["date"]] = self._seq
+        self._index.setdefault(month, set()).add(entry["date"])
+        apply_journal_entry(self._month(month), entry, ResponseRecord.from_dict)
+    
+    def _record(self, entry):
+        self._apply(entry)
+        with self._lock:
+            self._buffer.append((self._seq, json.dumps(entry, ensure_ascii=False) + '\n'))
+        if self.writer is not None:
+            self.writer.mark_dirty('responses', lambda: self.flush_journal)
+        else:
+            self.flush_journal()
+    
+    def flush_journal(self):
+        """Дописывает накопленные строки в журнал (одним fsync); может работать в потоке"""
+        with self._lock:
+            buffer, self._buffer = self._buffer, []
+            if not buffer:
+                return
+            try:
+                if self._journal is None:
+                    self._journal = open(self.journal_file, 'a', encoding='utf-8')
+                self._journal.write(''.join(line for _, line in buffer))
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal_entries += len(buffer)
+            except Exception as e:
+                # Строки возвращаются в буфер и будут записаны при следующей попытке
+                self._buffer = buffer + self._buffer
+                logger.error(f"Ошибка записи в журнал ответов: {e}")
+                return
+            written_seq = buffer[-1][0]
+        
+        if self._journal_entries >= self.compact_threshold:
+            self._start_compaction(upto_seq=written_seq)
+    
+    # --- Сжатие журнала ---
+    
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+    
+    def _start_compaction(self, upto_seq=None):
+        """Откладывает текущий журнал (все изменения до upto_seq) и сжимает его
+        в файлы месяцев в фоновом потоке; без upto_seq дожимает отложенный журнал"""
+        with self._lock:
+            if self._compact_thread is not None and self._compact_thread.is_alive():
+                return
+            if upto_seq is not None:
+                if self.compacting_file.exists():
+                    return
+                self._close_journal()
+                try:
+                    os.replace(self.journal_file, self.compacting_file)
+                except FileNotFoundError:
+                    return
+                self._compacting_seq = upto_seq
+                self._journal_entries = 0
+            self._compact_thread = threading.Thread(
+                target=self._compact, name="responses-compaction", daemon=True
+            )
+            self._compact_thread.start()
+    
+    def _compact(self):
+        """Файлы месяцев с диска + отложенный журнал -> новые файлы (память бота не трогается)"""
+        try:
+            entries = read_journal(self.compacting_file)
+            by_month = {}
+            for entry in entries:
+                by_month.setdefault(entry["date"][:7], []).append(entry)
+            
+            for month, month_entries in by_month.items():
+                shard = self._shard_file(month)
+                days = read_json(shard, {})
+                for entry in month_entries:
+                    apply_journal_entry(days, entry)
+                write_json_atomic(shard, days)
+            
+            index = read_json(self.index_file, {})
+            for entry in entries:
+                dates = index.setdefault(entry["date"][:7], [])
+                if entry["date"] not in dates:
+                    dates.append(entry["date"])
+                    dates.sort()
+            write_json_atomic(self.index_file, index)
+            
+            self.compacting_file.unlink()
+            self._durable_seq = max(self._durable_seq, self._compacting_seq)
+            logger.info(f"Журнал ответов сжат ({len(entries)} записей, месяцев: {len(by_month)})")
+        except Exception as e:
+            logger.error(f"Ошибка сжатия журнала ответов: {e}")
+    
+    def wait_compaction(self):
+        """Дожидается завершения фонового сжатия"""
+        thread = self._compact_thread
+        if thread is not None:
+            thread.join()
+    
+    def save_snapshot(self):
+        """Записывает все несжатые месяцы из памяти в файлы и очищает журналы"""
+        self.flush_journal()
+        self.wait_compaction()
+        with self._lock:
+            self._close_journal()
+            for month, seq in self._month_seq.items():
+                if seq > self._durable_seq:
+                    write_json_atomic(self._shard_file(month), plain_days(self._months[month]))
+            write_json_atomic(self.index_file, {month: sorted(dates) for month, dates in self._index.items()})
+            for path in (self.compacting_file, self.journal_file):
+                if path.exists():
+                    path.unlink()
+            self._durable_seq = self._seq
+            self._journal_entries = 0
+    
+    def close(self):
+        """Дописывает журнал и закрывает его (при остановке бота)"""
+        self.flush_journal()
+        self.wait_compaction()
+        with self._lock:
+            self._close_journal()
 
 
 class FeedbackBot:
     def __init__(self):
+        # SQLite подключается только при STORAGE_BACKEND=sqlite
+        self.storage = None
+        if STORAGE_BACKEND == 'sqlite':
+            from sqlite_storage import SqliteStorage
+            self.storage = SqliteStorage()
+        
+        # Все save_* пишут на диск пачками через write-behind
+        self.writer = WriteBehind()
+        
+        # Подпись (mtime_ns, размер) файлов настроек на момент последнего чтения/записи
+        self.settings_signatures = {}
+        
+        # Счетчики изменений пользователей и отпусков (ключ кэша ежедневного отчета)
+        self.users_version = 0
+        self.vacations_version = 0
+        
         self.users = self.load_users()
         self.responses = self.load_responses()
+        self.rollups = self.load_rollups()
         self.reminder_settings = self.load_reminder_settings()
         self.holidays_settings = self.load_holidays_settings()
+        self.set_vacations(self.holidays_settings["vacations"])
+        self.working_days = self.load_working_days()
         self.schedule_settings = self.load_schedule_settings()
+        self.pending_responders = self.load_pending_responders()
         self.reminder_tasks = {}  # Хранение задач напоминаний
+        # Живой отчет за день и то, из чего он построен (при изменении - перестройка)
+        self._daily_report = None
+        self._daily_report_key = None
     
     def load_users(self):
         try:
+            if self.storage:
+                return self.storage.load_users()
             if USER_DATA_FILE.exists():
                 with open(USER_DATA_FILE, 'r', encoding='utf-8') as f:
                     return json.load(f)
@@ -32,42 +551,145 @@ class FeedbackBot:
             logger.error(f"Ошибка загрузки пользователей: {e}")
             return {}
     
+    def _json_job(self, path, data, saved_message=None):
+        """Сериализует данные сейчас, а запись на диск отдает в поток write-behind"""
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        
+        def job():
+            write_text_atomic(path, text)
+            if path in self.settings_signatures:
+                # Своя запись не должна вызывать повторное чтение файла
+                self.settings_signatures[path] = file_signature(path)
+            if saved_message:
+                logger.info(saved_message)
+        return job
+    
     def save_users(self):
-        try:
-            with open(USER_DATA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.users, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Ошибка сохранения пользователей: {e}")
+        self.users_version += 1
+        
+        def prepare():
+            if self.storage:
+                users = {user_id: dict(data) for user_id, data in self.users.items()}
+                return lambda: self.storage.save_users(users)
+            return self._json_job(USER_DATA_FILE, self.users)
+        self.writer.mark_dirty(USER_DATA_FILE.name, prepare)
     
     def load_responses(self):
+        if self.storage:
+            from sqlite_storage import SqliteResponseStore
+            return SqliteResponseStore(self.storage, writer=self.writer)
+        return ResponseStore(
+            RESPONSES_DIR, RESPONSES_JOURNAL_FILE, legacy_file=RESPONSES_FILE, writer=self.writer
+        ).load()
+    
+    def ensure_day(self, date_str):
+        """Заводит день опроса в ответах и сводках"""
+        self.responses.ensure_day(date_str)
+        self.rollups.ensure_day(date_str)
+        self.save_rollups()
+    
+    def record_response(self, date_str, user_id, data):
+        """Записывает ответ пользователя и обновляет сводки"""
+        old = self.responses.response(date_str, user_id)
+        old = dict(old) if old else None
+        self.responses.set(date_str, user_id, data)
+        self.rollups.apply(date_str, user_id, old, data)
+        self.save_rollups()
+        self._update_daily_report(date_str, user_id, data)
+    
+    def update_response(self, date_str, user_id, fields):
+        """Дополняет ответ пользователя (проект, время завершения) и обновляет сводки"""
+        old = self.responses.response(date_str, user_id)
+        if not old:
+            return False
+        old = dict(old)
+        if not self.responses.update(date_str, user_id, fields):
+            return False
+        self.rollups.apply(date_str, user_id, old, {**old, **fields})
+        self.save_rollups()
+        self._update_daily_report(date_str, user_id, {**old, **fields})
+        return True
+    
+    def daily_report(self, date_str):
+        """Живой отчет за день; строится заново, только если изменились пользователи,
+        отпуска или admin_as_employee"""
+        admin_as_employee = self.schedule_settings.get("admin_as_employee", True)
+        key = (date_str, self.users_version, self.vacations_version, admin_as_employee)
+        if self._daily_report is None or self._daily_report_key != key:
+            day = datetime.strptime(date_str, '%Y-%m-%d').date()
+            self._daily_report = DailyReport(
+                date_str, self.users, self.responses.get(date_str, {}),
+                self.vacations_on(day), MANAGER_CHAT_ID, admin_as_employee
+            )
+            self._daily_report_key = key
+        return self._daily_report
+    
+    def _update_daily_report(self, date_str, user_id, response):
+        if self._daily_report is not None and self._daily_report.date == date_str:
+            self._daily_report.apply(user_id, response)
+    
+    def load_rollups(self):
+        """Загружает сводки; при отсутствии файла строит их по всем ответам"""
         try:
-            if RESPONSES_FILE.exists():
-                with open(RESPONSES_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
+            data = read_json(ROLLUPS_FILE, None)
+            if data is None:
+                logger.info("Файл rollups.json не найден, строю сводки по всем ответам")
+                rollups = Rollups.build(self.responses)
+                self.rollups = rollups
+                self.save_rollups()
+                return rollups
+            
+            rollups = Rollups.from_dict(data)
+            # Сводки могли не успеть записаться перед остановкой: пересчитываем месяцы
+            # из журнала ответов, а также текущий и прошлый (его читают месячные отчеты 1-го числа)
+            months = {current_month(), previous_month(), *self.responses.changed_months()}
+            for month_key in sorted(months):
+                rollups.rebuild_month(self.responses, month_key)
+            return rollups
         except Exception as e:
-            logger.error(f"Ошибка загрузки ответов: {e}")
-            return {}
+            logger.error(f"Ошибка загрузки сводок, строю их заново по всем ответам: {e}")
+            rollups = Rollups.build(self.responses)
+            self.rollups = rollups
+            self.save_rollups()
+            return rollups
+    
+    def save_rollups(self):
+        """Сохраняет сводки (через write-behind, пачками)"""
+        self.writer.mark_dirty(
+            ROLLUPS_FILE.name,
+            lambda: self._json_job(ROLLUPS_FILE, self.rollups.to_dict())
+        )
     
     def save_responses(self):
+        """Принудительная запись несжатых месяцев (изменения и так пишутся в журнал)"""
         try:
-            with open(RESPONSES_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.responses, f, ensure_ascii=False, indent=2)
+            self.responses.save_snapshot()
         except Exception as e:
             logger.error(f"Ошибка сохранения ответов: {e}")
     
-    def load_reminder_settings(self):
+    async def close(self):
+        """Финальная запись всех изменений при остановке бота"""
+        await self.writer.close()
+        await io_executor.run('responses_close', self.responses.close)
+        if self.storage:
+            self.storage.close()
+    
+    def load_reminder_settings(self, snapshot=None):
         """Загружает настройки напоминаний"""
         try:
-            if REMINDER_SETTINGS_FILE.exists():
-                with open(REMINDER_SETTINGS_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            # snapshot - (подпись, текст), уже прочитанные в пуле (см. refresh_settings)
+            signature, text = snapshot if snapshot is not None else read_settings_file(REMINDER_SETTINGS_FILE)
+            if text is not None:
+                settings = json.loads(text)
+                self.settings_signatures[REMINDER_SETTINGS_FILE] = signature
+                return settings
             else:
                 logger.info("Создаю файл reminder_settings.json с дефолтными настройками")
                 default = {
                     "enabled": True,
                     "times": ["17:30", "18:00", "18:30"]
                 }
+                self.settings_signatures[REMINDER_SETTINGS_FILE] = None
                 self.save_reminder_settings(default)
                 return default
         except Exception as e:
@@ -76,19 +698,24 @@ class FeedbackBot:
     
     def save_reminder_settings(self, settings):
         """Сохраняет настройки напоминаний"""
-        try:
-            with open(REMINDER_SETTINGS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, ensure_ascii=False, indent=2)
-            logger.info("Настройки напоминаний сохранены")
-        except Exception as e:
-            logger.error(f"Ошибка сохранения reminder_settings.json: {e}")
+        self.writer.mark_dirty(
+            REMINDER_SETTINGS_FILE.name,
+            lambda: self._json_job(REMINDER_SETTINGS_FILE, settings, "Настройки напоминаний сохранены")
+        )
     
-    def load_holidays_settings(self):
+    def load_holidays_settings(self, snapshot=None):
         """Загружает настройки выходных и отпусков"""
         try:
-            if HOLIDAYS_FILE.exists():
-                with open(HOLIDAYS_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            signature, text = snapshot if snapshot is not None else read_settings_file(HOLIDAYS_FILE)
+            if text is not None:
+                settings = json.loads(text)
+                self.settings_signatures[HOLIDAYS_FILE] = signature
+                # В режиме SQLite отпуска хранятся в таблице vacations
+                if self.storage:
+                    settings["vacations"] = self.storage.load_vacations()
+                # Старый формат: один отпуск (словарь) на пользователя
+                settings["vacations"] = normalize_vacations(settings.get("vacations"))
+                return settings
             else:
                 logger.info("Создаю файл holidays.json с дефолтными настройками")
                 default = {
@@ -96,27 +723,48 @@ class FeedbackBot:
                     "sunday_working": False,
                     "vacations": {}
                 }
+                self.settings_signatures[HOLIDAYS_FILE] = None
                 self.save_holidays_settings(default)
                 return default
         except Exception as e:
             logger.error(f"Ошибка загрузки holidays.json: {e}")
             return {"saturday_working": False, "sunday_working": False, "vacations": {}}
     
+    def set_vacations(self, vacations):
+        """Перестраивает индекс отпусков; vacations_version меняется при каждом изменении"""
+        self.vacation_index = VacationIndex(vacations)
+        self.vacations_version += 1
+    
     def save_holidays_settings(self, settings):
         """Сохраняет настройки выходных и отпусков"""
-        try:
-            with open(HOLIDAYS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, ensure_ascii=False, indent=2)
-            logger.info("Настройки выходных и отпусков сохранены")
-        except Exception as e:
-            logger.error(f"Ошибка сохранения holidays.json: {e}")
+        self.set_vacations(settings.get("vacations", {}))
+        
+        def prepare():
+            if not self.storage:
+                return self._json_job(HOLIDAYS_FILE, settings, "Настройки выходных и отпусков сохранены")
+            
+            # В режиме SQLite отпуска пишутся в таблицу, остальное - в holidays.json
+            vacations = {
+                user_id: [dict(vacation) for vacation in items]
+                for user_id, items in settings.get("vacations", {}).items()
+            }
+            flags = {key: value for key, value in settings.items() if key != "vacations"}
+            write_flags = self._json_job(HOLIDAYS_FILE, flags, "Настройки выходных и отпусков сохранены")
+            
+            def job():
+                self.storage.save_vacations(vacations)
+                write_flags()
+            return job
+        self.writer.mark_dirty(HOLIDAYS_FILE.name, prepare)
     
-    def load_schedule_settings(self):
+    def load_schedule_settings(self, snapshot=None):
         """Загружает настройки расписания (время опроса и отчета)"""
         try:
-            if SCHEDULE_SETTINGS_FILE.exists():
-                with open(SCHEDULE_SETTINGS_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            signature, text = snapshot if snapshot is not None else read_settings_file(SCHEDULE_SETTINGS_FILE)
+            if text is not None:
+                settings = json.loads(text)
+                self.settings_signatures[SCHEDULE_SETTINGS_FILE] = signature
+                return settings
             else:
                 logger.info("Создаю файл schedule_settings.json с дефолтными настройками")
                 default = {
@@ -124,6 +772,7 @@ class FeedbackBot:
                     "report_time": "21:00",
                     "admin_as_employee": True
                 }
+                self.settings_signatures[SCHEDULE_SETTINGS_FILE] = None
                 self.save_schedule_settings(default)
                 return default
         except Exception as e:
@@ -132,63 +781,205 @@ class FeedbackBot:
     
     def save_schedule_settings(self, settings):
         """Сохраняет настройки расписания"""
+        self.writer.mark_dirty(
+            SCHEDULE_SETTINGS_FILE.name,
+            lambda: self._json_job(SCHEDULE_SETTINGS_FILE, settings, "Настройки расписания сохранены")
+        )
+    
+    def changed_settings(self):
+        """
+        Файлы настроек, измененные вне бота (сверка mtime и размера): {файл: (подпись, текст)}.
+        Только чтение с диска - выполняется в пуле, состояние бота не меняет.
+        Изменения через команды уже в памяти, такие файлы не перечитываются.
+        """
+        return {
+            path: read_settings_file(path)
+            for path in (SCHEDULE_SETTINGS_FILE, REMINDER_SETTINGS_FILE, HOLIDAYS_FILE)
+            if file_signature(path) != self.settings_signatures.get(path)
+        }
+    
+    async def refresh_settings(self):
+        """
+        Перечитывает измененные файлы настроек: чтение - в пуле, разбор и замена
+        настроек - в event loop. Возвращает True, если хотя бы один файл был перечитан.
+        """
+        changed = await io_executor.run('refresh_settings', self.changed_settings)
+        if SCHEDULE_SETTINGS_FILE in changed:
+            self.schedule_settings = self.load_schedule_settings(changed[SCHEDULE_SETTINGS_FILE])
+        if REMINDER_SETTINGS_FILE in changed:
+            self.reminder_settings = self.load_reminder_settings(changed[REMINDER_SETTINGS_FILE])
+        if HOLIDAYS_FILE in changed:
+            self.holidays_settings = self.load_holidays_settings(changed[HOLIDAYS_FILE])
+            self.set_vacations(self.holidays_settings["vacations"])
+        
+        if changed:
+            logger.info(f"Файлы настроек изменены на диске и перечитаны: {', '.join(path.name for path in changed)}")
+        return bool(changed)
+    
+    def load_pending_responders(self):
+        """Загружает список тех, кто получил сегодняшний опрос и еще не ответил"""
         try:
-            with open(SCHEDULE_SETTINGS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, ensure_ascii=False, indent=2)
-            logger.info("Настройки расписания сохранены")
+            data = read_json(PENDING_RESPONDERS_FILE, {})
+            return {"date": data.get("date"), "users": set(data.get("users", []))}
         except Exception as e:
-            logger.error(f"Ошибка сохранения schedule_settings.json: {e}")
+            logger.error(f"Ошибка загрузки pending_responders.json: {e}")
+            return {"date": None, "users": set()}
+    
+    def save_pending_responders(self):
+        """Сохраняет список ожидающих ответа"""
+        self.writer.mark_dirty(
+            PENDING_RESPONDERS_FILE.name,
+            lambda: self._json_job(PENDING_RESPONDERS_FILE, {
+                "date": self.pending_responders["date"],
+                "users": sorted(self.pending_responders["users"])
+            })
+        )
+    
+    def start_pending_responders(self, date_str, user_ids):
+        """Опрос разослан: ждем ответа от всех получателей, кроме уже ответивших"""
+        answered = self.responses.get(date_str, {})
+        self.pending_responders = {
+            "date": date_str,
+            "users": {user_id for user_id in user_ids if user_id not in answered}
+        }
+        self.save_pending_responders()
+    
+    def add_pending_responder(self, date_str, user_id):
+        """Зарегистрировался после опроса за date_str - тоже получит напоминания"""
+        if self.pending_responders["date"] != date_str or user_id in self.pending_responders["users"]:
+            return
+        if self.responses.response(date_str, user_id) is not None:
+            return
+        self.pending_responders["users"].add(user_id)
+        self.save_pending_responders()
+    
+    def mark_responded(self, date_str, user_id):
+        """Пользователь ответил - убираем из ожидающих"""
+        if self.pending_responders["date"] == date_str and user_id in self.pending_responders["users"]:
+            self.pending_responders["users"].discard(user_id)
+            self.save_pending_responders()
+    
+    def get_pending_responders(self, date_str):
+        """Кто еще не ответил на опрос за date_str (пусто, если опроса не было)"""
+        if self.pending_responders["date"] != date_str:
+            return set()
+        return set(self.pending_responders["users"])
+    
+    def load_working_days(self):
+        """Загружает кэш рабочих дней (праздники РФ + настройки выходных)"""
+        try:
+            data = read_json(WORKING_DAYS_FILE, None)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки working_days.json: {e}")
+            data = None
+        return WorkingDays(get_calendar, data, on_update=self.save_working_days)
+    
+    def save_working_days(self):
+        """Сохраняет кэш рабочих дней"""
+        self.writer.mark_dirty(
+            WORKING_DAYS_FILE.name,
+            lambda: self._json_job(WORKING_DAYS_FILE, self.working_days.to_dict())
+        )
     
     def is_working_day(self, check_date):
-        """Проверяет, является ли день рабочим"""
-        # Проверяем праздники РФ
-        if not calendar.is_working_day(check_date):
-            return False
-        
-        # Проверяем настройки выходных
-        weekday = check_date.weekday()
-        if weekday == 5 and not self.holidays_settings.get("saturday_working", False):  # Суббота
-            return False
-        if weekday == 6 and not self.holidays_settings.get("sunday_working", False):  # Воскресенье
-            return False
-        
-        return True
+        """Проверяет, является ли день рабочим (праздники РФ и настройки выходных)"""
+        return self.working_days.is_working_day(
+            check_date,
+            self.holidays_settings.get("saturday_working", False),
+            self.holidays_settings.get("sunday_working", False)
+        )
+    
+    def working_days_mask(self, year, month):
+        """Маска рабочих дней месяца (бит день - 1, как в сводках rollups)"""
+        return self.working_days.month_mask(
+            year, month,
+            self.holidays_settings.get("saturday_working", False),
+            self.holidays_settings.get("sunday_working", False)
+        )
+    
+    def get_user_vacations(self, user_id):
+        """Отпуска пользователя по дате начала"""
+        return self.holidays_settings.get("vacations", {}).get(user_id, [])
+    
+    def find_vacation_overlap(self, user_id, start_date, end_date, ignore_start=None):
+        """Отпуск пользователя, пересекающийся с периодом (None, если таких нет)"""
+        return find_overlap(self.get_user_vacations(user_id), start_date, end_date, ignore_start)
+    
+    def add_vacations(self, items):
+        """Добавляет отпуска [(user_id, отпуск)] одним сохранением (отпуск с той же датой начала заменяется)"""
+        vacations = self.holidays_settings.setdefault("vacations", {})
+        for user_id, vacation in items:
+            user_vacations = [v for v in vacations.get(user_id, []) if v["start"] != vacation["start"]]
+            user_vacations.append(vacation)
+            vacations[user_id] = sorted(user_vacations, key=lambda v: v["start"])
+        self.save_holidays_settings(self.holidays_settings)
+    
+    def remove_vacations(self, user_id, start=None):
+        """Удаляет отпуск пользователя с датой начала start (все отпуска, если start не задан)"""
+        vacations = self.holidays_settings.get("vacations", {})
+        user_vacations = vacations.get(user_id, [])
+        removed = [v for v in user_vacations if start is None or v["start"] == start]
+        if not removed:
+            return []
+        kept = [v for v in user_vacations if v not in removed]
+        if kept:
+            vacations[user_id] = kept
+        else:
+            del vacations[user_id]
+        self.save_holidays_settings(self.holidays_settings)
+        return removed
+    
+    def vacations_on(self, check_date):
+        """Множество user_id, находящихся в отпуске в указанный день"""
+        return self.vacation_index.on_vacation(check_date)
     
     def is_user_on_vacation(self, user_id, check_date):
         """Проверяет, находится ли пользователь в отпуске"""
-        vacations = self.holidays_settings.get("vacations", {})
-        if user_id not in vacations:
-            return False
-        
-        vacation = vacations[user_id]
-        start_date = datetime.strptime(vacation["start"], '%Y-%m-%d').date()
-        end_date = datetime.strptime(vacation["end"], '%Y-%m-%d').date()
-        
-        return start_date <= check_date <= end_date
+        return self.vacation_index.is_on_vacation(user_id, check_date)
     
     def cleanup_expired_vacations(self):
         """Удаляет завершенные отпуска (которые уже закончились)"""
-        from datetime import timedelta
-        
-        vacations = self.holidays_settings.get("vacations", {})
-        if not vacations:
-            return
-        
         today = date.today()
-        expired_users = []
+        # Куча концов отпусков отдает только завершенные, без просмотра всех
+        expired = self.vacation_index.pop_expired(today)
+        if not expired:
+            return
         
-        for user_id, vacation in vacations.items():
-            end_date = datetime.strptime(vacation["end"], '%Y-%m-%d').date()
-            # Удаляем отпуска, которые уже закончились (дата окончания в прошлом)
-            if end_date < today:
-                expired_users.append(user_id)
+        vacations = self.holidays_settings.get("vacations", {})
+        removed = 0
+        for user_id, start in expired:
+            user_vacations = vacations.get(user_id, [])
+            kept = [v for v in user_vacations if v["start"] != start]
+            removed += len(user_vacations) - len(kept)
+            if kept:
+                vacations[user_id] = kept
+            else:
+                vacations.pop(user_id, None)
         
-        if expired_users:
-            for user_id in expired_users:
-                del self.holidays_settings["vacations"][user_id]
-            self.save_holidays_settings(self.holidays_settings)
-            logger.info(f"Удалено завершенных отпусков: {len(expired_users)}")
+        self.save_holidays_settings(self.holidays_settings)
+        logger.info(f"Удалено завершенных отпусков: {removed}")
+
+
+_feedback_bot = None
+
+
+def get_feedback_bot():
+    """Глобальный экземпляр FeedbackBot; создается (с чтением всех данных) при первом обращении"""
+    global _feedback_bot
+    if _feedback_bot is None:
+        _feedback_bot = FeedbackBot()
+    return _feedback_bot
+
+
+class _LazyFeedbackBot:
+    """Позволяет импортировать feedback_bot без загрузки данных: обращения уходят в get_feedback_bot()"""
+    
+    def __getattr__(self, name):
+        return getattr(get_feedback_bot(), name)
+    
+    def __setattr__(self, name, value):
+        setattr(get_feedback_bot(), name, value)
 
 
-# Создаем глобальный экземпляр
-feedback_bot = FeedbackBot()
+# Глобальный экземпляр (данные загружаются в create_app или при первом обращении)
+feedback_bot = _LazyFeedbackBot()
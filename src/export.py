@@ -0,0 +1,133 @@
+"""
+Выгрузка ответов за период в один CSV (колонки те же, что у отчета за день)
+
+Строки идут генератором по дням из хранилища ответов: в памяти держится
+только текущая пачка, а месяцы подгружаются и вытесняются LRU кэшем хранилища.
+Файл можно сжать gzip - так выгрузка за год укладывается в лимит Telegram.
+
+Из командной строки:
+python src/export.py ДД.ММ.ГГГГ-ДД.ММ.ГГГГ [--gzip] [ФАЙЛ]
+"""
+import csv
+import gzip
+import sys
+from itertools import islice
+
+from config import MOOD_OPTIONS, REPORTS_DIR, logger
+
+CSV_HEADER = ['Дата', 'Пользователь', 'Настроение', 'Проект', 'Время ответа']
+
+# Сколько строк собирается в event loop перед записью в пуле дисковых операций
+EXPORT_BATCH_ROWS = 5000
+
+EXPORTS_DIR = REPORTS_DIR / 'exports'
+
+
+def report_row(date_str, response):
+    """Строка CSV для одного ответа"""
+    return [
+        date_str,
+        response['username'],
+        f"{response['mood_emoji']} {MOOD_OPTIONS[response['mood']]['text']}",
+        response.get('project', 'Не указан'),
+        response.get('completed_at', response['timestamp'])
+    ]
+
+
+def iter_days(responses, start_date, end_date):
+    """Даты опросов в [start_date, end_date] по возрастанию - через month_days, без обхода всей истории"""
+    start, end = start_date.isoformat(), end_date.isoformat()
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        for date_str in responses.month_days(year, month):
+            if start <= date_str <= end:
+                yield date_str
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def iter_rows(responses, start_date, end_date):
+    """Строки CSV за период, день за днем"""
+    for date_str in iter_days(responses, start_date, end_date):
+        # Копия ответов дня: сегодняшний день может пополняться во время выгрузки
+        for response in list(responses[date_str].values()):
+            yield report_row(date_str, response)
+
+
+def export_path(start_date, end_date, compress=False):
+    suffix = '.csv.gz' if compress else '.csv'
+    return EXPORTS_DIR / f"report_{start_date.isoformat()}_{end_date.isoformat()}{suffix}"
+
+
+def open_csv(path, compress=False):
+    """Файл для csv.writer: BOM для Excel, при compress - внутри gzip"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if compress:
+        return gzip.open(path, 'wt', newline='', encoding='utf-8-sig')
+    return open(path, 'w', newline='', encoding='utf-8-sig')
+
+
+def export_csv(responses, start_date, end_date, path, compress=False):
+    """Синхронная выгрузка (для командной строки); возвращает число строк"""
+    count = 0
+    with open_csv(path, compress) as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for row in iter_rows(responses, start_date, end_date):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+async def export_csv_async(responses, start_date, end_date, path, compress=False):
+    """
+    Выгрузка из бота: ответы читаются в event loop (хранилище не потокобезопасно)
+    пачками по EXPORT_BATCH_ROWS строк, запись и сжатие - в пуле дисковых операций
+    """
+    from io_executor import io_executor
+
+    rows = iter_rows(responses, start_date, end_date)
+    f = await io_executor.run('export_open', open_csv, path, compress)
+    count = 0
+    try:
+        writer = csv.writer(f)
+        await io_executor.run('export_write', writer.writerow, CSV_HEADER)
+        while batch := list(islice(rows, EXPORT_BATCH_ROWS)):
+            await io_executor.run('export_write', writer.writerows, batch)
+            count += len(batch)
+    except Exception:
+        await io_executor.run('export_close', f.close)
+        path.unlink(missing_ok=True)
+        raise
+    await io_executor.run('export_close', f.close)
+    return count
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--gzip']
+    if not args:
+        print("Использование: python src/export.py ДД.ММ.ГГГГ-ДД.ММ.ГГГГ [--gzip] [ФАЙЛ]")
+        sys.exit(1)
+
+    import asyncio
+    from pathlib import Path
+    from config import ensure_dirs, setup_logging
+    from database import feedback_bot
+    from vacations import parse_date_range
+
+    try:
+        period_start, period_end = parse_date_range(args[0])
+    except ValueError:
+        print("❌ Неверный формат периода, нужно ДД.ММ.ГГГГ-ДД.ММ.ГГГГ")
+        sys.exit(1)
+    if period_end < period_start:
+        print("❌ Дата окончания раньше даты начала")
+        sys.exit(1)
+
+    setup_logging()
+    ensure_dirs()
+
+    use_gzip = '--gzip' in sys.argv
+    target = Path(args[1]) if len(args) > 1 else export_path(period_start, period_end, use_gzip)
+    rows_count = export_csv(feedback_bot.responses, period_start, period_end, target, use_gzip)
+    asyncio.run(feedback_bot.close())
+    logger.info(f"Выгрузка за {period_start} - {period_end}: {rows_count} строк в {target}")
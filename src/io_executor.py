@@ -0,0 +1,144 @@
+"""
+Выделенный пул потоков для дисковых операций
+
+Все блокирующие чтения/записи файлов из обработчиков идут через io_executor.run(),
+чтобы медленный диск не останавливал event loop (и опрос Telegram вместе с ним).
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import IO_WORKERS, IO_QUEUE_SIZE, logger
+
+# Сколько последних замеров хранить на операцию для перцентилей
+LATENCY_WINDOW = 256
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированной выборке (без интерполяции)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class OperationStats:
+    """Счетчики и задержки одной операции"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, wait, duration, failed):
+        self.count += 1
+        self.errors += int(failed)
+        self.wait_total += wait
+        self.run_total += duration
+        self.run_max = max(self.run_max, duration)
+        self.recent.append(duration)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'wait_avg_ms': self.wait_total / self.count * 1000 if self.count else 0.0,
+            'run_avg_ms': self.run_total / self.count * 1000 if self.count else 0.0,
+            'run_p95_ms': percentile(self.recent, 0.95) * 1000,
+            'run_max_ms': self.run_max * 1000,
+        }
+
+
+class IOExecutor:
+    """Пул потоков с ограниченной очередью и метриками по операциям"""
+
+    def __init__(self, max_workers=IO_WORKERS, max_queue=IO_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.max_depth = 0
+        self.stats = {}
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='io')
+        return self._executor
+
+    async def run(self, op, func, *args):
+        """Выполняет func(*args) в пуле; при переполненной очереди ждет свободного места"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_queue)
+
+        async with self._slots:
+            job = {'state': 'queued', 'submitted': time.perf_counter()}
+            with self._lock:
+                self.queued += 1
+                self.max_depth = max(self.max_depth, self.queued + self.running)
+
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._get_executor(), self._call, op, job, func, args)
+            except asyncio.CancelledError:
+                with self._lock:
+                    if job['state'] == 'queued':
+                        job['state'] = 'abandoned'
+                        self.queued -= 1
+                raise
+
+    def _call(self, op, job, func, args):
+        started = time.perf_counter()
+        with self._lock:
+            if job['state'] == 'queued':
+                self.queued -= 1
+            job['state'] = 'running'
+            self.running += 1
+
+        failed = False
+        try:
+            return func(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.running -= 1
+                self.stats.setdefault(op, OperationStats()).record(
+                    started - job['submitted'], finished - started, failed
+                )
+
+    def snapshot(self):
+        """Текущие метрики: глубина очереди и задержки по операциям"""
+        with self._lock:
+            return {
+                'queued': self.queued,
+                'running': self.running,
+                'max_depth': self.max_depth,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'operations': {op: stats.as_dict() for op, stats in sorted(self.stats.items())},
+            }
+
+    def shutdown(self):
+        """Дожидается завершения операций и останавливает пул"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        metrics = self.snapshot()
+        logger.info(
+            f"Пул дисковых операций остановлен. Макс. глубина очереди: {metrics['max_depth']}, "
+            f"операций: {sum(op['count'] for op in metrics['operations'].values())}"
+        )
+
+
+# Создаем глобальный экземпляр
+io_executor = IOExecutor()
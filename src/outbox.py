@@ -0,0 +1,209 @@
+"""
+Очередь исходящих рассылок на диске (data/outbox.journal)
+
+Перед отправкой каждое сообщение записывается в журнал с ключом идемпотентности
+вида "survey:2026-02-19:123456", после отправки - отметка о доставке.
+Если процесс упал посреди рассылки, при запуске недоставленные сообщения
+досылаются, а уже доставленные не отправляются повторно.
+
+Сообщение со статусом failed считается завершенным и не досылается: временные
+ошибки (сеть, 5xx, 429) уже повторялись в Broadcaster.send, остаются
+окончательные (бот заблокирован, чат не найден, исчерпаны повторы).
+
+Завершенные ключи хранятся OUTBOX_RETENTION_DAYS дней; журнал сжимается
+при запуске и после каждой рассылки.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from aiogram.types import InlineKeyboardMarkup
+
+from config import OUTBOX_FILE, OUTBOX_RETENTION_DAYS, MSK_TZ, logger
+from database import read_journal, write_text_atomic
+from io_executor import io_executor
+from broadcast import broadcaster
+
+
+def message_kwargs(entry):
+    """Запись очереди -> параметры send_message"""
+    kwargs = {'text': entry['text']}
+    if 'reply_markup' in entry:
+        kwargs['reply_markup'] = InlineKeyboardMarkup.model_validate(entry['reply_markup'])
+    return kwargs
+
+
+class Outbox:
+    """Журнал ожидающих и доставленных сообщений"""
+
+    def __init__(self, journal_file=OUTBOX_FILE, retention_days=OUTBOX_RETENTION_DAYS):
+        self.journal_file = journal_file
+        self.retention = timedelta(days=retention_days)
+        self.pending = {}    # ключ -> запись "add"
+        self.finished = {}   # ключ -> время постановки в очередь (для срока хранения)
+        self.in_flight = set()
+        self._lock = threading.Lock()        # файл журнала: дозапись и перезапись
+        self._state_lock = threading.Lock()  # pending/finished: event loop и снимок в пуле
+
+    def load(self):
+        """Восстанавливает очередь из журнала и сжимает его (вызывается из create_app)"""
+        for record in read_journal(self.journal_file, required='key'):
+            key = record['key']
+            if record.get('op') == 'add':
+                if key not in self.finished:
+                    self.pending[key] = record
+            elif record.get('op') == 'done':
+                entry = self.pending.pop(key, None)
+                self.finished[key] = entry['created'] if entry else record.get('created')
+
+        self._prune()
+        lines = self._snapshot()
+        if lines or self.journal_file.exists():
+            write_text_atomic(self.journal_file, ''.join(lines))
+
+        if self.pending:
+            logger.info(f"В очереди рассылок {len(self.pending)} недоставленных сообщений")
+
+    def _prune(self):
+        """Забывает завершенные ключи старше срока хранения"""
+        border = datetime.now(MSK_TZ) - self.retention
+        self.finished = {
+            key: created for key, created in self.finished.items()
+            if created and datetime.fromisoformat(created) >= border
+        }
+
+    def _snapshot(self):
+        """Строки сжатого журнала: ожидающие сообщения и завершенные ключи"""
+        lines = [json.dumps(entry, ensure_ascii=False) + '\n' for entry in self.pending.values()]
+        lines += [
+            json.dumps({'op': 'done', 'key': key, 'created': created}, ensure_ascii=False) + '\n'
+            for key, created in self.finished.items()
+        ]
+        return lines
+
+    def _rewrite(self):
+        """
+        Сжимает журнал. Снимок берется под блокировкой файла: запись попадает
+        в pending/finished до постановки дозаписи в пул, поэтому каждая запись
+        либо уже есть в снимке, либо дописывается после замены файла
+        (повтор строки из снимка при чтении журнала безвреден).
+        """
+        with self._lock:
+            with self._state_lock:
+                self._prune()
+                lines = self._snapshot()
+            write_text_atomic(self.journal_file, ''.join(lines))
+
+    async def compact(self):
+        """Убирает из памяти и журнала завершенные ключи старше срока хранения"""
+        await io_executor.run('outbox_compact', self._rewrite)
+
+    def _append(self, records, sync):
+        """Дописывает записи в журнал; sync=True - с fsync (постановка в очередь)"""
+        with self._lock:
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+
+    async def enqueue(self, name, period, messages, expires):
+        """
+        Ставит в очередь messages = [(chat_id, параметры send_message)].
+        Ключ name:period:chat_id; уже известные ключи пропускаются.
+        """
+        created = datetime.now(MSK_TZ).isoformat()
+        records = []
+        with self._state_lock:
+            for chat_id, kwargs in messages:
+                key = f"{name}:{period}:{chat_id}"
+                if key in self.pending or key in self.finished:
+                    continue
+                record = {
+                    'op': 'add',
+                    'key': key,
+                    'name': name,
+                    'chat_id': str(chat_id),
+                    'text': kwargs['text'],
+                    'created': created,
+                    'expires': expires.isoformat()
+                }
+                if kwargs.get('reply_markup') is not None:
+                    record['reply_markup'] = kwargs['reply_markup'].model_dump(exclude_none=True)
+                self.pending[key] = record
+                records.append(record)
+
+        if records:
+            await io_executor.run('outbox_append', self._append, records, True)
+        return len(records)
+
+    async def claim(self, prefix=''):
+        """Забирает ожидающие сообщения с ключом prefix*; просроченные помечаются и пропускаются"""
+        now = datetime.now(MSK_TZ)
+        entries = []
+        expired = []
+        for key, entry in list(self.pending.items()):
+            if not key.startswith(prefix) or key in self.in_flight:
+                continue
+            if datetime.fromisoformat(entry['expires']) <= now:
+                expired.append(key)
+                continue
+            self.in_flight.add(key)
+            entries.append(entry)
+
+        for key in expired:
+            await self._finish(key, 'expired')
+        if expired:
+            logger.info(f"Просрочено и не отправлено сообщений из очереди: {len(expired)}")
+        return entries
+
+    async def _finish(self, key, status):
+        with self._state_lock:
+            entry = self.pending.pop(key, None)
+            created = entry['created'] if entry else datetime.now(MSK_TZ).isoformat()
+            self.finished[key] = created
+        await io_executor.run(
+            'outbox_append', self._append,
+            [{'op': 'done', 'key': key, 'status': status, 'created': created}], False
+        )
+
+    async def deliver(self, bot_instance, entries, name):
+        """Отправляет забранные сообщения, отмечая каждое сразу после результата"""
+        async def on_result(index, ok):
+            await self._finish(entries[index]['key'], 'sent' if ok else 'failed')
+
+        try:
+            return await broadcaster.broadcast(
+                bot_instance,
+                [(entry['chat_id'], message_kwargs(entry)) for entry in entries],
+                name,
+                on_result=on_result
+            )
+        finally:
+            self.in_flight.difference_update(entry['key'] for entry in entries)
+
+    async def broadcast(self, bot_instance, name, period, messages, expires):
+        """Рассылка через очередь: повторный запуск за тот же период досылает только недоставленное"""
+        await self.enqueue(name, period, messages, expires)
+        entries = await self.claim(f"{name}:{period}:")
+        result = await self.deliver(bot_instance, entries, name)
+        try:
+            await self.compact()
+        except Exception as e:
+            logger.error(f"Ошибка сжатия очереди рассылок: {e}")
+        return result
+
+    async def drain(self, bot_instance):
+        """Досылает сообщения, оставшиеся в очереди после перезапуска"""
+        try:
+            entries = await self.claim()
+            if entries:
+                logger.info(f"Досылка {len(entries)} сообщений из очереди после перезапуска")
+                await self.deliver(bot_instance, entries, 'outbox')
+        except Exception as e:
+            logger.error(f"Ошибка досылки очереди рассылок: {e}")
+
+
+# Создаем глобальный экземпляр
+outbox = Outbox()
@@ -0,0 +1,249 @@
+"""
+Компактное представление ответа в памяти
+
+В responses.json и журнале ответ хранится словарем с полными строками
+(username, mood, mood_text, mood_emoji, project, timestamp, completed_at).
+В памяти ResponseRecord держит код настроения, время в микросекундах эпохи,
+интернированное имя пользователя и название проекта (при загрузке месяца
+одинаковые названия сводятся к одной строке; общей таблицы нет, и строки
+освобождаются вместе с вытесненным из кэша месяцем);
+mood_text/mood_emoji и ISO-строки времени получаются при обращении.
+Время не в формате бота хранится исходной строкой: to_dict() возвращает
+ровно то, что было записано.
+Для остального кода запись ведет себя как словарь (только чтение + update).
+"""
+import sys
+from collections.abc import Mapping
+from datetime import datetime
+from functools import lru_cache
+
+from config import MOOD_OPTIONS, MSK_TZ
+
+MOODS = tuple(MOOD_OPTIONS)  # код настроения -> ключ
+MOOD_CODES = {mood: code for code, mood in enumerate(MOODS)}
+
+FIELDS = ('username', 'mood', 'mood_text', 'mood_emoji', 'project', 'timestamp', 'completed_at')
+
+@lru_cache(maxsize=4096)
+def _msk_midnight(day_str):
+    return int(datetime.fromisoformat(day_str).replace(tzinfo=MSK_TZ).timestamp())
+
+
+def _two_digits(value, start):
+    return value[start].isdigit() and value[start + 1].isdigit()
+
+
+def to_micros(value):
+    """
+    Время бота (ГГГГ-ММ-ДДTЧЧ:ММ:СС[.ffffff]+03:00) -> микросекунды эпохи.
+    None, если строка не восстанавливается из числа в точности (другой пояс,
+    формат, ".000000") - такие строки хранятся как есть.
+    """
+    if not isinstance(value, str) or not value.endswith('+03:00') or value[10:11] != 'T':
+        return None
+    if len(value) == 25:
+        fraction = 0
+    elif len(value) == 32 and value[19] == '.' and value[20:26].isdigit():
+        fraction = int(value[20:26])
+        if not fraction:
+            return None  # isoformat() не пишет нулевые микросекунды
+    else:
+        return None
+    if not (value[13] == value[16] == ':' and _two_digits(value, 11) and _two_digits(value, 14)
+            and _two_digits(value, 17)):
+        return None
+    hours, minutes, seconds = int(value[11:13]), int(value[14:16]), int(value[17:19])
+    if hours > 23 or minutes > 59 or seconds > 59:
+        return None
+    try:
+        midnight = _msk_midnight(value[:10])
+    except ValueError:
+        return None
+    return (midnight + hours * 3600 + minutes * 60 + seconds) * 1_000_000 + fraction
+
+
+def from_micros(micros):
+    seconds, fraction = divmod(micros, 1_000_000)
+    return datetime.fromtimestamp(seconds, MSK_TZ).replace(microsecond=fraction).isoformat()
+
+
+def compact_time(value):
+    """Время для слота: микросекунды эпохи или, если так не сохранить точно, исходная строка"""
+    micros = to_micros(value)
+    return value if micros is None else micros
+
+
+def expand_time(value):
+    return from_micros(value) if isinstance(value, int) else value
+
+
+def epoch_seconds(value):
+    """Слот времени -> секунды эпохи (None, если строку не разобрать)"""
+    if isinstance(value, int):
+        return value / 1_000_000
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=MSK_TZ)
+    return moment.timestamp()
+
+
+class ResponseRecord(Mapping):
+    """Ответ пользователя за день; extra - поля, которые не укладываются в компактный вид"""
+
+    __slots__ = ('username', 'mood_code', 'project', 'timestamp', 'completed_at', 'extra')
+
+    def __init__(self):
+        self.username = None
+        self.mood_code = None
+        self.project = None
+        self.timestamp = None
+        self.completed_at = None
+        self.extra = None
+
+    @classmethod
+    def from_dict(cls, data, strings=None):
+        """strings - {название: название} для загружаемого месяца: одинаковые проекты - одна строка"""
+        record = cls()
+        # Обычный ответ бота раскладывается по слотам напрямую, остальное - через update
+        username = data.get('username')
+        mood_code = MOOD_CODES.get(data.get('mood'))
+        project = data.get('project')
+        timestamp = to_micros(data.get('timestamp'))
+        completed_at = to_micros(data.get('completed_at'))
+        mood = MOOD_OPTIONS[MOODS[mood_code]] if mood_code is not None else None
+        if (
+            isinstance(username, str) and mood is not None and timestamp is not None
+            and data.get('mood_text') == mood['text']
+            and data.get('mood_emoji') == mood['emoji']
+            and (project is None or isinstance(project, str))
+            and (completed_at is not None or 'completed_at' not in data)
+            and len(data) == 5 + (project is not None) + (completed_at is not None)
+        ):
+            record.username = sys.intern(username)
+            record.mood_code = mood_code
+            record.timestamp = timestamp
+            if project is not None:
+                record.project = project if strings is None else strings.setdefault(project, project)
+            record.completed_at = completed_at
+            return record
+        if 'mood' in data and not ('mood_text' in data and 'mood_emoji' in data):
+            # По коду настроения подписи восстановились бы и там, где их не было
+            record.extra = dict(data)
+            return record
+        record.update(data)
+        return record
+
+    def to_dict(self):
+        return dict(self)
+
+    def _set_extra(self, key, value):
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def __setitem__(self, key, value):
+        if key == 'username' and isinstance(value, str):
+            self.username = sys.intern(value)
+        elif key == 'mood' and value in MOOD_CODES:
+            self.mood_code = MOOD_CODES[value]
+        elif key in ('mood_text', 'mood_emoji') and self.mood_code is not None \
+                and value == MOOD_OPTIONS[MOODS[self.mood_code]][key[len('mood_'):]]:
+            pass  # берутся из MOOD_OPTIONS по коду настроения
+        elif key == 'project' and isinstance(value, str):
+            self.project = value
+        elif key in ('timestamp', 'completed_at') and isinstance(value, str):
+            setattr(self, key, compact_time(value))
+        else:
+            self._set_extra(key, value)
+            return
+        if self.extra:
+            self.extra.pop(key, None)
+
+    def update(self, data):
+        # mood раньше mood_text/mood_emoji, чтобы подписи распознавались как производные
+        if 'mood' in data:
+            self['mood'] = data['mood']
+        for key, value in data.items():
+            if key != 'mood':
+                self[key] = value
+
+    # --- Mapping ---
+
+    def __getitem__(self, key):
+        if self.extra and key in self.extra:
+            # Подписи настроения, отличающиеся от MOOD_OPTIONS
+            return self.extra[key]
+        if key == 'username' and self.username is not None:
+            return self.username
+        if self.mood_code is not None:
+            mood = MOODS[self.mood_code]
+            if key == 'mood':
+                return mood
+            if key == 'mood_text':
+                return MOOD_OPTIONS[mood]['text']
+            if key == 'mood_emoji':
+                return MOOD_OPTIONS[mood]['emoji']
+        if key == 'project' and self.project is not None:
+            return self.project
+        if key == 'timestamp' and self.timestamp is not None:
+            return expand_time(self.timestamp)
+        if key == 'completed_at' and self.completed_at is not None:
+            return expand_time(self.completed_at)
+        raise KeyError(key)
+
+    def __iter__(self):
+        for key in FIELDS:
+            if key in self:
+                yield key
+        if self.extra:
+            for key in self.extra:
+                if key not in FIELDS:
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        if key == 'username':
+            present = self.username is not None
+        elif key in ('mood', 'mood_text', 'mood_emoji'):
+            present = self.mood_code is not None
+        elif key == 'project':
+            present = self.project is not None
+        elif key in ('timestamp', 'completed_at'):
+            present = getattr(self, key) is not None
+        else:
+            present = False
+        return present or bool(self.extra) and key in self.extra
+
+    def __repr__(self):
+        return f"ResponseRecord({dict(self)!r})"
+
+    def latency_minutes(self):
+        """Минуты от выбора настроения до указания проекта (None, если не посчитать)"""
+        if self.timestamp is None or self.completed_at is None:
+            return None
+        start, end = epoch_seconds(self.timestamp), epoch_seconds(self.completed_at)
+        if start is None or end is None:
+            return None
+        return (end - start) / 60
+
+
+def compact_days(days):
+    """{дата: {user_id: словарь}} -> {дата: {user_id: ResponseRecord}} (на месте)"""
+    strings = {}
+    for day_responses in days.values():
+        for user_id, response in day_responses.items():
+            day_responses[user_id] = ResponseRecord.from_dict(response, strings)
+    return days
+
+
+def plain_days(days):
+    """{дата: {user_id: ответ}} -> словари для записи в JSON"""
+    return {
+        date_str: {user_id: dict(response) for user_id, response in day_responses.items()}
+        for date_str, day_responses in days.items()
+    }
@@ -0,0 +1,232 @@
+"""
+Каталог CSV отчетов за день (data/reports_catalog.json)
+
+Для каждого отчета хранятся размер, mtime, число строк, sha256 содержимого
+и file_id уже загруженного в Telegram файла. Каталог обновляется при записи
+отчета и его отправке; /reports читает только каталог.
+
+С папкой reports/ каталог сверяется лениво: пока mtime папки не изменился
+(файлы не добавлялись, не удалялись и не переименовывались), хватает одного
+stat. Иначе папка читается одним scandir: новые файлы описываются, пропавшие
+удаляются из каталога. Все операции с диском - в пуле io_executor.
+"""
+import csv
+import hashlib
+import io
+import os
+import threading
+from datetime import datetime
+
+from config import REPORTS_CATALOG_FILE, REPORTS_DIR, logger
+from database import read_json, write_json_atomic, write_text_atomic
+from io_executor import io_executor
+
+
+def report_date(name):
+    """'report_ГГГГ-ММ-ДД.csv' -> 'ГГГГ-ММ-ДД' (None для других файлов)"""
+    if not (name.startswith('report_') and name.endswith('.csv')):
+        return None
+    date_str = name[len('report_'):-len('.csv')]
+    try:
+        datetime.strptime(date_str, '%Y-%m-%d')
+    except ValueError:
+        return None
+    return date_str
+
+
+def describe(content, stat):
+    """Запись каталога по содержимому файла (bytes) и его stat"""
+    text = content.decode('utf-8-sig', errors='replace')
+    rows = max(0, sum(1 for _ in csv.reader(io.StringIO(text, newline=''))) - 1)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'rows': rows,
+        'checksum': hashlib.sha256(content).hexdigest(),
+        'file_id': None,
+    }
+
+
+class ReportCatalog:
+    """Отчеты за день: дата -> {'size', 'mtime_ns', 'rows', 'checksum', 'file_id'}"""
+
+    def __init__(self, catalog_file=REPORTS_CATALOG_FILE, reports_dir=REPORTS_DIR):
+        self.catalog_file = catalog_file
+        self.reports_dir = reports_dir
+        self.entries = {}
+        # дата -> версия ответов дня, по которой записан отчет (только в памяти, см. day_version)
+        self.versions = {}
+        self.dir_mtime_ns = None  # mtime папки при последней сверке
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def path(self, date_str):
+        return self.reports_dir / f"report_{date_str}.csv"
+
+    # --- Выполняется в пуле дисковых операций ---
+
+    def _load(self):
+        try:
+            data = read_json(self.catalog_file, {})
+        except Exception as e:
+            logger.error(f"Ошибка загрузки каталога отчетов, он будет собран заново: {e}")
+            data = {}
+        self.entries = data.get('reports', {})
+        self.dir_mtime_ns = data.get('dir_mtime_ns')
+        self.loaded = True
+
+    def _save(self):
+        with self._lock:
+            data = {'dir_mtime_ns': self.dir_mtime_ns, 'reports': dict(sorted(self.entries.items()))}
+            write_json_atomic(self.catalog_file, data)
+
+    def _reconcile(self):
+        """Загружает каталог при первом обращении и сверяет его с папкой, если она менялась"""
+        if not self.loaded:
+            self._load()
+        try:
+            dir_mtime_ns = os.stat(self.reports_dir).st_mtime_ns
+        except FileNotFoundError:
+            dir_mtime_ns = None
+        if dir_mtime_ns == self.dir_mtime_ns:
+            return
+
+        found = {}
+        if dir_mtime_ns is not None:
+            with os.scandir(self.reports_dir) as entries:
+                for entry in entries:
+                    date_str = report_date(entry.name)
+                    if date_str and entry.is_file():
+                        found[date_str] = entry.path
+
+        added = 0
+        with self._lock:
+            known = dict(self.entries)
+        for date_str, path in found.items():
+            if date_str in known:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                    stat = os.fstat(f.fileno())
+            except OSError:
+                continue
+            with self._lock:
+                self.entries.setdefault(date_str, describe(content, stat))
+            added += 1
+
+        with self._lock:
+            removed = [date_str for date_str in self.entries if date_str not in found]
+            for date_str in removed:
+                del self.entries[date_str]
+            self.dir_mtime_ns = dir_mtime_ns
+        self._save()
+        if added or removed:
+            logger.info(f"Каталог отчетов сверен с папкой: добавлено {added}, удалено {len(removed)}")
+
+    def _write(self, date_str, rows, header):
+        """
+        Записывает отчет за день, если его содержимое отличается от файла на диске.
+        Возвращает запись каталога (при совпадении - прежнюю, с ее file_id).
+        """
+        buffer = io.StringIO(newline='')
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        writer.writerows(rows)
+        # BOM для Excel - как при записи с кодировкой utf-8-sig
+        text = '\ufeff' + buffer.getvalue()
+        content = text.encode('utf-8')
+        checksum = hashlib.sha256(content).hexdigest()
+
+        if not self.loaded:
+            self._load()
+        path = self.path(date_str)
+        with self._lock:
+            previous = self.entries.get(date_str)
+        if previous and previous['checksum'] == checksum and self._unchanged(path, previous):
+            return previous
+
+        # Временный файл + fsync + os.replace: при сбое остается прежний отчет, а не обрезанный
+        write_text_atomic(path, text, newline='')
+        stat = os.stat(path)
+        entry = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'rows': len(rows),
+            'checksum': checksum,
+            'file_id': None,
+        }
+        with self._lock:
+            self.entries[date_str] = entry
+        self._save()
+        return entry
+
+    @staticmethod
+    def _unchanged(path, entry):
+        """Файл на диске тот же, что описан в каталоге (по mtime и размеру)"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) == (entry['mtime_ns'], entry['size'])
+
+    def _fresh(self, date_str):
+        with self._lock:
+            entry = self.entries.get(date_str)
+        return entry is not None and self._unchanged(self.path(date_str), entry)
+
+    def _current(self, date_str):
+        """Запись каталога, если файл не менялся после записи; иначе описывает файл заново"""
+        if not self.loaded:
+            self._load()
+        path = self.path(date_str)
+        with self._lock:
+            entry = self.entries.get(date_str)
+        if entry and self._unchanged(path, entry):
+            return entry
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+                stat = os.fstat(f.fileno())
+        except FileNotFoundError:
+            return None
+        entry = describe(content, stat)
+        with self._lock:
+            self.entries[date_str] = entry
+        self._save()
+        return entry
+
+    # --- Из event loop ---
+
+    async def refresh(self):
+        await io_executor.run('reports_catalog', self._reconcile)
+
+    async def is_fresh(self, date_str, version):
+        """Отчет записан по этой версии ответов дня и с тех пор не менялся"""
+        if self.versions.get(date_str) != version:
+            return False
+        return await io_executor.run('report_signature', self._fresh, date_str)
+
+    async def write(self, date_str, rows, header, version):
+        entry = await io_executor.run('save_report_csv', self._write, date_str, rows, header)
+        self.versions[date_str] = version
+        return entry
+
+    async def current(self, date_str):
+        return await io_executor.run('report_signature', self._current, date_str)
+
+    async def set_file_id(self, date_str, entry, file_id):
+        """Запоминает file_id загруженного в Telegram отчета"""
+        with self._lock:
+            if self.entries.get(date_str) is not entry:
+                return
+            entry['file_id'] = file_id
+        await io_executor.run('reports_catalog', self._save)
+
+    def reports(self):
+        """[(дата, запись)] всех отчетов, новые первыми"""
+        with self._lock:
+            return sorted(self.entries.items(), reverse=True)
+
+
+report_catalog = ReportCatalog()
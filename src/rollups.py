@@ -0,0 +1,193 @@
+"""
+Сводные данные по ответам, обновляемые при каждой записи (data/rollups.json)
+
+Для каждого пользователя и месяца: гистограмма настроений, сумма оценок,
+счетчик проектов, суммарное время ответа и битовая карта дней с ответом.
+Для каждого дня опроса - итоги по команде. /mymonth, /users и /stats
+читают эти данные вместо пересчета по всем ответам.
+
+Пересборка с нуля: python src/rollups.py rebuild
+"""
+import sys
+from datetime import datetime
+
+from config import MOOD_SCORES, logger
+from records import ResponseRecord
+
+
+def response_latency_minutes(response):
+    """Минуты от выбора настроения до указания проекта (None, если не посчитать)"""
+    if isinstance(response, ResponseRecord):
+        return response.latency_minutes()
+    if 'timestamp' not in response or 'completed_at' not in response:
+        return None
+    try:
+        start = datetime.fromisoformat(response['timestamp'].replace('Z', '+00:00'))
+        end = datetime.fromisoformat(response['completed_at'].replace('Z', '+00:00'))
+        return (end - start).total_seconds() / 60
+    except (TypeError, ValueError):
+        return None
+
+
+def empty_entry():
+    return {
+        'count': 0,
+        'moods': {},
+        'score_sum': 0,
+        'projects': {},
+        'latency_sum': 0.0,
+        'latency_count': 0,
+        'days': 0  # бит (день - 1) установлен, если в этот день был ответ
+    }
+
+
+def _bump(counter, key, delta):
+    value = counter.get(key, 0) + delta
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+def add_response(entry, response, sign=1):
+    """Добавляет (sign=1) или вычитает (sign=-1) вклад одного ответа в сводку"""
+    entry['count'] += sign
+    mood = response.get('mood')
+    if mood:
+        _bump(entry['moods'], mood, sign)
+        entry['score_sum'] += sign * MOOD_SCORES.get(mood, 0)
+    if 'projects' in entry and response.get('project'):
+        _bump(entry['projects'], response['project'], sign)
+    if 'latency_sum' in entry:
+        latency = response_latency_minutes(response)
+        if latency is not None:
+            entry['latency_sum'] += sign * latency
+            entry['latency_count'] += sign
+
+
+def day_bits(bitmap):
+    """Номера дней месяца, отмеченных в битовой карте"""
+    return [day for day in range(1, 32) if bitmap >> (day - 1) & 1]
+
+
+def longest_streak(bitmap):
+    """Самая длинная серия подряд идущих дней в битовой карте"""
+    length = 0
+    while bitmap:
+        bitmap &= bitmap << 1
+        length += 1
+    return length
+
+
+class Rollups:
+    """Сводки по месяцам ("ГГГГ-ММ" -> user_id -> сводка) и по дням опроса"""
+
+    def __init__(self, months=None, days=None):
+        self.months = months or {}
+        self.days = days or {}
+        # user_id -> дней с ответом за все время; не хранится, строится при загрузке
+        self.totals = {}
+        for month in self.months.values():
+            for user_id, entry in month.items():
+                self.totals[user_id] = self.totals.get(user_id, 0) + entry['count']
+
+    def _day(self, date_str):
+        return self.days.setdefault(date_str, {'count': 0, 'moods': {}, 'score_sum': 0})
+
+    def _add(self, date_str, user_id, response, sign):
+        month = self.months.setdefault(date_str[:7], {})
+        entry = month.setdefault(user_id, empty_entry())
+        add_response(entry, response, sign)
+        add_response(self._day(date_str), response, sign)
+        _bump(self.totals, user_id, sign)
+
+        bit = 1 << (int(date_str[8:10]) - 1)
+        entry['days'] = entry['days'] | bit if sign > 0 else entry['days'] & ~bit
+        if entry['count'] <= 0:
+            del month[user_id]
+
+    # --- Изменения ---
+
+    def ensure_day(self, date_str):
+        self._day(date_str)
+
+    def apply(self, date_str, user_id, old, new):
+        """Ответ пользователя за день изменился с old на new (любой может быть None)"""
+        if old:
+            self._add(date_str, user_id, old, -1)
+        if new:
+            self._add(date_str, user_id, new, 1)
+
+    # --- Запросы ---
+
+    def month_days(self, year, month):
+        """Даты опросов за месяц (по возрастанию)"""
+        prefix = f"{year}-{month:02d}-"
+        return sorted(date_str for date_str in self.days if date_str.startswith(prefix))
+
+    def user_month(self, user_id, year, month):
+        """Сводка пользователя за месяц (None, если ответов не было)"""
+        return self.months.get(f"{year}-{month:02d}", {}).get(user_id)
+
+    def user_totals(self, user_ids):
+        """Количество дней с ответом для каждого из пользователей"""
+        return {user_id: self.totals.get(user_id, 0) for user_id in user_ids}
+
+    def total_days(self):
+        return len(self.days)
+
+    def recent_day_counts(self, days_count):
+        """[(дата, количество ответов)] за последние days_count дней опроса"""
+        return [(date_str, self.days[date_str]['count']) for date_str in sorted(self.days)[-days_count:]]
+
+    # --- Построение и сохранение ---
+
+    def rebuild_month(self, responses, month_key):
+        """Пересчитывает месяц по исходным ответам"""
+        year, month = map(int, month_key.split('-'))
+        for user_id, entry in self.months.pop(month_key, {}).items():
+            _bump(self.totals, user_id, -entry['count'])
+        for date_str in [d for d in self.days if d.startswith(month_key + '-')]:
+            del self.days[date_str]
+        for date_str in responses.month_days(year, month):
+            self.ensure_day(date_str)
+            for user_id, response in responses.get(date_str, {}).items():
+                self._add(date_str, user_id, response, 1)
+
+    @classmethod
+    def build(cls, responses):
+        """Строит сводки с нуля по всем ответам"""
+        rollups = cls()
+        for date_str in responses:
+            rollups.ensure_day(date_str)
+            for user_id, response in responses[date_str].items():
+                rollups._add(date_str, user_id, response, 1)
+        return rollups
+
+    def to_dict(self):
+        return {'months': self.months, 'days': self.days}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('months'), data.get('days'))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild':
+        print("Использование: python src/rollups.py rebuild")
+        sys.exit(1)
+
+    import asyncio
+    from config import ensure_dirs, setup_logging
+    from database import feedback_bot
+
+    setup_logging()
+    ensure_dirs()
+
+    feedback_bot.rollups = Rollups.build(feedback_bot.responses)
+    feedback_bot.save_rollups()
+    asyncio.run(feedback_bot.close())
+    logger.info(
+        f"Сводки пересобраны: дней {feedback_bot.rollups.total_days()}, "
+        f"месяцев {len(feedback_bot.rollups.months)}"
+    )
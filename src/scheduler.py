@@ -0,0 +1,234 @@
+"""
+Планировщик задач по времени МСК на основе min-heap
+
+Вместо ежеминутного опроса часов планировщик спит ровно до ближайшей задачи.
+При изменении расписания (/setsurvey, /setreport, /reminders) план
+перестраивается через scheduler.replan().
+
+Время последнего успешного запуска каждой задачи хранится в
+data/scheduler_state.json. Задача сообщает о неудаче, возвращая False -
+такой запуск не отмечается и будет догнан после перезапуска. Пропущенный
+запуск (бот был остановлен или задача проснулась с опозданием) выполняется,
+если опоздание не больше grace задачи, иначе пропускается с записью в лог.
+Пропущенные запуски догоняются по очереди в порядке планового времени:
+отчет за день не уйдет раньше опроса того же дня.
+"""
+import asyncio
+import heapq
+import itertools
+from datetime import datetime, timedelta, time
+
+from config import SCHEDULER_STATE_FILE, MSK_TZ, logger
+from database import read_json, write_json_atomic
+from io_executor import io_executor
+
+# Допустимое опоздание по умолчанию: задержки event loop, но не пропущенный запуск
+DEFAULT_GRACE = timedelta(minutes=1)
+
+
+class ScheduledJob:
+    """
+    Ежедневная задача в HH:MM МСК.
+    days - фильтр по дате (например, только 1-е число),
+    grace - насколько поздно задачу еще можно выполнить.
+    func(run_at) возвращает False, если запуск не удался.
+    """
+
+    def __init__(self, name, title, at, func, days=None, grace=DEFAULT_GRACE):
+        self.name = name
+        self.title = title
+        self.at = at
+        self.func = func
+        self.days = days
+        self.grace = grace
+
+    def _at(self, day):
+        hour, minute = map(int, self.at.split(':'))
+        return datetime.combine(day, time(hour, minute), MSK_TZ)
+
+    def next_run(self, after):
+        """Ближайший запуск строго после after"""
+        day = after.date()
+        while True:
+            run_at = self._at(day)
+            if run_at > after and (self.days is None or self.days(day)):
+                return run_at
+            day += timedelta(days=1)
+
+    def prev_run(self, before):
+        """Последний плановый запуск не позже before (None, если за год его не было)"""
+        day = before.date()
+        for _ in range(366):
+            run_at = self._at(day)
+            if run_at <= before and (self.days is None or self.days(day)):
+                return run_at
+            day -= timedelta(days=1)
+        return None
+
+
+class Scheduler:
+    """Очередь задач (время запуска, порядковый номер, поколение плана, задача) и цикл их выполнения"""
+
+    def __init__(self, state_file=SCHEDULER_STATE_FILE):
+        self.state_file = state_file
+        self.planner = None
+        self.heap = []
+        self.generation = 0
+        self.last_runs = {}  # имя задачи -> ISO время последнего успешного запуска
+        self.running = {}    # имя задачи -> asyncio.Task
+        self._counter = itertools.count()
+        self._changed = None
+
+    def _push(self, run_at, job):
+        heapq.heappush(self.heap, (run_at, next(self._counter), self.generation, job))
+
+    def replan(self):
+        """Перестраивает очередь по текущим настройкам"""
+        if self.planner is None:
+            return
+        now = datetime.now(MSK_TZ)
+        try:
+            # Новый план собирается отдельно: ошибка в настройках (например, время
+            # "25:00" в поправленном вручную файле) оставляет в силе прежний план
+            planned = [(job.next_run(now), job) for job in self.planner()]
+        except Exception as e:
+            logger.error(f"Ошибка построения плана задач, остается прежний план: {e}")
+            return
+        
+        self.generation += 1
+        self.heap = []
+        for run_at, job in planned:
+            self._push(run_at, job)
+        if self._changed is not None:
+            self._changed.set()
+        logger.info(f"План задач обновлен, задач: {len(self.heap)}")
+
+    def upcoming(self):
+        """[(время запуска, задача)] по возрастанию времени"""
+        return [
+            (run_at, job) for run_at, _, generation, job in sorted(self.heap)
+            if generation == self.generation
+        ]
+
+    def last_run(self, name):
+        value = self.last_runs.get(name)
+        return datetime.fromisoformat(value) if value else None
+
+    async def _save_state(self):
+        await io_executor.run('save_scheduler_state', write_json_atomic, self.state_file, dict(self.last_runs))
+
+    async def _catch_up(self):
+        """
+        Выполняет запуски, пропущенные пока бот был остановлен: по одному,
+        в порядке планового времени, дожидаясь завершения предыдущего
+        """
+        now = datetime.now(MSK_TZ)
+        try:
+            jobs = self.planner()
+        except Exception as e:
+            logger.error(f"Ошибка построения плана задач, пропущенные запуски не догоняются: {e}")
+            return
+        
+        missed = []
+        baseline = False
+        for job in jobs:
+            try:
+                due = job.prev_run(now)
+            except ValueError as e:
+                logger.error(f"Неверное время задачи {job.name}: {e}")
+                continue
+            last_run = self.last_run(job.name)
+            if due is None:
+                continue
+            if last_run is None:
+                # Первый запуск с этой задачей - точка отсчета без догоняния
+                self.last_runs[job.name] = now.isoformat()
+                baseline = True
+            elif last_run < due:
+                missed.append((due, job))
+        if baseline:
+            await self._save_state()
+        
+        for due, job in sorted(missed, key=lambda item: item[0]):
+            self._launch(job, due, datetime.now(MSK_TZ))
+            task = self.running.get(job.name)
+            if task is not None:
+                await asyncio.gather(task, return_exceptions=True)
+
+    def _launch(self, job, run_at, now):
+        """Запускает задачу отдельной asyncio-задачей с учетом опоздания"""
+        late = now - run_at
+        if late > job.grace:
+            logger.warning(
+                f"Задача {job.name} за {run_at.strftime('%d.%m %H:%M')} пропущена: "
+                f"опоздание {late.total_seconds() / 60:.0f} мин больше допустимого"
+            )
+            return
+        if job.name in self.running:
+            logger.warning(f"Задача {job.name} еще выполняется, запуск {run_at.strftime('%H:%M')} пропущен")
+            return
+
+        if late > DEFAULT_GRACE:
+            logger.info(f"Догоняем пропущенный запуск {job.name} за {run_at.strftime('%d.%m %H:%M')}")
+        else:
+            logger.info(f"Запуск задачи {job.name} (план {run_at.strftime('%d.%m %H:%M')})")
+        self.running[job.name] = asyncio.create_task(self._execute(job, run_at))
+
+    async def _execute(self, job, run_at):
+        try:
+            if await job.func(run_at) is False:
+                logger.warning(
+                    f"Задача {job.name} за {run_at.strftime('%d.%m %H:%M')} не выполнена, "
+                    f"запуск будет повторен после перезапуска (в пределах допустимого опоздания)"
+                )
+                return
+            self.last_runs[job.name] = run_at.isoformat()
+            await self._save_state()
+        except Exception as e:
+            logger.error(f"Ошибка задачи {job.name}: {e}")
+        finally:
+            self.running.pop(job.name, None)
+
+    async def run(self, planner):
+        """Основной цикл: ждет ближайшую задачу или изменения плана"""
+        self.planner = planner
+        self._changed = asyncio.Event()
+        self.last_runs = await io_executor.run('load_scheduler_state', read_json, self.state_file, {})
+        self.replan()
+        catch_up = asyncio.create_task(self._catch_up())
+
+        try:
+            while True:
+                self._changed.clear()
+                if not self.heap:
+                    await self._changed.wait()
+                    continue
+
+                run_at, _, generation, job = self.heap[0]
+                if generation != self.generation:
+                    heapq.heappop(self.heap)
+                    continue
+
+                now = datetime.now(MSK_TZ)
+                delay = (run_at - now).total_seconds()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    # План изменился или часы еще не дошли - пересматриваем вершину кучи
+                    continue
+
+                heapq.heappop(self.heap)
+                self._push(job.next_run(max(run_at, now)), job)
+                self._launch(job, run_at, now)
+        finally:
+            # Задачи отменяются и дожидаются: после выхода их изменения уже не появятся
+            tasks = [catch_up, *self.running.values()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Создаем глобальный экземпляр
+scheduler = Scheduler()
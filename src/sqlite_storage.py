@@ -0,0 +1,381 @@
+"""
+Хранилище на SQLite (STORAGE_BACKEND=sqlite) и перенос данных из JSON файлов
+
+Запуск переноса: python src/sqlite_storage.py migrate [--force]
+"""
+import json
+import sqlite3
+import sys
+import threading
+from collections.abc import Mapping
+
+from config import (
+    SQLITE_DB_FILE, USER_DATA_FILE, RESPONSES_FILE, RESPONSES_DIR, RESPONSES_JOURNAL_FILE,
+    HOLIDAYS_FILE, logger, ensure_dirs, setup_logging
+)
+from vacations import normalize_vacations
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+-- Дни, в которые проводился опрос (в том числе без единого ответа)
+CREATE TABLE IF NOT EXISTS days (
+    date TEXT PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS responses (
+    date TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    username TEXT,
+    mood TEXT NOT NULL,
+    mood_text TEXT,
+    mood_emoji TEXT,
+    project TEXT,
+    timestamp TEXT,
+    completed_at TEXT,
+    PRIMARY KEY (date, user_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_responses_user_date ON responses (user_id, date);
+
+CREATE TABLE IF NOT EXISTS vacations (
+    user_id TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_vacations_dates ON vacations (start, end);
+"""
+
+RESPONSE_FIELDS = ('username', 'mood', 'mood_text', 'mood_emoji', 'project', 'timestamp', 'completed_at')
+
+
+def month_bounds(year, month):
+    """Полуинтервал дат месяца в формате ГГГГ-ММ-ДД для запросов по индексу"""
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year}-{month:02d}-01", f"{next_year}-{next_month:02d}-01"
+
+
+def row_to_response(row):
+    """Строка таблицы responses -> словарь ответа в формате responses.json"""
+    return {field: value for field, value in zip(RESPONSE_FIELDS, row) if value is not None}
+
+
+def stored_fields(data):
+    """Ответ в том виде, в каком он хранится в таблице (как после row_to_response)"""
+    return {field: data[field] for field in RESPONSE_FIELDS if data.get(field) is not None}
+
+
+class SqliteStorage:
+    """Подключение к базе и операции над пользователями и отпусками"""
+
+    def __init__(self, db_file=SQLITE_DB_FILE):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file, isolation_level=None, check_same_thread=False)
+        # Пользователи и отпуска пишутся из потока write-behind, ответы - из event loop
+        self.lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def load_users(self):
+        rows = self.conn.execute("SELECT user_id, data FROM users")
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    def save_users(self, users):
+        with self.lock, self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.execute("DELETE FROM users")
+            self.conn.executemany(
+                "INSERT INTO users (user_id, data) VALUES (?, ?)",
+                [(user_id, json.dumps(data, ensure_ascii=False)) for user_id, data in users.items()]
+            )
+
+    def load_vacations(self):
+        rows = self.conn.execute("SELECT user_id, data FROM vacations ORDER BY user_id, start")
+        vacations = {}
+        for user_id, data in rows:
+            vacations.setdefault(user_id, []).append(json.loads(data))
+        return vacations
+
+    def save_vacations(self, vacations):
+        with self.lock, self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.execute("DELETE FROM vacations")
+            self.conn.executemany(
+                "INSERT INTO vacations (user_id, start, end, data) VALUES (?, ?, ?, ?)",
+                [
+                    (user_id, vacation["start"], vacation["end"], json.dumps(vacation, ensure_ascii=False))
+                    for user_id, items in vacations.items()
+                    for vacation in items
+                ]
+            )
+
+    def is_empty(self):
+        for table in ('users', 'days', 'responses', 'vacations'):
+            if self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                return False
+        return True
+
+    def close(self):
+        self.conn.close()
+
+
+class SqliteResponseStore(Mapping):
+    """
+    Ответы в SQLite с тем же интерфейсом, что и database.ResponseStore
+
+    Изменения сначала попадают в буфер в памяти (чтения видят их сразу), а в базу
+    уходят одной транзакцией через write-behind в пуле io_executor - как и все
+    остальные записи на диск. Без writer (перенос данных, скрипты) - сразу.
+    """
+
+    def __init__(self, storage, writer=None):
+        self.conn = storage.conn
+        self.lock = storage.lock
+        self.writer = writer
+        self._seq = 0
+        self._day_seq = {}  # дата -> номер последнего изменения дня
+        # Еще не зафиксированные изменения: (дата, user_id) -> ответ, и новые дни опроса.
+        # flushing - пачка, которая сейчас записывается в базу
+        self._pending = {}
+        self._pending_days = set()
+        self._flushing = {}
+        self._flushing_days = set()
+        self._buffer_lock = threading.Lock()
+
+    # --- Незафиксированные изменения ---
+
+    def _buffered_days(self):
+        with self._buffer_lock:
+            return self._flushing_days | self._pending_days
+
+    def _buffered(self, date_str):
+        """{user_id: ответ} дня из буфера (поверх строк базы)"""
+        with self._buffer_lock:
+            rows = {**self._flushing, **self._pending}
+        return {user_id: data for (day, user_id), data in rows.items() if day == date_str}
+
+    def _buffered_response(self, date_str, user_id):
+        key = (date_str, user_id)
+        with self._buffer_lock:
+            return self._pending.get(key, self._flushing.get(key))
+
+    def _schedule(self):
+        if self.writer is not None:
+            self.writer.mark_dirty('responses', self._prepare_commit)
+        else:
+            self._prepare_commit()()
+
+    def _prepare_commit(self):
+        """В event loop: забирает буфер; возвращает запись в базу для пула"""
+        with self._buffer_lock:
+            rows, days = self._pending, self._pending_days
+            self._pending, self._pending_days = {}, set()
+            self._flushing = {**self._flushing, **rows}
+            self._flushing_days = self._flushing_days | days
+        return lambda: self._commit(rows, days)
+
+    def _commit(self, rows, days):
+        try:
+            with self.lock, self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany("INSERT OR IGNORE INTO days (date) VALUES (?)", [(d,) for d in days])
+                self.conn.executemany(
+                    f"INSERT OR REPLACE INTO responses (date, user_id, {', '.join(RESPONSE_FIELDS)}) "
+                    f"VALUES (?, ?, {', '.join('?' for _ in RESPONSE_FIELDS)})",
+                    [
+                        (date_str, user_id, *(data.get(field) for field in RESPONSE_FIELDS))
+                        for (date_str, user_id), data in rows.items()
+                    ]
+                )
+        except Exception:
+            # Возвращаем пачку в буфер (более новые изменения не затираются) - запишется со следующей
+            with self._buffer_lock:
+                self._pending = {**rows, **self._pending}
+                self._pending_days |= days
+                self._forget_flushing(rows, days)
+            raise
+        with self._buffer_lock:
+            self._forget_flushing(rows, days)
+
+    def _forget_flushing(self, rows, days):
+        self._flushing = {key: data for key, data in self._flushing.items() if rows.get(key) is not data}
+        self._flushing_days -= days
+
+    # --- Mapping: дата -> {user_id: ответ} ---
+
+    def __getitem__(self, date_str):
+        buffered = self._buffered(date_str)
+        if not buffered and date_str not in self._buffered_days() \
+                and not self.conn.execute("SELECT 1 FROM days WHERE date = ?", (date_str,)).fetchone():
+            raise KeyError(date_str)
+        rows = self.conn.execute(
+            f"SELECT user_id, {', '.join(RESPONSE_FIELDS)} FROM responses WHERE date = ?",
+            (date_str,)
+        )
+        day = {row[0]: row_to_response(row[1:]) for row in rows}
+        day.update(buffered)
+        return day
+
+    def __iter__(self):
+        days = {row[0] for row in self.conn.execute("SELECT date FROM days").fetchall()}
+        return iter(sorted(days | self._buffered_days()))
+
+    def __len__(self):
+        return len(set(self))
+
+    # --- Запросы для отчетов ---
+
+    def month_days(self, year, month):
+        """Даты опросов за месяц (по возрастанию)"""
+        start, end = month_bounds(year, month)
+        rows = self.conn.execute(
+            "SELECT date FROM days WHERE date >= ? AND date < ?", (start, end)
+        )
+        days = {row[0] for row in rows}
+        days.update(date_str for date_str in self._buffered_days() if start <= date_str < end)
+        return sorted(days)
+
+    def day_version(self, date_str):
+        """Версия ответов дня: растет при каждом изменении (в пределах запуска бота)"""
+        return self._day_seq.get(date_str, 0)
+
+    def changed_months(self):
+        """Месяцы, измененные за время работы (каждая пачка сразу фиксируется в базе)"""
+        return sorted({date_str[:7] for date_str in self._day_seq})
+
+    def response(self, date_str, user_id):
+        """Ответ пользователя за день по первичному ключу (date, user_id)"""
+        buffered = self._buffered_response(date_str, user_id)
+        if buffered is not None:
+            return buffered
+        row = self.conn.execute(
+            f"SELECT {', '.join(RESPONSE_FIELDS)} FROM responses WHERE date = ? AND user_id = ?",
+            (date_str, user_id)
+        ).fetchone()
+        return row_to_response(row) if row else None
+
+    def user_month_responses(self, user_id, year, month):
+        """{дата: ответ} пользователя за месяц - по индексу (user_id, date)"""
+        start, end = month_bounds(year, month)
+        rows = self.conn.execute(
+            f"SELECT date, {', '.join(RESPONSE_FIELDS)} FROM responses "
+            "WHERE user_id = ? AND date >= ? AND date < ?",
+            (user_id, start, end)
+        )
+        result = {row[0]: row_to_response(row[1:]) for row in rows}
+        with self._buffer_lock:
+            buffered = {**self._flushing, **self._pending}
+        result.update(
+            (date_str, data) for (date_str, buffered_user), data in buffered.items()
+            if buffered_user == user_id and start <= date_str < end
+        )
+        return result
+
+    def _touch(self, date_str):
+        self._seq += 1
+        self._day_seq[date_str] = self._seq
+
+    # --- Изменения ---
+
+    def ensure_day(self, date_str):
+        if date_str in self._buffered_days() \
+                or self.conn.execute("SELECT 1 FROM days WHERE date = ?", (date_str,)).fetchone():
+            return
+        with self._buffer_lock:
+            self._pending_days.add(date_str)
+        self._touch(date_str)
+        self._schedule()
+
+    def set(self, date_str, user_id, data):
+        with self._buffer_lock:
+            self._pending[(date_str, user_id)] = stored_fields(data)
+            self._pending_days.add(date_str)
+        self._touch(date_str)
+        self._schedule()
+
+    def update(self, date_str, user_id, fields):
+        columns = {field: value for field, value in fields.items() if field in RESPONSE_FIELDS}
+        current = self.response(date_str, user_id)
+        if not columns or current is None:
+            return False
+        with self._buffer_lock:
+            self._pending[(date_str, user_id)] = stored_fields({**current, **columns})
+        self._touch(date_str)
+        self._schedule()
+        return True
+
+    def save_snapshot(self):
+        """Изменения записываются в базу через write-behind"""
+
+    def close(self):
+        """Записывает оставшийся буфер (вызывается после остановки write-behind)"""
+        self._prepare_commit()()
+
+
+def migrate_from_json(storage, force=False):
+    """Разовый перенос users.json, ответов (+журнал) и отпусков в SQLite"""
+    from database import ResponseStore
+
+    if not storage.is_empty() and not force:
+        raise RuntimeError(f"База {storage.db_file} уже содержит данные (используйте --force)")
+
+    users = {}
+    if USER_DATA_FILE.exists():
+        with open(USER_DATA_FILE, 'r', encoding='utf-8') as f:
+            users = json.load(f)
+
+    vacations = {}
+    if HOLIDAYS_FILE.exists():
+        with open(HOLIDAYS_FILE, 'r', encoding='utf-8') as f:
+            vacations = normalize_vacations(json.load(f).get("vacations", {}))
+
+    responses = ResponseStore(RESPONSES_DIR, RESPONSES_JOURNAL_FILE, legacy_file=RESPONSES_FILE).load()
+    target = SqliteResponseStore(storage)
+
+    storage.save_users(users)
+    storage.save_vacations(vacations)
+
+    with storage.lock, storage.conn:
+        storage.conn.execute("BEGIN")
+        storage.conn.execute("DELETE FROM responses")
+        storage.conn.execute("DELETE FROM days")
+        storage.conn.executemany("INSERT INTO days (date) VALUES (?)", [(d,) for d in responses])
+        storage.conn.executemany(
+            f"INSERT INTO responses (date, user_id, {', '.join(RESPONSE_FIELDS)}) "
+            f"VALUES (?, ?, {', '.join('?' for _ in RESPONSE_FIELDS)})",
+            [
+                (date_str, user_id, *(response.get(field) for field in RESPONSE_FIELDS))
+                for date_str, day_responses in responses.items()
+                for user_id, response in day_responses.items()
+            ]
+        )
+    responses.close()
+
+    logger.info(
+        f"Перенос в SQLite завершен: пользователей {len(users)}, дней {len(target)}, "
+        f"отпусков {sum(len(items) for items in vacations.values())}"
+    )
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print("Использование: python src/sqlite_storage.py migrate [--force]")
+        sys.exit(1)
+
+    setup_logging()
+    ensure_dirs()
+    migrate_storage = SqliteStorage()
+    try:
+        migrate_from_json(migrate_storage, force='--force' in sys.argv)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        migrate_storage.close()
@@ -0,0 +1,185 @@
+"""
+Индекс отпусков: несколько отпусков на сотрудника, запросы по дате за O(log n)
+
+holidays_settings["vacations"] = {user_id: [{"start": "ГГГГ-ММ-ДД", "end": ..., ...}, ...]}
+Старый формат (один словарь на пользователя) приводится к списку при загрузке.
+
+Массовый импорт из файла (строки "@username ДД.ММ.ГГГГ-ДД.ММ.ГГГГ"):
+python src/vacations.py import vacations.txt
+"""
+import heapq
+import sys
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime, timedelta
+
+from config import MSK_TZ, logger
+
+
+def normalize_vacations(vacations):
+    """{user_id: отпуск} или {user_id: [отпуска]} -> {user_id: [отпуска по дате начала]}"""
+    result = {}
+    for user_id, items in (vacations or {}).items():
+        if isinstance(items, dict):
+            items = [items]
+        if items:
+            result[user_id] = sorted(items, key=lambda vacation: vacation.get("start", ""))
+    return result
+
+
+def parse_vacation(vacation):
+    """(начало, конец) отпуска как date"""
+    return (
+        datetime.strptime(vacation["start"], '%Y-%m-%d').date(),
+        datetime.strptime(vacation["end"], '%Y-%m-%d').date()
+    )
+
+
+def parse_date_range(text):
+    """"ДД.ММ.ГГГГ-ДД.ММ.ГГГГ" -> (начало, конец); ValueError при неверном формате"""
+    start_str, end_str = text.strip().split('-')
+    return (
+        datetime.strptime(start_str.strip(), '%d.%m.%Y').date(),
+        datetime.strptime(end_str.strip(), '%d.%m.%Y').date()
+    )
+
+
+def make_vacation(username, start_date, end_date, admin_id):
+    return {
+        "username": username,
+        "start": start_date.strftime('%Y-%m-%d'),
+        "end": end_date.strftime('%Y-%m-%d'),
+        "set_by_admin": admin_id,
+        "set_at": datetime.now(MSK_TZ).isoformat()
+    }
+
+
+def find_overlap(user_vacations, start_date, end_date, ignore_start=None):
+    """Отпуск из списка, пересекающийся с периодом (None, если таких нет)"""
+    start, end = start_date.isoformat(), end_date.isoformat()
+    for vacation in user_vacations:
+        if vacation["start"] != ignore_start and vacation["start"] <= end and start <= vacation["end"]:
+            return vacation
+    return None
+
+
+def parse_vacation_lines(lines, users, vacations, admin_id):
+    """
+    Разбирает строки "@username ДД.ММ.ГГГГ-ДД.ММ.ГГГГ" для массового импорта.
+    Возвращает ([(user_id, отпуск)], [ошибки]); пересечения с уже назначенными
+    и между строками импорта считаются ошибками.
+    """
+    by_username = {data.get('username', '').lower(): uid for uid, data in users.items() if data.get('username')}
+    items = []
+    errors = []
+    accepted = {}
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        parts = line.split(maxsplit=1)
+        username = parts[0].lstrip('@')
+        user_id = by_username.get(username.lower())
+        if not user_id:
+            errors.append(f"{number}: пользователь @{username} не найден")
+            continue
+        try:
+            start_date, end_date = parse_date_range(parts[1] if len(parts) > 1 else '')
+        except ValueError:
+            errors.append(f"{number}: неверный формат даты")
+            continue
+        if end_date < start_date:
+            errors.append(f"{number}: дата окончания раньше даты начала")
+            continue
+        overlap = find_overlap(vacations.get(user_id, []) + accepted.get(user_id, []), start_date, end_date)
+        if overlap:
+            errors.append(f"{number}: @{username} пересекается с отпуском {overlap['start']} - {overlap['end']}")
+            continue
+        vacation = make_vacation(username, start_date, end_date, admin_id)
+        accepted.setdefault(user_id, []).append(vacation)
+        items.append((user_id, vacation))
+    return items, errors
+
+
+class VacationIndex:
+    """
+    Отпуска, разобранные в интервалы дат.
+
+    Границы всех интервалов делят ось дат на элементарные отрезки, для каждого
+    отрезка хранится множество сотрудников в отпуске - поиск отрезка бинарный.
+    Концы отпусков лежат в min-heap для очистки завершенных.
+    """
+
+    def __init__(self, vacations):
+        self.intervals = []  # (начало, конец, user_id, отпуск)
+        for user_id, items in vacations.items():
+            for vacation in items:
+                try:
+                    start, end = parse_vacation(vacation)
+                except (ValueError, KeyError) as e:
+                    logger.error(f"Ошибка парсинга дат отпуска для пользователя {user_id}: {e}")
+                    continue
+                self.intervals.append((start, end, user_id, vacation))
+
+        self.by_start = sorted(self.intervals, key=lambda item: (item[0], item[1]))
+        self.by_end = sorted(self.intervals, key=lambda item: (item[1], item[0]))
+
+        # Элементарные отрезки [points[i], points[i + 1])
+        events = {}
+        for start, end, user_id, _ in self.intervals:
+            events.setdefault(start, []).append((user_id, 1))
+            events.setdefault(end + timedelta(days=1), []).append((user_id, -1))
+        self.points = sorted(events)
+        self.segments = []
+        active = Counter()
+        for point in self.points:
+            for user_id, delta in events[point]:
+                active[user_id] += delta
+                if not active[user_id]:
+                    del active[user_id]
+            self.segments.append(frozenset(active))
+
+        self.end_heap = [(end, user_id, vacation["start"]) for _, end, user_id, vacation in self.intervals]
+        heapq.heapify(self.end_heap)
+
+    def on_vacation(self, check_date):
+        """Множество user_id, находящихся в отпуске в check_date"""
+        position = bisect_right(self.points, check_date) - 1
+        if position < 0:
+            return frozenset()
+        return self.segments[position]
+
+    def is_on_vacation(self, user_id, check_date):
+        return user_id in self.on_vacation(check_date)
+
+    def pop_expired(self, today):
+        """[(user_id, начало)] отпусков, закончившихся до today"""
+        expired = []
+        while self.end_heap and self.end_heap[0][0] < today:
+            _, user_id, start = heapq.heappop(self.end_heap)
+            expired.append((user_id, start))
+        return expired
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] != 'import':
+        print("Использование: python src/vacations.py import ФАЙЛ")
+        sys.exit(1)
+
+    import asyncio
+    from config import MANAGER_CHAT_ID, ensure_dirs, setup_logging
+    from database import feedback_bot
+
+    setup_logging()
+    ensure_dirs()
+
+    with open(sys.argv[2], 'r', encoding='utf-8') as f:
+        items, errors = parse_vacation_lines(
+            f, feedback_bot.users, feedback_bot.holidays_settings.get("vacations", {}), MANAGER_CHAT_ID
+        )
+    for error in errors:
+        logger.warning(f"Строка {error}")
+    if items:
+        feedback_bot.add_vacations(items)
+    asyncio.run(feedback_bot.close())
+    logger.info(f"Импортировано отпусков: {len(items)}, пропущено строк: {len(errors)}")
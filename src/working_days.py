@@ -0,0 +1,119 @@
+"""
+Битовая карта рабочих дней по годам
+
+Производственный календарь (workalendar) и настройки суббот/воскресений
+сводятся в один бит на день года. Карты кэшируются в data/working_days.json
+и сбрасываются при изменении /saturday, /sunday или версии workalendar.
+При построении или загрузке карты для каждого месяца сразу считаются маска
+рабочих дней (бит day - 1, как в сводках rollups) и их число.
+"""
+import calendar as month_calendar
+from datetime import date, timedelta
+from importlib.metadata import PackageNotFoundError, version
+
+
+def workalendar_version():
+    """Версия workalendar без импорта самого пакета"""
+    try:
+        return version('workalendar')
+    except PackageNotFoundError:
+        # Сборка PyInstaller без метаданных пакетов
+        import workalendar
+        return workalendar.__version__
+
+
+def year_bitmap(calendar, year, saturday_working, sunday_working):
+    """Бит (номер дня в году - 1) установлен для рабочих дней"""
+    day = date(year, 1, 1)
+    bitmap = bytearray(46)  # 366 бит
+    index = 0
+    while day.year == year:
+        weekday = day.weekday()
+        working = (
+            calendar.is_working_day(day)
+            and not (weekday == 5 and not saturday_working)
+            and not (weekday == 6 and not sunday_working)
+        )
+        if working:
+            bitmap[index >> 3] |= 1 << (index & 7)
+        day += timedelta(days=1)
+        index += 1
+    return bitmap
+
+
+def month_masks(year, bitmap):
+    """12 пар (маска рабочих дней месяца, число рабочих дней) из карты года"""
+    bits = int.from_bytes(bitmap, 'little')
+    months = []
+    index = 0
+    for month in range(1, 13):
+        days = month_calendar.monthrange(year, month)[1]
+        mask = bits >> index & ((1 << days) - 1)
+        months.append((mask, mask.bit_count()))
+        index += days
+    return tuple(months)
+
+
+def year_entry(year, bitmap):
+    """(порядковый номер 1 января, битовая карта, маски месяцев)"""
+    return date(year, 1, 1).toordinal(), bitmap, month_masks(year, bitmap)
+
+
+class WorkingDays:
+    """
+    Кэш битовых карт рабочих дней; on_update вызывается, когда кэш стоит сохранить.
+    get_calendar вызывается только при построении карты, которой нет в кэше.
+    """
+
+    def __init__(self, get_calendar, data=None, on_update=None):
+        self.get_calendar = get_calendar
+        self.on_update = on_update
+        self.flags = None
+        self.years = {}  # год -> year_entry
+        if data and data.get('version') == workalendar_version():
+            self.flags = tuple(data['flags']) if data.get('flags') else None
+            self.years = {
+                int(year): year_entry(int(year), bytearray.fromhex(bits))
+                for year, bits in data.get('years', {}).items()
+            }
+
+    def invalidate(self):
+        """Сбрасывает все карты (изменились настройки выходных)"""
+        self.years = {}
+        self.flags = None
+        if self.on_update:
+            self.on_update()
+
+    def year(self, year, saturday_working, sunday_working):
+        """Карта года для этих настроек выходных (строится при первом обращении)"""
+        if (saturday_working, sunday_working) != self.flags:
+            self.years = {}
+            self.flags = (saturday_working, sunday_working)
+
+        entry = self.years.get(year)
+        if entry is None:
+            bitmap = year_bitmap(self.get_calendar(), year, saturday_working, sunday_working)
+            entry = self.years[year] = year_entry(year, bitmap)
+            if self.on_update:
+                self.on_update()
+        return entry
+
+    def is_working_day(self, check_date, saturday_working, sunday_working):
+        ordinal, bitmap, _ = self.year(check_date.year, saturday_working, sunday_working)
+        index = check_date.toordinal() - ordinal
+        return bool(bitmap[index >> 3] >> (index & 7) & 1)
+
+    def month_mask(self, year, month, saturday_working, sunday_working):
+        """Маска рабочих дней месяца: бит (день - 1)"""
+        return self.year(year, saturday_working, sunday_working)[2][month - 1][0]
+
+    def month_count(self, year, month, saturday_working, sunday_working):
+        """Число рабочих дней в месяце"""
+        return self.year(year, saturday_working, sunday_working)[2][month - 1][1]
+
+    def to_dict(self):
+        return {
+            'version': workalendar_version(),
+            'flags': list(self.flags) if self.flags else None,
+            'years': {str(year): bits.hex() for year, (_, bits, _) in sorted(self.years.items())}
+        }
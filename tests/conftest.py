@@ -0,0 +1,29 @@
+"""
+Общие настройки тестов
+
+Модули бота импортируются из src/ как при запуске python src/bot.py.
+Пути data/ и reports/ в config считаются от текущей папки, поэтому тесты
+запускаются во временной папке и передают пути в классы явно.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault('BOT_TOKEN', '123456:test')
+os.environ.setdefault('MANAGER_CHAT_ID', '1')
+os.chdir(tempfile.mkdtemp(prefix='feedbackbot-tests-'))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+
+@pytest.fixture
+def io_pool(monkeypatch):
+    """Свой пул дисковых операций на тест (asyncio.run создает новый event loop)"""
+    import io_executor as io_module
+
+    pool = io_module.IOExecutor(max_workers=4, max_queue=64)
+    monkeypatch.setattr(io_module, 'io_executor', pool)
+    yield pool
+    pool.shutdown()
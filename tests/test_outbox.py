@@ -0,0 +1,126 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import outbox as outbox_module
+from config import MSK_TZ
+from outbox import Outbox
+
+
+@pytest.fixture
+def make_outbox(tmp_path, io_pool, monkeypatch):
+    monkeypatch.setattr(outbox_module, 'io_executor', io_pool)
+
+    def make():
+        box = Outbox(journal_file=tmp_path / 'outbox.journal', retention_days=7)
+        box.load()
+        return box
+    return make
+
+
+def messages(*chat_ids):
+    return [(chat_id, {'text': f'hello {chat_id}'}) for chat_id in chat_ids]
+
+
+def expires():
+    return datetime.now(MSK_TZ) + timedelta(hours=1)
+
+
+def test_resume_after_restart(make_outbox):
+    async def scenario():
+        box = make_outbox()
+        await box.enqueue('survey', '2026-10-18', messages(1, 2, 3), expires())
+        await box._finish('survey:2026-10-18:1', 'sent')
+    asyncio.run(scenario())
+
+    restored = make_outbox()
+    assert set(restored.pending) == {'survey:2026-10-18:2', 'survey:2026-10-18:3'}
+    assert 'survey:2026-10-18:1' in restored.finished
+
+
+def test_enqueue_skips_known_keys(make_outbox):
+    async def scenario():
+        box = make_outbox()
+        first = await box.enqueue('survey', '2026-10-18', messages(1, 2), expires())
+        await box._finish('survey:2026-10-18:1', 'sent')
+        second = await box.enqueue('survey', '2026-10-18', messages(1, 2, 3), expires())
+        return first, second
+    assert asyncio.run(scenario()) == (2, 1)
+
+    restored = make_outbox()
+    assert set(restored.pending) == {'survey:2026-10-18:2', 'survey:2026-10-18:3'}
+    assert asyncio.run(restored.enqueue('survey', '2026-10-18', messages(1, 2, 3), expires())) == 0
+
+
+def test_expired_entries_are_not_claimed(make_outbox):
+    async def scenario():
+        box = make_outbox()
+        await box.enqueue('report', '2026-10-18', messages(1), datetime.now(MSK_TZ) - timedelta(seconds=1))
+        return box, await box.claim('report:')
+    box, entries = asyncio.run(scenario())
+    assert entries == []
+    assert not box.pending
+    assert not make_outbox().pending
+
+
+def test_load_prunes_old_finished_keys(make_outbox, tmp_path):
+    old = (datetime.now(MSK_TZ) - timedelta(days=30)).isoformat()
+    recent = datetime.now(MSK_TZ).isoformat()
+    (tmp_path / 'outbox.journal').write_text(
+        f'{{"op": "done", "key": "survey:old:1", "created": "{old}"}}\n'
+        f'{{"op": "done", "key": "survey:new:1", "created": "{recent}"}}\n'
+        '{"op": "add", "key": "surv',
+        encoding='utf-8'
+    )
+    box = make_outbox()
+    assert set(box.finished) == {'survey:new:1'}
+    assert (tmp_path / 'outbox.journal').read_text(encoding='utf-8').count('\n') == 1
+
+
+def test_enqueue_before_delayed_compact_is_kept(make_outbox):
+    """Дозапись, выполненная раньше отложенного в пуле сжатия, не затирается им"""
+    async def scenario():
+        box = make_outbox()
+        release = threading.Event()
+        rewrite = box._rewrite
+
+        def delayed_rewrite(*args):
+            release.wait(5)
+            return rewrite(*args)
+        box._rewrite = delayed_rewrite
+
+        compact = asyncio.create_task(box.compact())
+        await asyncio.sleep(0.05)
+        await box.enqueue('survey', '2026-10-18', messages(7), expires())
+        await box._finish('survey:2026-10-18:7', 'sent')
+        await box.enqueue('survey', '2026-10-18', messages(8), expires())
+        release.set()
+        await compact
+    asyncio.run(scenario())
+
+    restored = make_outbox()
+    assert set(restored.pending) == {'survey:2026-10-18:8'}
+    assert 'survey:2026-10-18:7' in restored.finished
+
+
+def test_enqueue_interleaved_with_compact(make_outbox):
+    async def scenario():
+        box = make_outbox()
+        tasks = []
+        for index in range(40):
+            tasks.append(box.enqueue('survey', str(index), messages(index), expires()))
+            if index % 3 == 0:
+                tasks.append(box.compact())
+        await asyncio.gather(*tasks)
+        for index in range(0, 40, 2):
+            await box._finish(f'survey:{index}:{index}', 'sent')
+        await asyncio.gather(*(box.compact() for _ in range(3)))
+        return set(box.pending), set(box.finished)
+    pending, finished = asyncio.run(scenario())
+
+    restored = make_outbox()
+    assert set(restored.pending) == pending
+    assert set(restored.finished) == finished
+    assert len(pending) == 20 and len(finished) == 20
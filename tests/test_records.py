@@ -0,0 +1,77 @@
+import pytest
+
+from config import MOOD_OPTIONS
+from records import ResponseRecord, compact_days, from_micros, plain_days, to_micros
+
+
+def bot_response(mood='good', **fields):
+    data = {
+        'username': 'ivan',
+        'mood': mood,
+        'mood_text': MOOD_OPTIONS[mood]['text'],
+        'mood_emoji': MOOD_OPTIONS[mood]['emoji'],
+        'timestamp': '2026-10-18T17:05:09.123456+03:00',
+    }
+    data.update(fields)
+    return data
+
+
+@pytest.mark.parametrize('data', [
+    bot_response(),
+    bot_response('critical', project='Сайт', completed_at='2026-10-18T17:07:00.000001+03:00'),
+    bot_response(timestamp='2026-10-18T17:05:09+03:00'),
+    bot_response(timestamp='2026-10-18T17:05:09.000000+03:00'),
+    bot_response(timestamp='2026-10-18T14:05:09+00:00'),
+    bot_response(timestamp='2026-10-18T14:05:09Z'),
+    bot_response(timestamp='вчера'),
+    bot_response(mood_text='Норм'),
+    bot_response(mood_emoji='🙂', extra_field=[1, 2]),
+    bot_response(project=''),
+    {'username': 'ivan', 'mood': 'good', 'timestamp': '2026-10-18T17:05:09+03:00'},
+    {'mood': 'unknown', 'timestamp': 5},
+    {},
+])
+def test_round_trip_is_exact(data):
+    record = ResponseRecord.from_dict(data)
+    assert dict(record) == data
+    assert record.to_dict() == data
+    assert len(record) == len(data)
+    for key in data:
+        assert key in record and record[key] == data[key]
+
+
+def test_bot_answer_uses_compact_slots():
+    record = ResponseRecord.from_dict(bot_response(project='Сайт', completed_at='2026-10-18T17:35:09.123456+03:00'))
+    assert record.extra is None
+    assert isinstance(record.timestamp, int)
+    assert record.latency_minutes() == 30
+    with pytest.raises(KeyError):
+        record['missing']
+
+
+def test_update_keeps_exact_values():
+    record = ResponseRecord.from_dict(bot_response())
+    record.update({'project': 'CRM', 'completed_at': '2026-10-18T17:10:00+03:00'})
+    assert dict(record) == bot_response(project='CRM', completed_at='2026-10-18T17:10:00+03:00')
+    record.update({'mood': 'bad', 'mood_text': MOOD_OPTIONS['bad']['text'], 'mood_emoji': MOOD_OPTIONS['bad']['emoji']})
+    assert record['mood_text'] == MOOD_OPTIONS['bad']['text'] and record.extra in (None, {})
+
+
+def test_micros_conversion():
+    value = '2026-03-01T00:00:00.500000+03:00'
+    assert from_micros(to_micros(value)) == value
+    assert to_micros('2026-03-01T24:00:00+03:00') is None
+    assert to_micros('2026-02-30T10:00:00+03:00') is None
+    assert to_micros(None) is None
+
+
+def test_compact_and_plain_days_round_trip():
+    days = {
+        '2026-10-17': {'1': bot_response(project='Сайт'), '2': bot_response('bad', project='Сайт')},
+        '2026-10-18': {'1': {'username': 'ivan', 'mood': 'good'}},
+    }
+    expected = {date_str: {uid: dict(data) for uid, data in responses.items()} for date_str, responses in days.items()}
+    compact = compact_days(days)
+    assert plain_days(compact) == expected
+    # Одинаковые названия проектов в месяце - одна строка
+    assert compact['2026-10-17']['1'].project is compact['2026-10-17']['2'].project
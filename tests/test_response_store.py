@@ -0,0 +1,152 @@
+import json
+
+import pytest
+
+from database import ResponseStore, current_month
+
+MONTH = current_month()
+DAY = f"{MONTH}-01"
+
+
+def response(mood='good', **fields):
+    data = {'username': 'ivan', 'mood': mood, 'mood_emoji': '😊', 'timestamp': f"{DAY}T17:05:00+03:00"}
+    data.update(fields)
+    return data
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    def make(**kwargs):
+        return ResponseStore(tmp_path / 'responses', tmp_path / 'responses.journal', **kwargs).load()
+    return make
+
+
+def plain(store):
+    return {date_str: {user_id: dict(data) for user_id, data in store[date_str].items()} for date_str in store}
+
+
+def test_journal_replay_restores_changes(make_store, tmp_path):
+    store = make_store()
+    store.ensure_day(DAY)
+    store.set(DAY, '1', response())
+    store.set(DAY, '2', response('bad'))
+    assert store.update(DAY, '1', {'project': 'Сайт'})
+    assert not store.update(DAY, '3', {'project': 'Сайт'})
+    store.ensure_day('2025-01-15')
+    store.close()
+
+    restored = make_store()
+    assert plain(restored) == {
+        '2025-01-15': {},
+        DAY: {'1': response(project='Сайт'), '2': response('bad')},
+    }
+    assert (tmp_path / 'responses.journal').exists()
+
+
+def test_torn_last_journal_line_is_skipped(make_store, tmp_path):
+    store = make_store()
+    store.set(DAY, '1', response())
+    store.close()
+    with open(tmp_path / 'responses.journal', 'a', encoding='utf-8') as f:
+        f.write('{"op": "set", "date": "' + DAY + '", "user_id": "2", "da')
+
+    restored = make_store()
+    assert list(restored[DAY]) == ['1']
+
+
+def test_compaction_moves_journal_into_month_files(make_store, tmp_path):
+    store = make_store(compact_threshold=3)
+    for user_id in range(5):
+        store.set(DAY, str(user_id), response())
+    store.set('2025-01-15', '1', response('hard'))
+    store.wait_compaction()
+    store.close()
+
+    shard = json.loads((tmp_path / 'responses' / f'{MONTH}.json').read_text(encoding='utf-8'))
+    assert len(shard[DAY]) >= 3
+    assert not (tmp_path / 'responses.journal.compacting').exists()
+
+    restored = make_store()
+    assert plain(restored) == plain(store)
+    assert len(restored[DAY]) == 5
+
+
+def test_interrupted_compaction_is_replayed_before_journal(make_store, tmp_path):
+    (tmp_path / 'responses').mkdir()
+    (tmp_path / 'responses.journal.compacting').write_text(
+        json.dumps({'op': 'set', 'date': DAY, 'user_id': '1', 'data': response('bad')}) + '\n',
+        encoding='utf-8'
+    )
+    (tmp_path / 'responses.journal').write_text(
+        json.dumps({'op': 'set', 'date': DAY, 'user_id': '1', 'data': response('excellent')}) + '\n',
+        encoding='utf-8'
+    )
+
+    store = make_store()
+    assert store[DAY]['1']['mood'] == 'excellent'
+    store.wait_compaction()
+    assert not (tmp_path / 'responses.journal.compacting').exists()
+    store.close()
+
+    assert make_store()[DAY]['1']['mood'] == 'excellent'
+
+
+def test_snapshot_writes_months_and_clears_journal(make_store, tmp_path):
+    store = make_store()
+    store.set(DAY, '1', response())
+    store.set('2025-01-15', '1', response('bad'))
+    store.save_snapshot()
+    store.close()
+
+    assert not (tmp_path / 'responses.journal').exists()
+    index = json.loads((tmp_path / 'responses' / 'index.json').read_text(encoding='utf-8'))
+    assert index == {'2025-01': ['2025-01-15'], MONTH: [DAY]}
+    assert plain(make_store()) == plain(store)
+
+
+def test_evicted_months_are_reloaded(make_store):
+    store = make_store()
+    for month in range(1, 7):
+        store.set(f"2025-{month:02d}-10", '1', response())
+    store.save_snapshot()
+    store.close()
+
+    small = make_store(cache_months=2)
+    assert [small[f"2025-{month:02d}-10"]['1']['mood'] for month in range(1, 7)] == ['good'] * 6
+    assert len(small._months) <= 2
+    assert small.month_days(2025, 3) == ['2025-03-10']
+
+
+def test_unsaved_months_stay_in_cache(make_store):
+    store = make_store(cache_months=1)
+    store.set('2025-01-10', '1', response())
+    store.set('2025-02-10', '1', response())
+    # Изменения еще только в журнале: месяцы нельзя вытеснять, иначе ответы пропадут
+    assert store['2025-01-10']['1']['mood'] == 'good'
+    assert store['2025-02-10']['1']['mood'] == 'good'
+
+
+def test_point_and_user_queries(make_store):
+    store = make_store()
+    store.set(DAY, '1', response())
+    store.set(DAY, '2', response('bad'))
+    assert store.response(DAY, '2')['mood'] == 'bad'
+    assert store.response(DAY, '3') is None
+    assert store.response('2020-01-01', '1') is None
+    year, month = map(int, MONTH.split('-'))
+    assert list(store.user_month_responses('1', year, month)) == [DAY]
+    assert store.changed_months() == [MONTH]
+
+
+def test_legacy_snapshot_is_split_by_month(make_store, tmp_path):
+    legacy = tmp_path / 'responses.json'
+    legacy.write_text(json.dumps({
+        '2025-01-15': {'1': response()},
+        '2025-02-03': {'1': response('bad')},
+    }), encoding='utf-8')
+
+    store = make_store(legacy_file=legacy)
+    assert store.month_days(2025, 1) == ['2025-01-15']
+    assert store['2025-02-03']['1']['mood'] == 'bad'
+    assert not legacy.exists()
+    assert (tmp_path / 'responses' / '2025-02.json').exists()
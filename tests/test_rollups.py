@@ -0,0 +1,118 @@
+import random
+
+from config import MOOD_OPTIONS
+from records import ResponseRecord
+from rollups import Rollups, day_bits, longest_streak
+
+MOODS = list(MOOD_OPTIONS)
+
+
+class DayStore(dict):
+    """Минимальное хранилище для Rollups.build/rebuild_month: {дата: {user_id: ответ}}"""
+
+    def month_days(self, year, month):
+        prefix = f"{year}-{month:02d}-"
+        return sorted(date_str for date_str in self if date_str.startswith(prefix))
+
+
+def make_response(rng, date_str, user_id):
+    mood = rng.choice(MOODS)
+    data = {
+        'username': f'user{user_id}',
+        'mood': mood,
+        'mood_text': MOOD_OPTIONS[mood]['text'],
+        'mood_emoji': MOOD_OPTIONS[mood]['emoji'],
+        'timestamp': f"{date_str}T17:{rng.randrange(60):02d}:00+03:00",
+    }
+    if rng.random() < 0.7:
+        data['project'] = rng.choice(['Сайт', 'CRM', 'Мобильное приложение'])
+        data['completed_at'] = f"{date_str}T18:{rng.randrange(60):02d}:00+03:00"
+    return data
+
+
+def random_days(seed=1):
+    rng = random.Random(seed)
+    days = DayStore()
+    for month in (1, 2, 3):
+        for day in rng.sample(range(1, 29), 12):
+            date_str = f"2026-{month:02d}-{day:02d}"
+            days[date_str] = {
+                str(user_id): make_response(rng, date_str, user_id)
+                for user_id in rng.sample(range(10), rng.randrange(1, 10))
+            }
+    return days
+
+
+def test_incremental_matches_build():
+    days = random_days()
+    incremental = Rollups()
+    for date_str, responses in days.items():
+        incremental.ensure_day(date_str)
+        for user_id, response in responses.items():
+            incremental.apply(date_str, user_id, None, response)
+
+    built = Rollups.build(days)
+    assert incremental.to_dict() == built.to_dict()
+    assert incremental.totals == built.totals
+
+
+def test_add_then_subtract_leaves_nothing():
+    days = random_days(2)
+    rollups = Rollups()
+    for date_str, responses in days.items():
+        for user_id, response in responses.items():
+            rollups.apply(date_str, user_id, None, response)
+    for date_str, responses in days.items():
+        for user_id, response in responses.items():
+            rollups.apply(date_str, user_id, response, None)
+
+    assert rollups.months == {'2026-01': {}, '2026-02': {}, '2026-03': {}}
+    assert rollups.totals == {}
+    for totals in rollups.days.values():
+        assert totals['count'] == 0 and totals['moods'] == {} and totals['score_sum'] == 0
+
+
+def test_changed_answer_matches_build():
+    days = random_days(3)
+    rollups = Rollups.build(days)
+    rng = random.Random(4)
+    for date_str in rng.sample(sorted(days), 10):
+        user_id = rng.choice(sorted(days[date_str]))
+        old = days[date_str][user_id]
+        new = {**old, 'mood': rng.choice(MOODS), 'project': 'Новый проект'}
+        days[date_str][user_id] = new
+        rollups.apply(date_str, user_id, old, new)
+
+    assert rollups.to_dict() == Rollups.build(days).to_dict()
+
+
+def test_records_and_dicts_give_same_rollups():
+    days = random_days(5)
+    records = DayStore({
+        date_str: {user_id: ResponseRecord.from_dict(data) for user_id, data in responses.items()}
+        for date_str, responses in days.items()
+    })
+    assert Rollups.build(records).to_dict() == Rollups.build(days).to_dict()
+
+
+def test_rebuild_month_fixes_stale_month():
+    days = random_days(6)
+    rollups = Rollups.build(days)
+    expected = rollups.to_dict()
+    stale = Rollups.from_dict(expected)
+    stale.months['2026-02'] = {}
+    stale.days = {date_str: totals for date_str, totals in stale.days.items() if not date_str.startswith('2026-02')}
+
+    stale.rebuild_month(days, '2026-02')
+    assert stale.to_dict() == expected
+
+
+def test_day_bitmap_and_streak():
+    rollups = Rollups()
+    for day in (1, 2, 3, 10, 11):
+        date_str = f"2026-05-{day:02d}"
+        rollups.apply(date_str, '1', None, {'mood': 'good'})
+    entry = rollups.user_month('1', 2026, 5)
+    assert day_bits(entry['days']) == [1, 2, 3, 10, 11]
+    assert longest_streak(entry['days']) == 3
+    assert rollups.month_days(2026, 5) == [f"2026-05-{day:02d}" for day in (1, 2, 3, 10, 11)]
@@ -0,0 +1,147 @@
+import asyncio
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import scheduler as scheduler_module
+from config import MSK_TZ
+from scheduler import Scheduler, ScheduledJob
+
+
+@pytest.fixture
+def sched(tmp_path, io_pool, monkeypatch):
+    monkeypatch.setattr(scheduler_module, 'io_executor', io_pool)
+    return Scheduler(state_file=tmp_path / 'scheduler_state.json')
+
+
+def minutes_ago(minutes):
+    """Время HH:MM, которое было minutes минут назад, и его плановый запуск"""
+    moment = datetime.now(MSK_TZ) - timedelta(minutes=minutes)
+    run_at = moment.replace(second=0, microsecond=0)
+    return run_at.strftime('%H:%M'), run_at
+
+
+def recorder(calls, name, result=True, delay=0):
+    async def func(run_at):
+        calls.append(('start', name))
+        await asyncio.sleep(delay)
+        calls.append(('end', name))
+        return result
+    return func
+
+
+def test_next_and_prev_run_respect_days_filter():
+    job = ScheduledJob('monthly', "Месячные", "09:00", None, days=lambda day: day.day == 1)
+    after = datetime(2026, 10, 18, 12, 0, tzinfo=MSK_TZ)
+    assert job.next_run(after) == datetime(2026, 11, 1, 9, 0, tzinfo=MSK_TZ)
+    assert job.prev_run(after) == datetime(2026, 10, 1, 9, 0, tzinfo=MSK_TZ)
+    assert job.next_run(datetime(2026, 11, 1, 9, 0, tzinfo=MSK_TZ)).date() == date(2026, 12, 1)
+
+
+def test_catch_up_within_grace(sched):
+    calls = []
+    at, due = minutes_ago(30)
+    job = ScheduledJob('survey', "Опрос", at, recorder(calls, 'survey'), grace=timedelta(hours=1))
+    sched.planner = lambda: [job]
+    sched.last_runs = {'survey': (due - timedelta(days=1)).isoformat()}
+
+    asyncio.run(sched._catch_up())
+
+    assert calls == [('start', 'survey'), ('end', 'survey')]
+    assert sched.last_run('survey') == due
+    assert json.loads(sched.state_file.read_text(encoding='utf-8'))['survey'] == due.isoformat()
+
+
+def test_catch_up_skips_runs_outside_grace(sched):
+    calls = []
+    at, due = minutes_ago(30)
+    job = ScheduledJob('reminder', "Напоминание", at, recorder(calls, 'reminder'), grace=timedelta(minutes=15))
+    sched.planner = lambda: [job]
+    last = (due - timedelta(days=1)).isoformat()
+    sched.last_runs = {'reminder': last}
+
+    asyncio.run(sched._catch_up())
+
+    assert calls == []
+    assert sched.last_runs['reminder'] == last
+
+
+def test_first_run_baseline_is_saved(sched):
+    calls = []
+    at, _ = minutes_ago(30)
+    job = ScheduledJob('survey', "Опрос", at, recorder(calls, 'survey'), grace=timedelta(hours=1))
+    sched.planner = lambda: [job]
+
+    asyncio.run(sched._catch_up())
+
+    assert calls == []
+    saved = json.loads(sched.state_file.read_text(encoding='utf-8'))
+    assert saved['survey'] == sched.last_runs['survey']
+
+
+def test_failed_run_is_not_recorded(sched):
+    calls = []
+    at, due = minutes_ago(30)
+    job = ScheduledJob('report', "Отчет", at, recorder(calls, 'report', result=False), grace=timedelta(hours=1))
+    sched.planner = lambda: [job]
+    last = (due - timedelta(days=1)).isoformat()
+    sched.last_runs = {'report': last}
+
+    asyncio.run(sched._catch_up())
+
+    assert calls == [('start', 'report'), ('end', 'report')]
+    assert sched.last_runs['report'] == last
+    assert not sched.state_file.exists()
+
+
+def test_catch_up_runs_in_due_order(sched):
+    calls = []
+    survey_at, survey_due = minutes_ago(40)
+    report_at, _ = minutes_ago(20)
+    # Отчет в списке первым, опрос выполняется дольше - отчет все равно ждет опрос
+    jobs = [
+        ScheduledJob('report', "Отчет", report_at, recorder(calls, 'report'), grace=timedelta(hours=1)),
+        ScheduledJob('survey', "Опрос", survey_at, recorder(calls, 'survey', delay=0.05), grace=timedelta(hours=1)),
+    ]
+    sched.planner = lambda: jobs
+    yesterday = (survey_due - timedelta(days=1)).isoformat()
+    sched.last_runs = {'report': yesterday, 'survey': yesterday}
+
+    asyncio.run(sched._catch_up())
+
+    assert calls == [('start', 'survey'), ('end', 'survey'), ('start', 'report'), ('end', 'report')]
+
+
+def test_replan_keeps_previous_plan_on_bad_time(sched):
+    settings = {'at': '10:00'}
+    sched.planner = lambda: [ScheduledJob('survey', "Опрос", settings['at'], None)]
+    sched.replan()
+    plan = sched.upcoming()
+    assert len(plan) == 1
+
+    settings['at'] = '25:00'
+    sched.replan()
+    assert sched.upcoming() == plan
+
+    settings['at'] = 'утром'
+    sched.replan()
+    assert sched.upcoming() == plan
+
+
+def test_launch_skips_late_and_running_jobs(sched):
+    calls = []
+    job = ScheduledJob('survey', "Опрос", "10:00", recorder(calls, 'survey', delay=0.05), grace=timedelta(minutes=5))
+
+    async def scenario():
+        now = datetime.now(MSK_TZ)
+        sched._launch(job, now - timedelta(minutes=10), now)
+        assert 'survey' not in sched.running
+        sched._launch(job, now, now)
+        first = sched.running['survey']
+        sched._launch(job, now, now)
+        assert sched.running['survey'] is first
+        await first
+    asyncio.run(scenario())
+
+    assert calls == [('start', 'survey'), ('end', 'survey')]
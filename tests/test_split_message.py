@@ -0,0 +1,42 @@
+import pytest
+
+from daily_report import message_length, split_message
+
+
+def test_short_sections_fit_one_message():
+    assert split_message(['Заголовок\n\n', 'Блок 1\n', 'Блок 2\n'], limit=100) == ['Заголовок\n\nБлок 1\nБлок 2']
+
+
+def test_sections_are_not_split_when_they_fit():
+    sections = [f"Блок {i}\n" + 'x' * 40 + '\n\n' for i in range(10)]
+    chunks = split_message(sections, limit=120)
+    for chunk in chunks:
+        assert message_length(chunk) <= 120
+        assert chunk.count('Блок') == 2
+    assert ''.join(chunk + '\n\n' for chunk in chunks) == ''.join(sections)
+
+
+def test_long_section_is_split_by_lines():
+    section = ''.join(f"{i}. @user{i} - проект\n" for i in range(200))
+    chunks = split_message(['Шапка\n', section], limit=500)
+    assert all(message_length(chunk) <= 500 for chunk in chunks)
+    lines = '\n'.join(chunks).splitlines()
+    assert lines == ['Шапка'] + [f"{i}. @user{i} - проект" for i in range(200)]
+
+
+@pytest.mark.parametrize('line', ['😭' * 5000, 'я' * 9000, 'a' * 4097])
+def test_line_longer_than_limit_is_cut(line):
+    chunks = split_message([line])
+    assert all(message_length(chunk) <= 4096 for chunk in chunks)
+    assert ''.join(chunks) == line
+
+
+def test_emoji_count_as_two_units():
+    assert message_length('😭') == 2
+    chunks = split_message(['😭' * 30 + '\n', '😭' * 30 + '\n'], limit=100)
+    assert len(chunks) == 2
+
+
+def test_empty_input():
+    assert split_message([]) == []
+    assert split_message(['\n', '']) == []
@@ -0,0 +1,68 @@
+from datetime import date
+
+from vacations import VacationIndex, find_overlap, normalize_vacations, parse_date_range
+
+
+def vacation(start, end):
+    return {'start': start, 'end': end}
+
+
+VACATIONS = {
+    '1': [vacation('2026-07-01', '2026-07-14'), vacation('2026-12-28', '2027-01-08')],
+    '2': [vacation('2026-07-10', '2026-07-20')],
+    '3': [vacation('2026-07-14', '2026-07-14')],
+}
+
+
+def test_on_vacation_includes_both_ends():
+    index = VacationIndex(VACATIONS)
+    assert index.on_vacation(date(2026, 6, 30)) == set()
+    assert index.on_vacation(date(2026, 7, 1)) == {'1'}
+    assert index.on_vacation(date(2026, 7, 10)) == {'1', '2'}
+    assert index.on_vacation(date(2026, 7, 14)) == {'1', '2', '3'}
+    assert index.on_vacation(date(2026, 7, 15)) == {'2'}
+    assert index.on_vacation(date(2026, 7, 21)) == set()
+    assert index.on_vacation(date(2027, 1, 1)) == {'1'}
+    assert index.on_vacation(date(2027, 1, 9)) == set()
+
+
+def test_matches_linear_scan():
+    index = VacationIndex(VACATIONS)
+    day = date(2026, 6, 25)
+    while day <= date(2027, 1, 15):
+        expected = {
+            user_id for user_id, items in VACATIONS.items()
+            for item in items if item['start'] <= day.isoformat() <= item['end']
+        }
+        assert index.on_vacation(day) == expected
+        assert index.is_on_vacation('2', day) == ('2' in expected)
+        day = date.fromordinal(day.toordinal() + 1)
+
+
+def test_pop_expired_in_end_order():
+    index = VacationIndex(VACATIONS)
+    assert index.pop_expired(date(2026, 7, 14)) == []
+    assert index.pop_expired(date(2026, 7, 21)) == [('1', '2026-07-01'), ('3', '2026-07-14'), ('2', '2026-07-10')]
+    assert index.pop_expired(date(2026, 7, 21)) == []
+    assert index.pop_expired(date(2027, 2, 1)) == [('1', '2026-12-28')]
+
+
+def test_broken_vacation_is_skipped():
+    index = VacationIndex({'1': [vacation('2026-07-01', 'потом')], '2': [vacation('2026-07-01', '2026-07-02')]})
+    assert index.on_vacation(date(2026, 7, 1)) == {'2'}
+
+
+def test_empty_index():
+    index = VacationIndex({})
+    assert index.on_vacation(date(2026, 7, 1)) == set()
+    assert index.pop_expired(date(2026, 7, 1)) == []
+
+
+def test_normalize_and_overlap():
+    vacations = normalize_vacations({'1': vacation('2026-07-01', '2026-07-14'), '2': []})
+    assert vacations == {'1': [vacation('2026-07-01', '2026-07-14')]}
+    items = VACATIONS['1']
+    assert find_overlap(items, date(2026, 7, 14), date(2026, 7, 20)) == items[0]
+    assert find_overlap(items, date(2026, 7, 15), date(2026, 12, 27)) is None
+    assert find_overlap(items, date(2026, 7, 5), date(2026, 7, 6), ignore_start='2026-07-01') is None
+    assert parse_date_range('01.07.2026 - 14.07.2026') == (date(2026, 7, 1), date(2026, 7, 14))
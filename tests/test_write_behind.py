@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+import database
+from database import WriteBehind, write_text_atomic
+
+
+@pytest.fixture
+def writer(io_pool, monkeypatch):
+    monkeypatch.setattr(database, 'io_executor', io_pool)
+    return WriteBehind(interval_ms=20)
+
+
+def test_changes_are_coalesced(writer):
+    written = []
+
+    def change(value):
+        writer.mark_dirty('users', lambda: lambda: written.append(value))
+
+    async def scenario():
+        for value in range(5):
+            change(value)
+        await asyncio.sleep(0.1)
+        change(5)
+        await writer.close()
+    asyncio.run(scenario())
+
+    assert written == [4, 5]
+
+
+def test_close_flushes_pending_changes(writer):
+    written = []
+
+    async def scenario():
+        writer.mark_dirty('users', lambda: lambda: written.append('users'))
+        writer.mark_dirty('rollups', lambda: lambda: written.append('rollups'))
+        await writer.close()
+    asyncio.run(scenario())
+
+    assert sorted(written) == ['rollups', 'users']
+
+
+def test_outside_event_loop_writes_immediately(writer):
+    written = []
+    writer.mark_dirty('users', lambda: lambda: written.append('users'))
+    assert written == ['users']
+
+
+def test_failed_job_does_not_block_others(writer):
+    written = []
+
+    def broken():
+        raise OSError('disk full')
+
+    async def scenario():
+        writer.mark_dirty('broken', lambda: broken)
+        writer.mark_dirty('users', lambda: lambda: written.append('users'))
+        await writer.close()
+    asyncio.run(scenario())
+
+    assert written == ['users']
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    path = tmp_path / 'users.json'
+    path.write_text('old', encoding='utf-8')
+    write_text_atomic(path, 'новое')
+    assert path.read_text(encoding='utf-8') == 'новое'
+    assert [p.name for p in tmp_path.iterdir()] == ['users.json']